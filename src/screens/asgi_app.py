@@ -0,0 +1,184 @@
+"""Modo de servicio asíncrono (ASGI) con los mismos endpoints que server.py
+
+El bucle de eventos solo recibe y envía bytes: cada petición se atiende
+con la aplicación Flask de server.py (mismas rutas y mismos JSON) en un
+pool de hilos, así que ni la inferencia ni la escritura de perfiles
+bloquean el bucle. Hay dos pools:
+  - inferencia y escrituras (analizar, actualizar perfiles, feedback...);
+  - lecturas baratas (/health, /metrics, /get_user_profile, /top_places...),
+    para que un reentrenamiento o una escritura lenta no las deje esperando
+    en cola.
+
+Uso (desde src/screens; requiere uvicorn):
+    uvicorn asgi_app:create_app --factory --host 0.0.0.0 --port 8080
+    python asgi_app.py
+
+Importar el módulo no carga el modelo: create_app() importa server.py.
+
+Variables: NLP_ASYNC_WORKERS (hilos de inferencia, por defecto 8),
+NLP_ASYNC_READ_WORKERS (hilos de lectura, por defecto 2),
+NLP_MAX_BODY_BYTES (cuerpo máximo de una petición, por defecto 1 MiB;
+más grande se responde 413) y las de server.py. Con NLP_BATCH_WINDOW_MS las predicciones concurrentes del
+pool de inferencia se agrupan en lotes (micro_batcher.py).
+"""
+import asyncio
+import io
+import json
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Tuple
+
+# Rutas de solo lectura que no tocan el modelo (o solo leen un perfil)
+READ_ROUTES = frozenset({
+    '/health', '/metrics', '/retrain_status', '/get_user_profile', '/get_recommendations_history',
+    '/top_places'
+})
+
+DEFAULT_MAX_BODY_BYTES = 1024 * 1024
+
+
+def build_environ(scope: Dict, body: bytes) -> Dict:
+    """Entorno WSGI equivalente a una petición HTTP de ASGI"""
+    server_name, server_port = scope.get('server') or ('localhost', 80)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': server_name,
+        'SERVER_PORT': str(server_port),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'REMOTE_ADDR': scope['client'][0] if scope.get('client') else '',
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+    }
+    for name, value in scope.get('headers', []):
+        key = name.decode('latin-1').upper().replace('-', '_')
+        value = value.decode('latin-1')
+        if key == 'CONTENT_TYPE':
+            environ['CONTENT_TYPE'] = value
+        elif key != 'CONTENT_LENGTH':
+            key = f'HTTP_{key}'
+            environ[key] = f"{environ[key]},{value}" if key in environ else value
+    return environ
+
+
+def call_wsgi(wsgi_app: Callable, environ: Dict) -> Tuple[int, List[Tuple[bytes, bytes]], bytes]:
+    """Ejecutar la aplicación WSGI y devolver estado, cabeceras y cuerpo completos"""
+    response = {}
+    chunks = []
+
+    def start_response(status, headers, exc_info=None):
+        if exc_info and response:
+            raise exc_info[1].with_traceback(exc_info[2])
+        response['status'] = int(status.split(' ', 1)[0])
+        response['headers'] = [
+            (name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers
+        ]
+        return chunks.append
+
+    iterable = wsgi_app(environ, start_response)
+    try:
+        for chunk in iterable:
+            chunks.append(chunk)
+    finally:
+        if hasattr(iterable, 'close'):
+            iterable.close()
+    return response['status'], response['headers'], b''.join(chunks)
+
+
+class AsyncNLPApp:
+    """Aplicación ASGI que atiende cada petición con la app WSGI en un pool de hilos"""
+
+    def __init__(self, wsgi_app: Callable, workers: int = 8, read_workers: int = 2,
+                 on_shutdown: Callable[[], None] = None, max_body_bytes: int = DEFAULT_MAX_BODY_BYTES):
+        self.wsgi_app = wsgi_app
+        self.on_shutdown = on_shutdown
+        self.max_body_bytes = max_body_bytes
+        self.executor = ThreadPoolExecutor(workers, thread_name_prefix='nlp-inference')
+        self.read_executor = ThreadPoolExecutor(read_workers, thread_name_prefix='nlp-read')
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+        elif scope['type'] == 'http':
+            await self._http(scope, receive, send)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                # Escribir perfiles pendientes sin bloquear el bucle
+                await asyncio.get_running_loop().run_in_executor(None, self.close)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def _http(self, scope, receive, send):
+        declared = dict(scope.get('headers', [])).get(b'content-length')
+        if declared is not None and declared.isdigit() and int(declared) > self.max_body_bytes:
+            await self._too_large(send)
+            return
+        body = bytearray()
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                return
+            body.extend(message.get('body', b''))
+            # Sin Content-Length (o con uno falso) se corta al pasar el límite
+            if len(body) > self.max_body_bytes:
+                await self._too_large(send)
+                return
+            if not message.get('more_body'):
+                break
+
+        executor = self.read_executor if scope['path'] in READ_ROUTES else self.executor
+        environ = build_environ(scope, bytes(body))
+        status, headers, content = await asyncio.get_running_loop().run_in_executor(
+            executor, call_wsgi, self.wsgi_app, environ
+        )
+        await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+        await send({'type': 'http.response.body', 'body': content})
+
+    async def _too_large(self, send):
+        content = json.dumps({"error": f"Cuerpo de la petición mayor que {self.max_body_bytes} bytes"}).encode()
+        await send({'type': 'http.response.start', 'status': 413, 'headers': [
+            (b'content-type', b'application/json'), (b'content-length', str(len(content)).encode())
+        ]})
+        await send({'type': 'http.response.body', 'body': content})
+
+    def close(self):
+        """Terminar las peticiones en curso y liberar el modelo"""
+        self.executor.shutdown(wait=True)
+        self.read_executor.shutdown(wait=True)
+        if self.on_shutdown is not None:
+            self.on_shutdown()
+
+
+def create_app() -> AsyncNLPApp:
+    """Aplicación ASGI sobre el modelo y las rutas de server.py"""
+    import server
+    return AsyncNLPApp(
+        server.app,
+        workers=int(os.environ.get('NLP_ASYNC_WORKERS', 8)),
+        read_workers=int(os.environ.get('NLP_ASYNC_READ_WORKERS', 2)),
+        on_shutdown=server.nlp_model.close,
+        max_body_bytes=int(os.environ.get('NLP_MAX_BODY_BYTES', DEFAULT_MAX_BODY_BYTES))
+    )
+
+
+if __name__ == '__main__':
+    try:
+        import uvicorn
+    except ImportError:
+        print("El modo asíncrono requiere uvicorn: pip install uvicorn")
+        sys.exit(1)
+    uvicorn.run(create_app(), host=os.environ.get('NLP_HOST', '0.0.0.0'), port=int(os.environ.get('NLP_PORT', 8080)))
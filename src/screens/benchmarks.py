@@ -0,0 +1,682 @@
+"""Micro-benchmarks del modelo NLP de BarranquillaChatBot
+
+Uso:
+    python benchmarks.py            # ejecutar todos los benchmarks
+    python benchmarks.py inference  # ejecutar solo uno
+"""
+import json
+import os
+import random
+import re
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import urllib.request
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import ExitStack, contextmanager
+from typing import Callable, Dict, Iterator, List, Tuple
+
+from compiled_model import CompiledPipeline, check_parity
+from metrics import Histogram
+from micro_batcher import MicroBatcher
+from model import BarranquillaNLPModel
+from place_index import PlaceIndex, top_rated
+from personalization_rules import deepseek_context, profile_context, render_context
+from prediction_cache import PredictionCache
+from profile_store import JSONProfileStore
+from training_corpus import TrainingCorpus
+from text_normalizer import TextNormalizer
+from user_profile import UserProfile
+
+# Ninguno coincide con una frase del corpus semilla: así las mediciones de
+# inferencia pasan por los clasificadores y no por el índice de frases
+SAMPLE_MESSAGES = [
+    "me siento muy estresado y necesito relajarme",
+    "quiero comer algo típico de la costa",
+    "estoy súper feliz y quiero bailar",
+    "busco un lugar romántico para una cita",
+    "quiero conocer la historia de Barranquilla",
+    "tengo mucha hambre ahora",
+    "quiero rumba esta noche",
+    "busco playa para caminar",
+]
+
+
+def time_per_call(fn: Callable, args_list: List, repeat: int = 200) -> float:
+    """Tiempo medio por llamada en microsegundos"""
+    fn(args_list[0])  # calentamiento
+    start = time.perf_counter()
+    for i in range(repeat):
+        fn(args_list[i % len(args_list)])
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def legacy_predict(nlp_model: BarranquillaNLPModel, text: str):
+    """Ruta original: predict() + predict_proba() por cada pipeline"""
+    processed_text = nlp_model.preprocess_text(text)
+    mood_pred = nlp_model.mood_classifier.predict([processed_text])[0]
+    mood_prob = max(nlp_model.mood_classifier.predict_proba([processed_text])[0])
+    intent_pred = nlp_model.intent_classifier.predict([processed_text])[0]
+    intent_prob = max(nlp_model.intent_classifier.predict_proba([processed_text])[0])
+    return mood_pred, mood_prob, intent_pred, intent_prob
+
+
+def bench_inference(nlp_model: BarranquillaNLPModel) -> Dict[str, float]:
+    """Latencia por mensaje: ruta original vs. inferencia fusionada"""
+    legacy_us = time_per_call(lambda m: legacy_predict(nlp_model, m), SAMPLE_MESSAGES)
+    fused_us = time_per_call(nlp_model.predict_mood_and_intent, SAMPLE_MESSAGES)
+
+    print("=== INFERENCIA POR MENSAJE ===")
+    print(f"Original (predict + predict_proba): {legacy_us:8.1f} µs/mensaje")
+    print(f"Fusionada (una vectorización):      {fused_us:8.1f} µs/mensaje")
+    print(f"Aceleración: {legacy_us / fused_us:.2f}x")
+    return {"legacy_us": legacy_us, "fused_us": fused_us}
+
+
+def bench_batch(nlp_model: BarranquillaNLPModel, size: int = 2000) -> Dict[str, float]:
+    """Throughput: un mensaje por llamada vs. predict_batch"""
+    messages = [SAMPLE_MESSAGES[i % len(SAMPLE_MESSAGES)] for i in range(size)]
+
+    start = time.perf_counter()
+    for message in messages:
+        nlp_model.predict_mood_and_intent(message)
+    single_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    nlp_model.predict_batch(messages)
+    batch_s = time.perf_counter() - start
+
+    print(f"=== INFERENCIA POR LOTES ({size} mensajes) ===")
+    print(f"Uno por uno:   {size / single_s:10.0f} mensajes/s")
+    print(f"predict_batch: {size / batch_s:10.0f} mensajes/s")
+    print(f"Aceleración: {single_s / batch_s:.1f}x")
+    return {"single_msgs_per_s": size / single_s, "batch_msgs_per_s": size / batch_s}
+
+
+FILLERS = ["", "hoy", "por favor", "ahora mismo", "en barranquilla", "este fin de semana", "con amigos"]
+
+
+def synthetic_feedback(nlp_model: BarranquillaNLPModel, size: int, seed: int = 0) -> List[Tuple[str, str, str]]:
+    """Mensajes sintéticos (mensaje, estado, intención) combinando frases semilla"""
+    nlp_model.create_initial_datasets()
+    rng = random.Random(seed)
+    items = []
+    for _ in range(size):
+        mood_text, mood = rng.choice(nlp_model.mood_dataset)
+        intent_text, intent = rng.choice(nlp_model.intent_dataset)
+        message = f"{mood_text} y {intent_text} {rng.choice(FILLERS)}".strip()
+        items.append((message, mood, intent))
+    return items
+
+
+def accuracy(nlp_model: BarranquillaNLPModel, items: List[Tuple[str, str, str]]) -> Tuple[float, float]:
+    """Exactitud de estado de ánimo e intención sobre ejemplos etiquetados"""
+    predictions = nlp_model.predict_batch([message for message, _, _ in items])
+    mood_ok = sum(pred[0] == mood for pred, (_, mood, _) in zip(predictions, items))
+    intent_ok = sum(pred[2] == intent for pred, (_, _, intent) in zip(predictions, items))
+    return mood_ok / len(items), intent_ok / len(items)
+
+
+@contextmanager
+def fresh_model(corpus_items: List[Tuple[str, str, str]] = None, **kwargs) -> Iterator[BarranquillaNLPModel]:
+    """Modelo entrenado desde cero en un directorio temporal
+
+    Si se pasan ejemplos (mensaje, estado, intención) se usan como corpus
+    semilla en lugar de los datasets iniciales.
+    """
+    original_dir = os.getcwd()
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)
+        try:
+            if corpus_items:
+                corpus = TrainingCorpus('training_corpus.db')
+                corpus.add_examples('mood', [(m, mood) for m, mood, _ in corpus_items], source='seed')
+                corpus.add_examples('intent', [(m, intent) for m, _, intent in corpus_items], source='seed')
+                corpus.close()
+            kwargs.setdefault('cache_size', 0)
+            model = BarranquillaNLPModel(profile_store=JSONProfileStore(), **kwargs)
+            try:
+                yield model
+            finally:
+                model.close()
+        finally:
+            os.chdir(original_dir)
+
+
+def bench_online(nlp_model: BarranquillaNLPModel, corpus_size: int = 5000, updates: int = 5) -> Dict[str, Dict]:
+    """Latencia de actualización y exactitud: reentrenamiento completo vs. motor en línea"""
+    corpus_items = synthetic_feedback(nlp_model, corpus_size, seed=1)
+    feedback_items = synthetic_feedback(nlp_model, updates, seed=2)
+    seen = {message for message, _, _ in corpus_items + feedback_items}
+    test_items = [item for item in synthetic_feedback(nlp_model, 1000, seed=3) if item[0] not in seen]
+
+    results = {}
+    for engine in ('svc', 'online'):
+        with fresh_model(corpus_items, engine=engine) as model:
+            start = time.perf_counter()
+            for message, mood, intent in feedback_items:
+                model.retrain_with_feedback(message, mood, intent)
+            update_ms = (time.perf_counter() - start) / updates * 1000
+            mood_acc, intent_acc = accuracy(model, test_items)
+        results[engine] = {"update_ms": update_ms, "mood_accuracy": mood_acc, "intent_accuracy": intent_acc}
+
+    print(f"=== ACTUALIZACIÓN CON FEEDBACK (corpus de {corpus_size} ejemplos) ===")
+    for engine, result in results.items():
+        print(f"{engine:7s} {result['update_ms']:10.1f} ms/feedback   "
+              f"exactitud estado {result['mood_accuracy']:.3f}   intención {result['intent_accuracy']:.3f}")
+    return results
+
+
+def bench_compiled(nlp_model: BarranquillaNLPModel) -> Dict[str, Dict]:
+    """Paridad y latencia del modelo compilado en NumPy frente a scikit-learn"""
+    results = {}
+    print("=== MODELO COMPILADO (NumPy) ===")
+    for task, pipeline in (('mood', nlp_model.mood_classifier), ('intent', nlp_model.intent_classifier)):
+        compiled = CompiledPipeline.from_pipeline(pipeline)
+
+        # Paridad sobre el conjunto de entrenamiento y los mensajes de ejemplo
+        texts, _ = nlp_model.corpus.load_task(task, nlp_model.preprocess_text)
+        texts += [nlp_model.preprocess_text(message) for message in SAMPLE_MESSAGES]
+        parity = check_parity(pipeline, compiled, texts)
+
+        sklearn_us = time_per_call(lambda text: pipeline.predict_proba([text]), texts)
+        compiled_us = time_per_call(lambda text: compiled.predict_proba([text]), texts)
+        results[task] = dict(parity, sklearn_us=sklearn_us, compiled_us=compiled_us)
+        print(f"{task:7s} paridad en {parity['samples']} textos (dif. máx. {parity['max_abs_diff']:.1e})   "
+              f"scikit-learn {sklearn_us:7.1f} µs   compilado {compiled_us:7.1f} µs   "
+              f"({sklearn_us / compiled_us:.1f}x)")
+    return results
+
+
+def bench_shared(nlp_model: BarranquillaNLPModel, rounds: int = 5) -> Dict[str, Dict]:
+    """Inferencia con dos vectorizadores vs. un vectorizador compartido
+
+    Los cuatro modelos quedan abiertos y se alternan `rounds` veces; se
+    informa la mejor vuelta de cada uno (una sola pasada por modelo no
+    distingue la diferencia del ruido). Con el vocabulario conjunto, más
+    ancho, cada llamada a libsvm es más cara, así que la ganancia depende
+    del corpus; en la ruta compilada la vectorización ya es barata y la
+    diferencia es pequeña.
+    """
+    test_items = synthetic_feedback(nlp_model, 300, seed=3)
+    messages = [message for message, _, _ in test_items]
+
+    results = {}
+    with ExitStack() as stack:
+        models = {
+            f"{'compilado' if compiled else 'sklearn'}/{'compartido' if shared else 'separado'}":
+                stack.enter_context(fresh_model(shared_features=shared, compiled=compiled))
+            for compiled in (False, True) for shared in (False, True)
+        }
+        latencies = {}
+        for _ in range(rounds):
+            for name, model in models.items():
+                latency_us = time_per_call(model.predict_mood_and_intent, messages)
+                latencies[name] = min(latencies.get(name, float("inf")), latency_us)
+        for name, model in models.items():
+            mood_acc, intent_acc = accuracy(model, test_items)
+            results[name] = {"latency_us": latencies[name], "mood_accuracy": mood_acc, "intent_accuracy": intent_acc}
+
+    print(f"=== FEATURES COMPARTIDAS (estado de ánimo + intención, mejor de {rounds}) ===")
+    for name, result in results.items():
+        print(f"{name:22s} {result['latency_us']:8.1f} µs/mensaje   "
+              f"exactitud estado {result['mood_accuracy']:.3f}   intención {result['intent_accuracy']:.3f}")
+    return results
+
+
+def bench_profile_locks(nlp_model: BarranquillaNLPModel, threads: int = 16,
+                        updates: int = 250) -> Dict[str, float]:
+    """Prueba de estrés: muchos hilos actualizan el mismo perfil (y perfiles distintos)
+
+    Comprueba que no se pierde ninguna actualización: conversation_count
+    debe coincidir exactamente con el número de llamadas.
+    """
+    analysis = nlp_model.predict_mood_and_intent(SAMPLE_MESSAGES[0])
+    total = threads * updates
+    results = {}
+    print(f"=== ACTUALIZACIÓN CONCURRENTE DE PERFILES ({threads} hilos x {updates}) ===")
+    with fresh_model(flush_mode='interval') as model:
+        for name, user_for in (('mismo usuario', lambda t: 'estres'),
+                               ('usuarios distintos', lambda t: f'estres_{t}')):
+            def hammer(t: int):
+                for i in range(updates):
+                    model.update_user_profile(user_for(t), SAMPLE_MESSAGES[i % len(SAMPLE_MESSAGES)],
+                                              feedback='ok', rating=4, analysis=analysis)
+
+            start = time.perf_counter()
+            with ThreadPoolExecutor(threads) as pool:
+                list(pool.map(hammer, range(threads)))
+            elapsed = time.perf_counter() - start
+
+            counted = sum(model.user_profiles[user_id].conversation_count
+                          for user_id in {user_for(t) for t in range(threads)})
+            if counted != total:
+                raise AssertionError(f"Se perdieron actualizaciones ({name}): {counted} de {total}")
+            results[name] = total / elapsed
+            print(f"{name:20s} {total / elapsed:10.0f} actualizaciones/s   conversation_count {counted}/{total}")
+    return results
+
+
+def legacy_preprocess(text: str) -> str:
+    """Normalización original: dos re.sub sin precompilar por llamada"""
+    text = text.lower()
+    text = re.sub(r'[^\w\s]', '', text)
+    text = re.sub(r'\s+', ' ', text).strip()
+    return text
+
+
+def bench_normalization(nlp_model: BarranquillaNLPModel, size: int = 100000) -> Dict[str, float]:
+    """Throughput de normalización sobre un corpus grande de mensajes"""
+    rng = random.Random(4)
+    decorations = ['¿{}?', '¡{}!', '{}...', '{}, porfa', '{} 😊', '{}']
+    messages = [
+        rng.choice(decorations).format(message.capitalize())
+        for message, _, _ in synthetic_feedback(nlp_model, size, seed=4)
+    ]
+
+    def throughput(fn: Callable[[List[str]], object]) -> float:
+        start = time.perf_counter()
+        fn(messages)
+        return size / (time.perf_counter() - start)
+
+    compiled = TextNormalizer(cache_size=0)
+    folding = TextNormalizer(fold_accents=True, cache_size=0)
+    memoized = TextNormalizer()
+    # Tráfico repetido: las frases más comunes llegan muchas veces
+    repeated = [messages[min(int(rng.paretovariate(1.2)), size) - 1] for _ in range(size)]
+    results = {
+        "legacy": throughput(lambda texts: [legacy_preprocess(text) for text in texts]),
+        "compiled": throughput(lambda texts: [compiled.normalize(text) for text in texts]),
+        "compiled_fold_accents": throughput(lambda texts: [folding.normalize(text) for text in texts]),
+        "batch": throughput(compiled.normalize_batch),
+        "batch_fold_accents": throughput(folding.normalize_batch),
+    }
+    start = time.perf_counter()
+    for text in repeated:
+        memoized.normalize(text)
+    results["memoized_repeated"] = size / (time.perf_counter() - start)
+    stats = memoized.cache_stats()
+
+    print(f"=== NORMALIZACIÓN DE TEXTO ({size} mensajes, {len(set(messages))} distintos) ===")
+    print(f"Original (re.sub):            {results['legacy']:10.0f} mensajes/s")
+    print(f"Precompilada:                 {results['compiled']:10.0f} mensajes/s")
+    print(f"Precompilada sin tildes:      {results['compiled_fold_accents']:10.0f} mensajes/s")
+    print(f"Por lotes:                    {results['batch']:10.0f} mensajes/s")
+    print(f"Por lotes sin tildes:         {results['batch_fold_accents']:10.0f} mensajes/s")
+    print(f"Memoizada (tráfico repetido): {results['memoized_repeated']:10.0f} mensajes/s   "
+          f"(aciertos {stats['hits'] / size:.0%})")
+    return results
+
+
+def bench_metrics(nlp_model: BarranquillaNLPModel, repeat: int = 200000) -> Dict[str, float]:
+    """Costo de la instrumentación frente a una predicción sin caché"""
+    histogram = Histogram('bench_seconds', 'benchmark', ['stage']).labels('bench')
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        histogram.observe(0.001)
+    observe_ns = (time.perf_counter() - start) / repeat * 1e9
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        with histogram.time():
+            pass
+    timer_ns = (time.perf_counter() - start) / repeat * 1e9
+
+    predict_us = time_per_call(nlp_model.predict_mood_and_intent, SAMPLE_MESSAGES)
+    # /update_profile mide 6 etapas más la petición completa
+    per_request_us = 7 * timer_ns / 1000
+
+    print("=== INSTRUMENTACIÓN ===")
+    print(f"observe():            {observe_ns:8.0f} ns")
+    print(f"with time():          {timer_ns:8.0f} ns")
+    print(f"Predicción sin caché: {predict_us:8.1f} µs (instrumentada)")
+    print(f"Sobrecosto estimado por petición: {per_request_us:.1f} µs "
+          f"({per_request_us / predict_us:.1%} de una predicción)")
+    return {"observe_ns": observe_ns, "timer_ns": timer_ns, "predict_us": predict_us}
+
+
+def bench_personalization(nlp_model: BarranquillaNLPModel, users: int = 200,
+                          turns: int = 20000, rounds: int = 5) -> Dict[str, float]:
+    """Contexto para DeepSeek generado en cada turno frente a la caché por versión de perfil
+
+    Cada turno es de un usuario al azar; uno de cada diez modifica su
+    perfil antes de pedir el contexto (como /update_profile). Ambos modos
+    siguen a /personalized_context: los insights salen de
+    get_user_insights y, con caché, solo se calculan al fallar. Los modos
+    se alternan `rounds` veces y se informa la mejor vuelta de cada uno.
+    """
+    rng = random.Random(8)
+    intents = ["comer", "cultura", "entretenimiento", "naturaleza", "relajacion"]
+    user_ids = [f"contexto_{user}" for user in range(users)]
+    for user_id in user_ids:
+        profile = nlp_model.user_profiles[user_id] = UserProfile()
+        profile.conversation_count = rng.randint(0, 40)
+        for i in range(rng.randint(0, 20)):
+            profile.record_mood(rng.choice(["feliz", "estresado", "relajado", "energetico"]), 0.7)
+            profile.add_preference(rng.choice(intents))
+            profile.rate_location(f"lugar_{user_id}_{i}", rng.randint(1, 5), rng.choice(intents))
+    analysis = [nlp_model.predict_mood_and_intent(message) for message in SAMPLE_MESSAGES]
+    schedule = [(rng.choice(user_ids), rng.choice(analysis), rng.random() < 0.1) for _ in range(turns)]
+
+    def generate(user_id: str, mood: str, mood_conf: float, intent: str, intent_conf: float):
+        profile = nlp_model.user_profiles[user_id]
+        deepseek_context(profile, nlp_model.get_user_insights(user_id), mood, intent, mood_conf, intent_conf)
+
+    def cached(user_id: str, mood: str, mood_conf: float, intent: str, intent_conf: float):
+        profile = nlp_model.user_profiles[user_id]
+        entry = cache.get((user_id, profile.version))
+        if entry is None:
+            insights = nlp_model.get_user_insights(user_id)
+            entry = (insights, profile_context(profile, insights))
+            cache.put((user_id, profile.version), entry)
+        render_context(entry[1], mood, intent, mood_conf, intent_conf)
+
+    results = {"generar": float("inf"), "cache": float("inf")}
+    try:
+        for _ in range(rounds):
+            # Caché vacía en cada vuelta, como tras arrancar el servidor
+            cache = PredictionCache(maxsize=4096)
+            for mode, turn in (("generar", generate), ("cache", cached)):
+                start = time.perf_counter()
+                for user_id, (mood, mood_conf, intent, intent_conf), update in schedule:
+                    if update:
+                        nlp_model.user_profiles[user_id].record_mood(mood, mood_conf)
+                    turn(user_id, mood, mood_conf, intent, intent_conf)
+                results[mode] = min(results[mode], (time.perf_counter() - start) / turns * 1e6)
+    finally:
+        for user_id in user_ids:
+            del nlp_model.user_profiles[user_id]
+    results["hit_rate"] = cache.stats()["hit_rate"]
+
+    print(f"=== CONTEXTO PERSONALIZADO ({users} usuarios, {turns} turnos, mejor de {rounds}) ===")
+    print(f"Generado en cada turno: {results['generar']:6.2f} µs/turno")
+    print(f"Con caché por versión:  {results['cache']:6.2f} µs/turno (aciertos {results['hit_rate']:.0%})")
+    return results
+
+
+def bench_places(nlp_model: BarranquillaNLPModel, users: int = 20000, places: int = 300,
+                 ratings_per_user: int = 10) -> Dict[str, float]:
+    """Top-k global de lugares: índice incremental frente a recorrer todos los perfiles"""
+    rng = random.Random(9)
+    intents = ["comer", "cultura", "entretenimiento", "naturaleza"]
+    profiles = []
+    for _ in range(users):
+        profile = UserProfile()
+        for _ in range(ratings_per_user):
+            profile.rate_location(f"lugar_{rng.randrange(places)}", rng.randint(1, 5), rng.choice(intents))
+        profiles.append(profile)
+
+    def scan(intent: str = None) -> List[Tuple[str, float]]:
+        totals = {}
+        for profile in profiles:
+            for place, rating, place_intent in profile.rated_places():
+                if intent is None or place_intent == intent:
+                    entry = totals.setdefault(place, [0, 0])
+                    entry[0] += rating
+                    entry[1] += 1
+        return sorted(((place, total / count) for place, (total, count) in totals.items()),
+                      key=lambda item: item[1], reverse=True)[:10]
+
+    start = time.perf_counter()
+    index = PlaceIndex()
+    index.rebuild(rating for profile in profiles for rating in profile.rated_places())
+    build_ms = (time.perf_counter() - start) * 1000
+    scan_ms = min(time_per_call(scan, [None, "comer"], repeat=4) for _ in range(2)) / 1000
+    index_us = time_per_call(lambda intent: index.top_places(10, intent), [None, "comer"], repeat=2000)
+    rate_us = time_per_call(lambda place: index.rate(place, 4, "comer", 3, "cultura"),
+                            [f"lugar_{i}" for i in range(places)], repeat=20000)
+    # Historial de un usuario con muchas calificaciones: dos ordenamientos frente a heaps
+    ratings = {f"lugar_{i}": rng.randint(1, 5) for i in range(places)}
+    sort_us = time_per_call(lambda r: (sorted(r.items(), key=lambda x: x[1], reverse=True)[:5],
+                                       sorted(r.items(), key=lambda x: x[1])[:3]), [ratings], repeat=2000)
+    heap_us = time_per_call(lambda r: (top_rated(r, 5), top_rated(r, 3, lowest=True)), [ratings], repeat=2000)
+
+    print(f"=== LUGARES ({users} usuarios, {places} lugares, {index.stats()['ratings']} calificaciones) ===")
+    print(f"Construir el índice:        {build_ms:8.1f} ms (una vez, al cargar los perfiles)")
+    print(f"Top 10 recorriendo perfiles: {scan_ms:8.1f} ms")
+    print(f"Top 10 con el índice:        {index_us:8.1f} µs")
+    print(f"Calificar (actualización):   {rate_us:8.2f} µs")
+    print(f"Mejores/peores de un usuario ({places} lugares): ordenar {sort_us:.1f} µs, heap {heap_us:.1f} µs")
+    return {"build_ms": build_ms, "scan_ms": scan_ms, "index_us": index_us, "rate_us": rate_us,
+            "sort_us": sort_us, "heap_us": heap_us}
+
+
+def bench_microbatch(nlp_model: BarranquillaNLPModel, requests: int = 512,
+                     levels: Tuple[int, ...] = (1, 4, 16, 64), window_ms: float = 2.0) -> Dict[str, Dict]:
+    """Throughput y latencia de cola de predict_mood_and_intent con y sin micro-batching"""
+    messages = [message for message, _, _ in synthetic_feedback(nlp_model, requests, seed=5)]
+
+    def run(concurrency: int) -> Dict[str, float]:
+        def timed(message):
+            start = time.perf_counter()
+            nlp_model.predict_mood_and_intent(message)
+            return time.perf_counter() - start
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(concurrency) as pool:
+            latencies = sorted(pool.map(timed, messages))
+        elapsed = time.perf_counter() - start
+        return {
+            "requests_per_s": requests / elapsed,
+            "p50_ms": latencies[len(latencies) // 2] * 1000,
+            "p99_ms": latencies[int(len(latencies) * 0.99)] * 1000
+        }
+
+    previous = nlp_model.batcher
+    results = {}
+    print(f"=== MICRO-BATCHING ({requests} mensajes distintos, ventana {window_ms} ms) ===")
+    print(f"{'hilos':>5s} {'modo':>12s} {'pet/s':>9s} {'p50 ms':>8s} {'p99 ms':>8s}")
+    try:
+        for concurrency in levels:
+            for mode in ("sin_lotes", "micro_batch"):
+                nlp_model.batcher = MicroBatcher(nlp_model._classify_processed, window_ms) if mode == "micro_batch" else None
+                try:
+                    result = results[f"{mode}_{concurrency}"] = run(concurrency)
+                finally:
+                    if nlp_model.batcher is not None:
+                        nlp_model.batcher.close()
+                print(f"{concurrency:5d} {mode:>12s} {result['requests_per_s']:9.0f} "
+                      f"{result['p50_ms']:8.2f} {result['p99_ms']:8.2f}")
+    finally:
+        nlp_model.batcher = previous
+    return results
+
+
+def bench_exact_match(nlp_model: BarranquillaNLPModel, size: int = 2000,
+                      exact_share: float = 0.3, rounds: int = 3) -> Dict[str, Dict]:
+    """Throughput con y sin el índice de coincidencias exactas
+
+    Tráfico con `exact_share` de mensajes que repiten (con otra puntuación
+    y mayúsculas) una frase del corpus o un feedback, y el resto nuevos.
+    Los modos se alternan `rounds` veces y se informa la mejor vuelta.
+    """
+    rng = random.Random(6)
+    feedback = synthetic_feedback(nlp_model, 50, seed=6)
+    phrases = [text for text, _ in nlp_model.mood_dataset + nlp_model.intent_dataset]
+    phrases += [message for message, _, _ in feedback]
+    novel = [message for message, _, _ in synthetic_feedback(nlp_model, size, seed=7)]
+    messages = [
+        f"¡{rng.choice(phrases).capitalize()}!" if rng.random() < exact_share else novel[i]
+        for i in range(size)
+    ]
+
+    # Un modelo propio por modo: el recibido no se modifica (y puede tener
+    # el índice desactivado)
+    results = {}
+    with fresh_model(exact_match=False) as plain, fresh_model(exact_match=True) as indexed:
+        models = {"sin_indice": plain, "indice": indexed}
+        elapsed = {}
+        for model in models.values():
+            # El feedback llega al corpus y, tras reentrenar, al índice
+            model.retrain_with_feedback_batch(feedback)
+        for _ in range(rounds):
+            for mode, model in models.items():
+                start = time.perf_counter()
+                for message in messages:
+                    model.predict_mood_and_intent(message)
+                elapsed[mode] = min(elapsed.get(mode, float("inf")), time.perf_counter() - start)
+        for mode, model in models.items():
+            stats = model.phrase_index.stats() if model.phrase_index is not None else None
+            results[mode] = {
+                "msgs_per_s": size / elapsed[mode],
+                "hit_rate": stats['hit_rate'] if stats else 0.0,
+                "partial_hit_rate": stats['any_hit_rate'] - stats['hit_rate'] if stats else 0.0
+            }
+
+    print(f"=== COINCIDENCIAS EXACTAS ({size} mensajes, {exact_share:.0%} repetidos del corpus, "
+          f"mejor de {rounds}) ===")
+    print(f"Sin índice: {results['sin_indice']['msgs_per_s']:8.0f} mensajes/s")
+    print(f"Con índice: {results['indice']['msgs_per_s']:8.0f} mensajes/s   "
+          f"(aciertos {results['indice']['hit_rate']:.0%}, parciales {results['indice']['partial_hit_rate']:.0%})")
+    return results
+
+
+def _allocated_bytes(build: Callable[[], object]) -> Tuple[object, int]:
+    """Objeto construido y bytes que quedan asignados para mantenerlo"""
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        result = build()
+        return result, tracemalloc.get_traced_memory()[0] - before
+    finally:
+        tracemalloc.stop()
+
+
+def bench_profile_memory(nlp_model: BarranquillaNLPModel, users: int = 20000) -> Dict[str, float]:
+    """Memoria por perfil: dict de listas de dicts (formato original) vs. UserProfile"""
+    sample = UserProfile()
+    for i in range(12):
+        message = SAMPLE_MESSAGES[i % len(SAMPLE_MESSAGES)]
+        mood, mood_conf, intent, _ = nlp_model.predict_mood_and_intent(message)
+        sample.record_mood(mood, mood_conf)
+        sample.add_preference(intent)
+        sample.record_interaction(message, mood, intent, feedback='me gustó', rating=5)
+    # Con rate_location, para que rating_sum, rating_count y las intenciones sean coherentes
+    sample.rate_location('Malecón del Río', 5, intent)
+    sample.rate_location('Museo del Caribe', 4, intent)
+    serialized = json.dumps(sample.to_dict(), ensure_ascii=False)
+
+    # Cada perfil se decodifica por separado, como al cargarlo del almacenamiento
+    dicts, dict_bytes = _allocated_bytes(lambda: [json.loads(serialized) for _ in range(users)])
+    compact, compact_bytes = _allocated_bytes(
+        lambda: [UserProfile.from_dict(json.loads(serialized)) for _ in range(users)]
+    )
+
+    results = {"dict_bytes": dict_bytes / users, "compact_bytes": compact_bytes / users}
+    print(f"=== MEMORIA POR PERFIL ({users} perfiles completos) ===")
+    print(f"dict (formato original): {results['dict_bytes']:8.0f} bytes/perfil")
+    print(f"UserProfile compacto:    {results['compact_bytes']:8.0f} bytes/perfil")
+    print(f"Reducción: {dict_bytes / compact_bytes:.1f}x")
+    return results
+
+
+def _post_json(url: str, payload: Dict) -> Dict:
+    request = urllib.request.Request(
+        url, data=json.dumps(payload).encode('utf-8'), headers={'Content-Type': 'application/json'}
+    )
+    with urllib.request.urlopen(request, timeout=30) as response:
+        return json.loads(response.read())
+
+
+def _load_client(base_url: str, client_id: int, duration: float) -> List[float]:
+    """Cliente de carga: alterna análisis y actualización de perfil durante `duration` segundos"""
+    latencies = []
+    deadline = time.monotonic() + duration
+    i = 0
+    while time.monotonic() < deadline:
+        message = SAMPLE_MESSAGES[i % len(SAMPLE_MESSAGES)]
+        start = time.perf_counter()
+        if i % 2:
+            _post_json(f"{base_url}/update_profile", {"user_id": f"carga_{client_id}", "message": message})
+        else:
+            _post_json(f"{base_url}/analyze_message", {"message": message})
+        latencies.append(time.perf_counter() - start)
+        i += 1
+    return latencies
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def bench_workers(nlp_model: BarranquillaNLPModel, workers: int = None, clients: int = 16,
+                  duration: float = 5.0) -> Dict[str, Dict]:
+    """Prueba de carga de prefork.py: un worker frente a N workers"""
+    workers = workers or max(2, os.cpu_count() or 1)
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'prefork.py')
+
+    results = {}
+    print(f"=== SERVIDOR PREFORK ({clients} clientes, {duration:.0f} s, {os.cpu_count()} CPU) ===")
+    with tempfile.TemporaryDirectory() as workdir:
+        for count in (1, workers):
+            port = _free_port()
+            base_url = f"http://127.0.0.1:{port}"
+            env = dict(os.environ, NLP_WORKERS=str(count), NLP_HOST='127.0.0.1', NLP_PORT=str(port))
+            process = subprocess.Popen([sys.executable, script], cwd=workdir, env=env,
+                                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            try:
+                # Esperar a que el maestro termine de precargar el modelo
+                for _ in range(600):
+                    try:
+                        urllib.request.urlopen(f"{base_url}/health", timeout=1).close()
+                        break
+                    except OSError:
+                        time.sleep(0.1)
+                with ProcessPoolExecutor(clients) as pool:
+                    futures = [pool.submit(_load_client, base_url, i, duration) for i in range(clients)]
+                    latencies = sorted(l for future in futures for l in future.result())
+            finally:
+                process.send_signal(signal.SIGTERM)
+                process.wait()
+
+            results[f"{count}_workers"] = {
+                "requests_per_s": len(latencies) / duration,
+                "p50_ms": latencies[len(latencies) // 2] * 1000,
+                "p95_ms": latencies[int(len(latencies) * 0.95)] * 1000
+            }
+            result = results[f"{count}_workers"]
+            print(f"{count:3d} worker(s) {result['requests_per_s']:8.0f} peticiones/s   "
+                  f"p50 {result['p50_ms']:6.1f} ms   p95 {result['p95_ms']:6.1f} ms")
+    return results
+
+
+BENCHMARKS = {
+    "inference": bench_inference,
+    "batch": bench_batch,
+    "online": bench_online,
+    "compiled": bench_compiled,
+    "shared": bench_shared,
+    "workers": bench_workers,
+    "profile_locks": bench_profile_locks,
+    "profile_memory": bench_profile_memory,
+    "normalization": bench_normalization,
+    "metrics": bench_metrics,
+    "microbatch": bench_microbatch,
+    "exact_match": bench_exact_match,
+    "personalization": bench_personalization,
+    "places": bench_places,
+}
+
+if __name__ == "__main__":
+    selected = sys.argv[1:] or list(BENCHMARKS)
+    original_dir = os.getcwd()
+    # Perfiles, corpus y pickles de las pruebas en un directorio temporal,
+    # no en el directorio de trabajo
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)
+        try:
+            # Sin caché de predicciones para medir la inferencia real
+            nlp_model = BarranquillaNLPModel(cache_size=0)
+            for name in selected:
+                BENCHMARKS[name](nlp_model)
+                print()
+            nlp_model.close()
+        finally:
+            os.chdir(original_dir)
@@ -0,0 +1,296 @@
+"""Inferencia compilada en NumPy para pipelines TF-IDF + SVC lineal
+
+Extrae de un Pipeline entrenado el vocabulario, los pesos idf, los
+coeficientes del SVC y la calibración de Platt (probA_/probB_) a arreglos
+NumPy. La predicción reproduce predict_proba de scikit-learn/libsvm sin
+pasar por el despacho ni la validación de entradas de scikit-learn.
+"""
+import re
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+# Constantes de libsvm (svm_predict_probability / multiclass_probability)
+MIN_PROB = 1e-7
+CHUNK_SIZE = 4096
+
+# Por debajo de este tamaño de lote el acoplamiento por pares se resuelve con
+# floats de Python: en arreglos diminutos domina el costo de cada llamada a NumPy
+SCALAR_BATCH_LIMIT = 8
+
+
+class CompiledTfidf:
+    """Equivalente de TfidfVectorizer.transform con analizador de palabras"""
+
+    def __init__(self, vocabulary: Dict[str, int], idf: np.ndarray, ngram_range=(1, 1),
+                 lowercase: bool = True, token_pattern: str = r"(?u)\b\w\w+\b", norm: str = 'l2',
+                 sublinear_tf: bool = False):
+        self.vocabulary = vocabulary
+        self.idf = np.asarray(idf, dtype=np.float64)
+        self.ngram_range = tuple(ngram_range)
+        self.lowercase = lowercase
+        self.token_pattern = token_pattern
+        self.norm = norm
+        self.sublinear_tf = sublinear_tf
+        self._token_re = re.compile(token_pattern)
+
+    @classmethod
+    def from_vectorizer(cls, vectorizer) -> 'CompiledTfidf':
+        """Extraer los parámetros de un TfidfVectorizer entrenado"""
+        if not hasattr(vectorizer, 'vocabulary_') or not hasattr(vectorizer, 'idf_'):
+            raise ValueError("Solo se pueden compilar vectorizadores TF-IDF entrenados")
+        unsupported = (
+            vectorizer.analyzer != 'word' or vectorizer.preprocessor is not None
+            or vectorizer.tokenizer is not None or vectorizer.strip_accents is not None
+            or vectorizer.stop_words is not None or not vectorizer.use_idf
+            or vectorizer.norm not in ('l2', None)
+        )
+        if unsupported:
+            raise ValueError("Configuración de TfidfVectorizer no soportada por el modelo compilado")
+        vocabulary = {term: int(index) for term, index in vectorizer.vocabulary_.items()}
+        return cls(vocabulary, vectorizer.idf_, vectorizer.ngram_range, vectorizer.lowercase,
+                   vectorizer.token_pattern, vectorizer.norm, vectorizer.sublinear_tf)
+
+    @property
+    def n_features(self) -> int:
+        return len(self.idf)
+
+    def analyze(self, text: str) -> List[str]:
+        """Tokens y n-gramas de palabras, igual que el analizador de scikit-learn"""
+        if self.lowercase:
+            text = text.lower()
+        tokens = self._token_re.findall(text)
+        min_n, max_n = self.ngram_range
+        if max_n == 1:
+            return tokens
+        ngrams = list(tokens) if min_n == 1 else []
+        for n in range(max(min_n, 2), min(max_n, len(tokens)) + 1):
+            ngrams.extend(" ".join(tokens[i:i + n]) for i in range(len(tokens) - n + 1))
+        return ngrams
+
+    def transform(self, texts: Sequence[str]) -> np.ndarray:
+        """Matriz densa TF-IDF (n_textos x n_features)"""
+        matrix = np.zeros((len(texts), self.n_features), dtype=np.float64)
+        vocabulary = self.vocabulary
+        for row, text in enumerate(texts):
+            for term in self.analyze(text):
+                column = vocabulary.get(term)
+                if column is not None:
+                    matrix[row, column] += 1.0
+        if self.sublinear_tf:
+            np.log(matrix, out=matrix, where=matrix > 0)
+            matrix[matrix != 0] += 1.0
+        matrix *= self.idf
+        if self.norm == 'l2':
+            norms = np.sqrt(np.einsum('ij,ij->i', matrix, matrix))
+            norms[norms == 0] = 1.0
+            matrix /= norms[:, None]
+        return matrix
+
+
+class CompiledSVC:
+    """SVC lineal uno-contra-uno con probabilidades de Platt y acoplamiento por pares"""
+
+    def __init__(self, classes: np.ndarray, coef: np.ndarray, intercept: np.ndarray,
+                 prob_a: np.ndarray, prob_b: np.ndarray):
+        self.classes_ = np.asarray(classes)
+        self.coef = np.ascontiguousarray(coef, dtype=np.float64)
+        self.intercept = np.asarray(intercept, dtype=np.float64)
+        self.prob_a = np.asarray(prob_a, dtype=np.float64)
+        self.prob_b = np.asarray(prob_b, dtype=np.float64)
+
+    @classmethod
+    def from_estimator(cls, estimator) -> 'CompiledSVC':
+        """Extraer coeficientes y calibración de un SVC(kernel='linear', probability=True)"""
+        if getattr(estimator, 'kernel', None) != 'linear' or len(getattr(estimator, 'probA_', [])) == 0:
+            raise ValueError("Solo se puede compilar SVC(kernel='linear', probability=True)")
+        coef = estimator.coef_
+        coef = coef.toarray() if hasattr(coef, 'toarray') else np.asarray(coef)
+        intercept = np.asarray(estimator.intercept_)
+        if len(estimator.classes_) == 2:
+            # scikit-learn invierte el signo respecto a libsvm en el caso binario
+            coef, intercept = -coef, -intercept
+        return cls(estimator.classes_, coef, intercept, estimator.probA_, estimator.probB_)
+
+    def decision_values(self, features: np.ndarray) -> np.ndarray:
+        """Valores de decisión uno-contra-uno en el orden de libsvm"""
+        return features @ self.coef.T + self.intercept
+
+    def predict(self, features: np.ndarray) -> np.ndarray:
+        """Etiquetas por votación uno-contra-uno, como SVC.predict"""
+        return self._vote(self.decision_values(features))
+
+    def predict_proba(self, features: np.ndarray) -> np.ndarray:
+        return self._probabilities(self.decision_values(features))
+
+    def predict_with_proba(self, features: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Etiquetas y probabilidades a partir de un solo cálculo de decisión"""
+        decision = self.decision_values(features)
+        return self._vote(decision), self._probabilities(decision)
+
+    def _vote(self, decision: np.ndarray) -> np.ndarray:
+        # Cada par (i, j) vota por i si su valor de decisión es positivo; en
+        # caso de empate gana la clase de menor índice, igual que libsvm
+        n_classes = len(self.classes_)
+        votes = np.zeros((len(decision), n_classes), dtype=np.int64)
+        pair = 0
+        for i in range(n_classes):
+            for j in range(i + 1, n_classes):
+                positive = decision[:, pair] > 0
+                votes[:, i] += positive
+                votes[:, j] += ~positive
+                pair += 1
+        return self.classes_[votes.argmax(axis=1)]
+
+    def _probabilities(self, decision: np.ndarray) -> np.ndarray:
+        n_classes = len(self.classes_)
+
+        # Sigmoide de Platt por par, como sigmoid_predict de libsvm
+        f_ab = decision * self.prob_a + self.prob_b
+        pairwise = np.where(
+            f_ab >= 0,
+            np.exp(-np.abs(f_ab)) / (1.0 + np.exp(-np.abs(f_ab))),
+            1.0 / (1.0 + np.exp(-np.abs(f_ab)))
+        )
+        pairwise = np.clip(pairwise, MIN_PROB, 1 - MIN_PROB)
+
+        if n_classes == 2:
+            return np.column_stack([pairwise[:, 0], 1.0 - pairwise[:, 0]])
+
+        if len(decision) <= SCALAR_BATCH_LIMIT:
+            return np.array([
+                multiclass_probability_scalar(row.tolist(), n_classes) for row in pairwise
+            ])
+
+        # r[:, i, j] = P(clase i | i o j)
+        r = np.zeros((len(decision), n_classes, n_classes))
+        pair = 0
+        for i in range(n_classes):
+            for j in range(i + 1, n_classes):
+                r[:, i, j] = pairwise[:, pair]
+                r[:, j, i] = 1.0 - pairwise[:, pair]
+                pair += 1
+        return multiclass_probability(r)
+
+
+def multiclass_probability_scalar(pairwise: List[float], k: int) -> List[float]:
+    """Acoplamiento por pares para una sola muestra, línea a línea como libsvm"""
+    r = [[0.0] * k for _ in range(k)]
+    pair = 0
+    for i in range(k):
+        for j in range(i + 1, k):
+            r[i][j] = pairwise[pair]
+            r[j][i] = 1.0 - pairwise[pair]
+            pair += 1
+
+    q = [[0.0] * k for _ in range(k)]
+    for t in range(k):
+        for j in range(k):
+            if j != t:
+                q[t][t] += r[j][t] * r[j][t]
+                q[t][j] = -r[j][t] * r[t][j]
+
+    p = [1.0 / k] * k
+    eps = 0.005 / k
+    for _ in range(max(100, k)):
+        qp = [sum(q_tj * p_j for q_tj, p_j in zip(q[t], p)) for t in range(k)]
+        pqp = sum(p_t * qp_t for p_t, qp_t in zip(p, qp))
+        if max(abs(qp_t - pqp) for qp_t in qp) < eps:
+            break
+        for t in range(k):
+            diff = (-qp[t] + pqp) / q[t][t]
+            p[t] += diff
+            scale = 1.0 + diff
+            pqp = (pqp + diff * (diff * q[t][t] + 2 * qp[t])) / scale / scale
+            q_t = q[t]
+            for j in range(k):
+                qp[j] = (qp[j] + diff * q_t[j]) / scale
+                p[j] /= scale
+    return p
+
+
+def multiclass_probability(r: np.ndarray) -> np.ndarray:
+    """Acoplamiento por pares (Wu, Lin y Weng, método 2), vectorizado por muestra
+
+    Reproduce multiclass_probability de libsvm, incluido el criterio de
+    parada por muestra, para obtener las mismas probabilidades.
+    """
+    n_samples, k, _ = r.shape
+    q = -r.transpose(0, 2, 1) * r
+    diagonal = np.einsum('sjt,sjt->st', r, r) - np.einsum('stt,stt->st', r, r)
+    idx = np.arange(k)
+    q[:, idx, idx] = diagonal
+
+    p = np.full((n_samples, k), 1.0 / k)
+    active = np.ones(n_samples, dtype=bool)
+    eps = 0.005 / k
+    for _ in range(max(100, k)):
+        qp = np.einsum('stj,sj->st', q, p)
+        pqp = np.einsum('st,st->s', p, qp)
+        max_error = np.abs(qp - pqp[:, None]).max(axis=1)
+        active &= max_error >= eps
+        if not active.any():
+            break
+        for t in range(k):
+            diff = np.where(active, (-qp[:, t] + pqp) / q[:, t, t], 0.0)
+            p[:, t] += diff
+            scale = 1.0 + diff
+            pqp = (pqp + diff * (diff * q[:, t, t] + 2 * qp[:, t])) / scale / scale
+            qp = (qp + diff[:, None] * q[:, t, :]) / scale[:, None]
+            p /= scale[:, None]
+    return p
+
+
+class CompiledPipeline:
+    """Reemplazo de Pipeline(TfidfVectorizer, SVC) con la misma interfaz de inferencia"""
+
+    def __init__(self, vectorizer: CompiledTfidf, classifier: CompiledSVC):
+        self.vectorizer = vectorizer
+        self.classifier = classifier
+
+    @classmethod
+    def from_pipeline(cls, pipeline) -> 'CompiledPipeline':
+        """Compilar un Pipeline([TfidfVectorizer, SVC]) entrenado"""
+        if len(pipeline.steps) != 2:
+            raise ValueError("Solo se pueden compilar pipelines TF-IDF + SVC")
+        return cls(CompiledTfidf.from_vectorizer(pipeline[0]), CompiledSVC.from_estimator(pipeline[-1]))
+
+    @property
+    def classes_(self) -> np.ndarray:
+        return self.classifier.classes_
+
+    def predict_proba(self, texts: Sequence[str]) -> np.ndarray:
+        chunks = [
+            self.classifier.predict_proba(self.vectorizer.transform(texts[start:start + CHUNK_SIZE]))
+            for start in range(0, len(texts), CHUNK_SIZE)
+        ]
+        if not chunks:
+            return np.zeros((0, len(self.classes_)))
+        return np.vstack(chunks)
+
+    def predict(self, texts: Sequence[str]) -> np.ndarray:
+        chunks = [
+            self.classifier.predict(self.vectorizer.transform(texts[start:start + CHUNK_SIZE]))
+            for start in range(0, len(texts), CHUNK_SIZE)
+        ]
+        if not chunks:
+            return self.classes_[:0]
+        return np.concatenate(chunks)
+
+
+def check_parity(pipeline, compiled: CompiledPipeline, texts: Sequence[str], atol: float = 1e-6) -> Dict:
+    """Comparar el modelo compilado con el pipeline de scikit-learn
+
+    Lanza AssertionError si alguna probabilidad difiere más de `atol` o si
+    alguna etiqueta de predict() no coincide.
+    """
+    expected = pipeline.predict_proba(texts)
+    actual = compiled.predict_proba(texts)
+    max_diff = float(np.abs(expected - actual).max()) if len(texts) else 0.0
+    same_labels = bool(np.array_equal(pipeline.predict(texts), compiled.predict(texts)))
+    if max_diff > atol or not same_labels:
+        raise AssertionError(
+            f"El modelo compilado no coincide: diferencia máxima {max_diff:.2e}, "
+            f"etiquetas iguales: {same_labels}"
+        )
+    return {'samples': len(texts), 'max_abs_diff': max_diff, 'labels_match': same_labels}
@@ -0,0 +1,355 @@
+"""Prueba de carga de los endpoints de server.py con tráfico de chat sintético
+
+Cada endpoint recibe `--requests` peticiones (con `--concurrency` clientes en
+paralelo) y se informa el throughput y la latencia p50/p95/p99. Los
+resultados se pueden guardar como línea base y comparar en ejecuciones
+posteriores para detectar regresiones.
+
+Uso (desde src/screens):
+    python load_test.py                                   # cliente de pruebas de Flask
+    python load_test.py --url http://127.0.0.1:8080       # servidor en marcha
+    python load_test.py --asgi                            # modo asíncrono (asgi_app.py)
+    python load_test.py --save-baseline baseline.json
+    python load_test.py --baseline baseline.json          # falla si hay regresiones
+
+En proceso (Flask o ASGI), server.py se importa en un directorio temporal
+(modelo, corpus y perfiles nuevos), salvo que se indique --workdir.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+MOOD_PHRASES = [
+    "estoy muy estresado", "me siento feliz", "ando cansado", "estoy aburrido",
+    "me siento romántico", "tengo mucha energía", "estoy tranquilo", "ando aventurero",
+]
+INTENT_PHRASES = [
+    "quiero comer algo típico", "busco un bar para rumbear", "dónde hay un museo",
+    "quiero ir a la playa", "recomiéndame un parque", "busco un restaurante romántico",
+    "qué hay para hacer en el carnaval", "quiero un spa para relajarme",
+]
+FILLERS = ["", "hoy", "por favor", "este fin de semana", "con mis amigos", "cerca del malecón", "¿qué me recomiendas?"]
+PLACES = [
+    "Malecón del Río", "Museo del Caribe", "La Cueva", "Parque Venezuela",
+    "Bocas de Ceniza", "Castillo de Salgar", "Frogg Leggs", "Puerto Colombia",
+]
+# Etiquetas del conjunto semilla: el feedback no agrega clases nuevas
+MOODS = ["aventurero", "cultural", "energetico", "estresado", "relajado", "romantico"]
+INTENTS = ["comer", "compras", "cultura", "descanso", "entretenimiento", "naturaleza"]
+
+PERCENTILES = (50, 95, 99)
+# Diferencias de latencia por debajo de este valor se consideran ruido
+MIN_REGRESSION_MS = 0.5
+
+
+class TrafficGenerator:
+    """Mensajes y payloads sintéticos en español para cada endpoint"""
+
+    def __init__(self, users: int = 50, seed: int = 0):
+        self.rng = random.Random(seed)
+        self.users = [f"carga_{i}" for i in range(users)]
+
+    def message(self) -> str:
+        rng = self.rng
+        return f"{rng.choice(MOOD_PHRASES)} y {rng.choice(INTENT_PHRASES)} {rng.choice(FILLERS)}".strip()
+
+    def user_id(self) -> str:
+        return self.rng.choice(self.users)
+
+    def analyze_message(self) -> Dict:
+        return {"message": self.message()}
+
+    def analyze_batch(self) -> Dict:
+        return {"messages": [self.message() for _ in range(16)]}
+
+    def update_profile(self) -> Dict:
+        payload = {"user_id": self.user_id(), "message": self.message()}
+        if self.rng.random() < 0.3:
+            payload.update(feedback="me gustó", rating=self.rng.randint(1, 5))
+        return payload
+
+    def user_only(self) -> Dict:
+        return {"user_id": self.user_id()}
+
+    def personalized_context(self) -> Dict:
+        return {"user_id": self.user_id(), "message": self.message()}
+
+    def save_interaction(self) -> Dict:
+        return {
+            "user_id": self.user_id(),
+            "user_message": self.message(),
+            "bot_response": "Te recomiendo visitar este lugar",
+            "recommended_place": self.rng.choice(PLACES),
+            "rating": self.rng.randint(1, 5)
+        }
+
+    def top_places(self) -> Dict:
+        intent = self.rng.choice(INTENTS) if self.rng.random() < 0.5 else None
+        return {"intent": intent, "limit": 10}
+
+    def feedback(self) -> Dict:
+        return {
+            "message": self.message(),
+            "correct_mood": self.rng.choice(MOODS),
+            "correct_intent": self.rng.choice(INTENTS)
+        }
+
+
+# (nombre, método, ruta, payload). El orden importa: los perfiles se crean
+# antes de leerlos y /feedback va al final porque dispara reentrenamientos
+ENDPOINTS: List[Tuple[str, str, str, Optional[Callable[[TrafficGenerator], Dict]]]] = [
+    ("health", "GET", "/health", None),
+    ("analyze_message", "POST", "/analyze_message", TrafficGenerator.analyze_message),
+    ("analyze_batch", "POST", "/analyze_batch", TrafficGenerator.analyze_batch),
+    ("update_profile", "POST", "/update_profile", TrafficGenerator.update_profile),
+    ("save_interaction", "POST", "/save_interaction", TrafficGenerator.save_interaction),
+    ("get_user_profile", "POST", "/get_user_profile", TrafficGenerator.user_only),
+    ("personalized_context", "POST", "/personalized_context", TrafficGenerator.personalized_context),
+    ("get_recommendations_history", "POST", "/get_recommendations_history", TrafficGenerator.user_only),
+    ("top_places", "POST", "/top_places", TrafficGenerator.top_places),
+    ("retrain_status", "GET", "/retrain_status", None),
+    ("metrics", "GET", "/metrics", None),
+    ("feedback", "POST", "/feedback", TrafficGenerator.feedback),
+]
+
+
+class FlaskClientTransport:
+    """Peticiones en proceso con el cliente de pruebas de Flask"""
+
+    def __init__(self, app):
+        self.app = app
+
+    def request(self, method: str, path: str, payload: Optional[Dict]) -> int:
+        # Un cliente por petición: el cliente de pruebas no es seguro entre hilos
+        response = self.app.test_client().open(path, method=method, json=payload)
+        return response.status_code
+
+
+class ASGITransport:
+    """Peticiones en proceso a la aplicación ASGI, con su propio bucle de eventos"""
+
+    def __init__(self, app):
+        self.app = app
+        self.loop = asyncio.new_event_loop()
+        threading.Thread(target=self.loop.run_forever, name='load-test-asgi', daemon=True).start()
+
+    def request(self, method: str, path: str, payload: Optional[Dict]) -> int:
+        return asyncio.run_coroutine_threadsafe(self._request(method, path, payload), self.loop).result()
+
+    async def _request(self, method: str, path: str, payload: Optional[Dict]) -> int:
+        body = json.dumps(payload).encode('utf-8') if payload is not None else b''
+        scope = {
+            'type': 'http', 'http_version': '1.1', 'method': method, 'scheme': 'http',
+            'path': path, 'root_path': '', 'query_string': b'',
+            'headers': [(b'content-type', b'application/json')],
+            'server': ('127.0.0.1', 80), 'client': ('127.0.0.1', 0)
+        }
+        messages = [{'type': 'http.request', 'body': body, 'more_body': False}]
+        response = {}
+
+        async def receive():
+            if messages:
+                return messages.pop()
+            # El cliente no se desconecta mientras espera la respuesta
+            await asyncio.Event().wait()
+
+        async def send(message):
+            if message['type'] == 'http.response.start':
+                response['status'] = message['status']
+
+        await self.app(scope, receive, send)
+        return response['status']
+
+
+class HTTPTransport:
+    """Peticiones HTTP a un servidor en marcha (server.py o prefork.py)"""
+
+    def __init__(self, base_url: str):
+        self.base_url = base_url.rstrip('/')
+
+    def request(self, method: str, path: str, payload: Optional[Dict]) -> int:
+        data = json.dumps(payload).encode('utf-8') if payload is not None else None
+        request = urllib.request.Request(
+            f"{self.base_url}{path}", data=data, method=method,
+            headers={'Content-Type': 'application/json'}
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=30) as response:
+                response.read()
+                return response.status
+        except urllib.error.HTTPError as e:
+            return e.code
+
+
+def percentile(sorted_values: List[float], p: float) -> float:
+    """Percentil por el método del rango más cercano"""
+    index = min(len(sorted_values) - 1, max(0, int(round(p / 100 * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def run_endpoint(transport, method: str, path: str, payloads: List[Optional[Dict]],
+                 concurrency: int = 1) -> Dict:
+    """Enviar todas las peticiones de un endpoint y resumir latencias y errores"""
+    def timed(payload):
+        start = time.perf_counter()
+        status = transport.request(method, path, payload)
+        return time.perf_counter() - start, status
+
+    start = time.perf_counter()
+    if concurrency > 1:
+        with ThreadPoolExecutor(concurrency) as pool:
+            results = list(pool.map(timed, payloads))
+    else:
+        results = [timed(payload) for payload in payloads]
+    elapsed = time.perf_counter() - start
+
+    latencies = sorted(latency * 1000 for latency, _ in results)
+    summary = {
+        "requests": len(results),
+        "errors": sum(1 for _, status in results if status >= 400),
+        "throughput_rps": len(results) / elapsed,
+        "mean_ms": sum(latencies) / len(latencies),
+    }
+    for p in PERCENTILES:
+        summary[f"p{p}_ms"] = percentile(latencies, p)
+    return summary
+
+
+def run_suite(transport, requests: int = 200, concurrency: int = 1, seed: int = 0,
+              endpoints: List[str] = None) -> Dict[str, Dict]:
+    """Recorrer los endpoints en orden y devolver el resumen de cada uno"""
+    traffic = TrafficGenerator(seed=seed)
+    results = {}
+    for name, method, path, build in ENDPOINTS:
+        if endpoints and name not in endpoints:
+            continue
+        payloads = [build(traffic) if build else None for _ in range(requests)]
+        # Calentamiento: primera petición fuera de la medición
+        transport.request(method, path, payloads[0])
+        results[name] = run_endpoint(transport, method, path, payloads, concurrency)
+    return results
+
+
+def compare(results: Dict[str, Dict], baseline: Dict[str, Dict], tolerance: float = 0.2) -> List[str]:
+    """Regresiones respecto a la línea base: latencia p95/p99 o throughput peor que `tolerance`"""
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if not previous:
+            continue
+        for key in ("p95_ms", "p99_ms"):
+            if (current[key] > previous[key] * (1 + tolerance)
+                    and current[key] - previous[key] > MIN_REGRESSION_MS):
+                regressions.append(f"{name}: {key} {previous[key]:.2f} -> {current[key]:.2f} ms")
+        if current["throughput_rps"] < previous["throughput_rps"] * (1 - tolerance):
+            regressions.append(
+                f"{name}: throughput {previous['throughput_rps']:.0f} -> {current['throughput_rps']:.0f} peticiones/s"
+            )
+        if current["errors"] > previous.get("errors", 0):
+            regressions.append(f"{name}: errores {previous.get('errors', 0)} -> {current['errors']}")
+    return regressions
+
+
+def print_results(results: Dict[str, Dict], baseline: Dict[str, Dict] = None):
+    print(f"{'endpoint':30s} {'pet/s':>9s} {'p50 ms':>8s} {'p95 ms':>8s} {'p99 ms':>8s} {'errores':>8s}")
+    for name, result in results.items():
+        line = (f"{name:30s} {result['throughput_rps']:9.0f} {result['p50_ms']:8.2f} "
+                f"{result['p95_ms']:8.2f} {result['p99_ms']:8.2f} {result['errors']:8d}")
+        previous = (baseline or {}).get(name)
+        if previous:
+            line += f"   (p95 base {previous['p95_ms']:.2f} ms)"
+        print(line)
+
+
+def load_baseline(path: str) -> Dict:
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_baseline(path: str, results: Dict[str, Dict], settings: Dict):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({
+            "created_at": datetime.now().isoformat(),
+            "settings": settings,
+            "endpoints": results
+        }, f, ensure_ascii=False, indent=2)
+
+
+def in_process_transport(workdir: str, use_asgi: bool = False):
+    """Importar server.py (o asgi_app.py) con `workdir` como directorio de trabajo"""
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    os.chdir(workdir)
+    if use_asgi:
+        import asgi_app
+        return ASGITransport(asgi_app.create_app())
+    import server
+    return FlaskClientTransport(server.app)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prueba de carga de los endpoints del servidor NLP")
+    parser.add_argument('--url', help="URL de un servidor en marcha (por defecto, cliente de pruebas de Flask)")
+    parser.add_argument('--asgi', action='store_true', help="Probar en proceso la aplicación ASGI (asgi_app.py)")
+    parser.add_argument('--workdir', help="Directorio de trabajo para el cliente de pruebas (por defecto, temporal)")
+    parser.add_argument('--requests', type=int, default=200, help="Peticiones por endpoint")
+    parser.add_argument('--concurrency', type=int, default=1, help="Clientes en paralelo")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--endpoint', action='append', help="Probar solo este endpoint (se puede repetir)")
+    parser.add_argument('--baseline', help="Línea base JSON con la que comparar")
+    parser.add_argument('--save-baseline', help="Guardar los resultados como línea base JSON")
+    parser.add_argument('--tolerance', type=float, default=0.2, help="Empeoramiento tolerado (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    # Rutas absolutas antes de cambiar de directorio
+    baseline_path = os.path.abspath(args.baseline) if args.baseline else None
+    save_path = os.path.abspath(args.save_baseline) if args.save_baseline else None
+    baseline = load_baseline(baseline_path) if baseline_path else None
+    settings = {
+        "target": "http" if args.url else "asgi" if args.asgi else "flask",
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "seed": args.seed
+    }
+
+    if args.url:
+        transport = HTTPTransport(args.url)
+        target = args.url
+    else:
+        workdir = args.workdir or tempfile.mkdtemp(prefix='nlp_load_test_')
+        transport = in_process_transport(workdir, args.asgi)
+        target = f"{'aplicación ASGI' if args.asgi else 'cliente de pruebas de Flask'} ({workdir})"
+
+    print(f"=== PRUEBA DE CARGA: {target}, {args.requests} peticiones por endpoint, "
+          f"{args.concurrency} cliente(s) ===")
+    results = run_suite(transport, args.requests, args.concurrency, args.seed, args.endpoint)
+    print_results(results, baseline["endpoints"] if baseline else None)
+
+    if save_path:
+        save_baseline(save_path, results, settings)
+        print(f"Línea base guardada en {save_path}")
+
+    if baseline is not None:
+        if baseline.get("settings") != settings:
+            print(f"\n⚠️  La línea base se midió con otra configuración: {baseline.get('settings')}")
+        regressions = compare(results, baseline["endpoints"], args.tolerance)
+        if regressions:
+            print(f"\n❌ {len(regressions)} regresión(es) respecto a la línea base:")
+            for regression in regressions:
+                print(f"  - {regression}")
+            sys.exit(1)
+        print("\n✅ Sin regresiones respecto a la línea base")
+
+
+if __name__ == '__main__':
+    main()
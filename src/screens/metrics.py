@@ -0,0 +1,254 @@
+"""Métricas del servidor NLP en formato de texto de Prometheus
+
+Contadores e histogramas con buckets fijos, pensados para dejarse activos
+en producción: observar un valor es una búsqueda binaria y una suma bajo
+un candado propio de la serie, sin asignar memoria. Los valores que ya
+mantienen otros componentes (cachés, escritura diferida) se leen solo al
+generar el texto, mediante funciones registradas con gauge().
+
+Las métricas son por proceso: con prefork.py cada worker expone las suyas.
+"""
+import threading
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, List, Sequence, Tuple, Union
+
+# Segundos: de 50 µs (predicción en caché) a 30 s (reentrenamiento completo)
+DEFAULT_BUCKETS = (
+    0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+    0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0
+)
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _CounterChild:
+    __slots__ = ('value', '_lock')
+
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1):
+        with self._lock:
+            self.value += amount
+
+
+class Counter:
+    """Contador monótono, opcionalmente con etiquetas"""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], _CounterChild] = {}
+        self._lock = threading.Lock()
+        if not self.labelnames:
+            # Sin etiquetas la serie existe (en cero) desde el principio
+            self.labels()
+
+    def labels(self, *values) -> _CounterChild:
+        """Serie de estas etiquetas (conviene guardarla si se usa en una ruta caliente)"""
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, _CounterChild())
+        return child
+
+    def inc(self, amount: float = 1):
+        self.labels().inc(amount)
+
+    def render(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} counter']
+        for values, child in sorted(self._children.items()):
+            lines.append(f'{self.name}{_format_labels(self.labelnames, values)} {_format_value(child.value)}')
+        return lines
+
+
+class _HistogramChild:
+    __slots__ = ('_bounds', 'counts', 'sum', '_lock')
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self._bounds = bounds
+        # Un contador por bucket (no acumulado) más el de +Inf
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        index = bisect_left(self._bounds, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    def time(self) -> '_Timer':
+        """Medir la duración de un bloque `with`"""
+        return _Timer(self)
+
+    def snapshot(self) -> Tuple[List[int], float]:
+        with self._lock:
+            return list(self.counts), self.sum
+
+
+class _Timer:
+    __slots__ = ('_child', '_start')
+
+    def __init__(self, child: _HistogramChild):
+        self._child = child
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._child.observe(time.perf_counter() - self._start)
+        return False
+
+
+class Histogram:
+    """Histograma de duraciones (en segundos) con buckets fijos"""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._children: Dict[Tuple[str, ...], _HistogramChild] = {}
+        self._lock = threading.Lock()
+        if not self.labelnames:
+            self.labels()
+
+    def labels(self, *values) -> _HistogramChild:
+        """Serie de estas etiquetas (conviene guardarla si se usa en una ruta caliente)"""
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, _HistogramChild(self.buckets))
+        return child
+
+    def observe(self, value: float):
+        self.labels().observe(value)
+
+    def render(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        for values, child in sorted(self._children.items()):
+            counts, total = child.snapshot()
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f'{self.name}_bucket{_format_labels(self.labelnames, values, le)} {cumulative}')
+            labels = _format_labels(self.labelnames, values)
+            lines.append(f'{self.name}_sum{labels} {_format_value(total)}')
+            lines.append(f'{self.name}_count{labels} {cumulative}')
+        return lines
+
+
+class _Gauge:
+    """Valor leído al generar el texto (un número o un dict etiquetas -> número)"""
+
+    def __init__(self, name: str, documentation: str, read: Callable, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.read = read
+        self.labelnames = tuple(labelnames)
+
+    def render(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} gauge']
+        try:
+            value = self.read()
+        except Exception as e:
+            print(f"Error leyendo la métrica {self.name}: {e}")
+            return lines
+        items = value.items() if isinstance(value, dict) else [((), value)]
+        for values, number in sorted(items):
+            if number is None:
+                continue
+            values = values if isinstance(values, tuple) else (values,)
+            lines.append(f'{self.name}{_format_labels(self.labelnames, values)} {_format_value(number)}')
+        return lines
+
+
+class MetricsRegistry:
+    """Conjunto de métricas que se exponen juntas en /metrics"""
+
+    def __init__(self):
+        self._metrics: Dict[str, Union[Counter, Histogram, _Gauge]] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                # Volver a registrar (p. ej., otro modelo en el mismo proceso) reutiliza la métrica
+                if type(existing) is not type(metric):
+                    raise ValueError(f"Métrica ya registrada con otro tipo: {metric.name}")
+                if isinstance(metric, _Gauge):
+                    self._metrics[metric.name] = metric
+                    return metric
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def gauge(self, name: str, documentation: str, read: Callable, labelnames: Sequence[str] = ()):
+        """Registrar (o reemplazar) un valor que se calcula en cada lectura"""
+        self._register(_Gauge(name, documentation, read, labelnames))
+
+    def render(self) -> str:
+        """Todas las métricas en formato de texto de Prometheus (versión 0.0.4)"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Registro por defecto del proceso
+REGISTRY = MetricsRegistry()
+
+# Etapas del camino caliente: normalize, classify, profile_update,
+# profile_save, tips, context
+STAGE_SECONDS = REGISTRY.histogram(
+    'nlp_stage_duration_seconds', 'Duración de cada etapa del procesamiento', ['stage']
+)
+REQUESTS = REGISTRY.counter(
+    'nlp_http_requests_total', 'Peticiones HTTP atendidas', ['endpoint', 'method', 'status']
+)
+REQUEST_SECONDS = REGISTRY.histogram(
+    'nlp_http_request_duration_seconds', 'Duración de las peticiones HTTP', ['endpoint']
+)
+RETRAIN_SECONDS = REGISTRY.histogram(
+    'nlp_retrain_duration_seconds', 'Duración de los reentrenamientos', ['kind']
+)
+PROFILE_FLUSH_SECONDS = REGISTRY.histogram(
+    'nlp_profile_flush_duration_seconds', 'Duración de las escrituras de perfiles al almacenamiento'
+)
+PROFILE_FLUSH_ERRORS = REGISTRY.counter(
+    'nlp_profile_flush_errors_total', 'Escrituras de perfiles fallidas'
+)
@@ -0,0 +1,142 @@
+"""Agrupación de predicciones concurrentes en lotes (micro-batching)
+
+Cada petición que necesita clasificar un mensaje lo encola y espera; un
+hilo dedicado toma el primer mensaje, espera como mucho `window_ms` a que
+lleguen otros (o a reunir `max_batch_size`) y los clasifica todos juntos
+en una sola pasada por el modelo. Si el lote anterior tenía un solo
+mensaje no se espera: con tráfico secuencial no hay con quién agrupar, y
+los mensajes que llegan mientras se clasifica forman el lote siguiente.
+
+Con muchas peticiones simultáneas, una matriz dispersa de N filas cuesta
+bastante menos que N predicciones sueltas.
+"""
+import threading
+import time
+from typing import Callable, List, Sequence
+
+from metrics import REGISTRY
+
+BATCH_SIZE = REGISTRY.histogram(
+    'nlp_microbatch_size', 'Mensajes por lote del micro-batching',
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256)
+)
+QUEUE_WAIT_SECONDS = REGISTRY.histogram(
+    'nlp_microbatch_queue_wait_seconds', 'Espera de un mensaje hasta que se clasifica su lote'
+)
+
+
+class _Pending:
+    """Un mensaje encolado y el resultado que espera su llamador"""
+
+    __slots__ = ('text', 'enqueued_at', 'result', 'error', 'done')
+
+    def __init__(self, text: str):
+        self.text = text
+        self.enqueued_at = time.perf_counter()
+        self.result = None
+        self.error = None
+        self.done = threading.Event()
+
+
+class MicroBatcher:
+    """Cola de mensajes que se clasifican en lotes con `classify_batch`
+
+    `classify_batch` recibe una lista de textos y devuelve un resultado por
+    texto, en el mismo orden. Los textos repetidos dentro de un lote se
+    clasifican una sola vez.
+    """
+
+    def __init__(self, classify_batch: Callable[[List[str]], Sequence], window_ms: float = 2.0,
+                 max_batch_size: int = 32):
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size debe ser al menos 1")
+        self.classify_batch = classify_batch
+        self.window = window_ms / 1000.0
+        self.max_batch_size = max_batch_size
+
+        self._queue: List[_Pending] = []
+        self._condition = threading.Condition()
+        self._stopped = False
+        # Sin tráfico concurrente esperar la ventana solo agregaría latencia
+        self._last_batch_size = 0
+        self.batch_count = 0
+        self.item_count = 0
+
+        self._thread = threading.Thread(target=self._run, name='micro-batcher', daemon=True)
+        self._thread.start()
+
+    def predict(self, text: str, timeout: float = 30.0):
+        """Clasificar un texto junto con los que lleguen al mismo tiempo"""
+        pending = _Pending(text)
+        with self._condition:
+            if self._stopped:
+                raise RuntimeError("El micro-batcher está detenido")
+            self._queue.append(pending)
+            self._condition.notify()
+        if not pending.done.wait(timeout):
+            raise TimeoutError("La predicción por lotes no terminó a tiempo")
+        if pending.error is not None:
+            raise pending.error
+        return pending.result
+
+    def _next_batch(self) -> List[_Pending]:
+        """Esperar el primer mensaje y reunir los que lleguen dentro de la ventana"""
+        with self._condition:
+            while not self._queue and not self._stopped:
+                self._condition.wait()
+            if not self._queue:
+                return []
+            # Solo se espera si el lote anterior mostró peticiones concurrentes
+            window = self.window if self._last_batch_size > 1 else 0.0
+            deadline = self._queue[0].enqueued_at + window
+            while len(self._queue) < self.max_batch_size and not self._stopped:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                self._condition.wait(remaining)
+            batch = self._queue[:self.max_batch_size]
+            del self._queue[:self.max_batch_size]
+            self._last_batch_size = len(batch)
+            return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if not batch:
+                return
+            started = time.perf_counter()
+            # Un solo texto por valor distinto
+            texts = list(dict.fromkeys(pending.text for pending in batch))
+            try:
+                results = dict(zip(texts, self.classify_batch(texts)))
+                for pending in batch:
+                    pending.result = results[pending.text]
+            except Exception as e:
+                for pending in batch:
+                    pending.error = e
+            for pending in batch:
+                QUEUE_WAIT_SECONDS.observe(started - pending.enqueued_at)
+                pending.done.set()
+            BATCH_SIZE.observe(len(batch))
+            self.batch_count += 1
+            self.item_count += len(batch)
+
+    def stats(self):
+        """Lotes procesados y tamaño medio"""
+        with self._condition:
+            queued = len(self._queue)
+        return {
+            'window_ms': self.window * 1000,
+            'max_batch_size': self.max_batch_size,
+            'queued': queued,
+            'batches': self.batch_count,
+            'avg_batch_size': self.item_count / self.batch_count if self.batch_count else 0.0
+        }
+
+    def close(self):
+        """Clasificar lo que quede en la cola y detener el hilo"""
+        with self._condition:
+            self._stopped = True
+            self._condition.notify_all()
+        if self._thread is not threading.current_thread():
+            self._thread.join()
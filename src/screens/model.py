@@ -1,32 +1,280 @@
-import json
+import copy
 import pickle
 import os
+import tempfile
+import threading
+import time
+from collections import namedtuple
+from contextlib import contextmanager, nullcontext
 from datetime import datetime
 import numpy as np
-from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.feature_extraction.text import HashingVectorizer, TfidfVectorizer
+from sklearn.linear_model import SGDClassifier
 from sklearn.svm import SVC
 from sklearn.pipeline import Pipeline
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import accuracy_score
-import re
 from typing import Dict, List, Tuple
 
+from prediction_cache import PredictionCache
+from profile_store import ProfileFlusher, StripedLock, create_profile_store
+from training_corpus import TrainingCorpus
+from user_profile import UserProfile
+from text_normalizer import TextNormalizer
+from predictors import build_predictor, shares_features
+import model_artifacts
+from model_registry import ModelRegistry
+from metrics import RETRAIN_SECONDS, STAGE_SECONDS
+from micro_batcher import MicroBatcher
+from phrase_index import PhraseIndex
+from place_index import PlaceIndex, SharedPlaceIndex
+
+def write_pickle_atomic(path: str, obj):
+    """Serializar en un archivo temporal y reemplazar el destino de forma atómica
+
+    Un proceso que cargue los modelos nunca lee un pickle a medio escribir.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp_', suffix='.pkl')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump(obj, f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+# Motores de clasificación: 'svc' reentrena TF-IDF + SVC completo;
+# 'online' usa hashing + regresión logística por SGD y aprende el feedback
+# de forma incremental con partial_fit
+ENGINES = ('svc', 'online')
+
+# Franjas de candados por usuario para actualizar perfiles
+PROFILE_LOCK_STRIPES = 64
+
+# Series de las etapas del camino caliente (se resuelven una sola vez)
+NORMALIZE_SECONDS = STAGE_SECONDS.labels('normalize')
+CLASSIFY_SECONDS = STAGE_SECONDS.labels('classify')
+CLASSIFY_BATCH_SECONDS = STAGE_SECONDS.labels('classify_batch')
+# Búsquedas en el índice de frases que responden sin clasificar
+EXACT_MATCH_SECONDS = STAGE_SECONDS.labels('exact_match')
+PROFILE_UPDATE_SECONDS = STAGE_SECONDS.labels('profile_update')
+PROFILE_SAVE_SECONDS = STAGE_SECONDS.labels('profile_save')
+
+# Modelos activos: pipelines de scikit-learn (para guardar y actualizar;
+# None si se cargaron desde un artefacto), predictor usado en inferencia,
+# versión, instante de carga, versión del artefacto de origen e índice de
+# coincidencias exactas del mismo corpus. Se publica como una sola tupla.
+ActiveModels = namedtuple('ActiveModels', [
+    'mood_classifier', 'intent_classifier', 'predictor', 'version', 'loaded_at', 'artifact_version',
+    'phrase_index'
+])
+
 class BarranquillaNLPModel:
-    def __init__(self):
-        self.mood_classifier = None
-        self.intent_classifier = None
-        self.vectorizer = TfidfVectorizer(max_features=1000, stop_words=None)
+    def __init__(self, cache_size: int = 1024, cache_ttl: float = None, profile_store=None,
+                 flush_mode: str = 'sync', flush_interval_ms: int = 1000, flush_batch_size: int = 100,
+                 corpus_path: str = 'training_corpus.db', engine: str = 'svc', online_epochs: int = 5,
+                 compiled: bool = False, shared_features: bool = False, artifact_dir: str = None,
+                 registry_dir: str = None, shared_profiles: bool = False, fold_accents: bool = False,
+                 normalize_cache_size: int = 8192, batch_window_ms: float = None,
+                 batch_max_size: int = 32, exact_match: bool = True, autoload: bool = True):
+        if engine not in ENGINES:
+            raise ValueError(f"Motor desconocido: {engine}")
+        self.engine = engine
+        self.online_epochs = online_epochs
+        self.compiled = compiled
+        # Un solo vectorizador para ambas cabezas (estado de ánimo e intención)
+        self.shared_features = shared_features
+        # Modelos activos; se reemplazan con una sola asignación para que las
+        # peticiones en curso no mezclen versiones
+        self._active = ActiveModels(None, None, None, 0, None, None, None)
+        self._train_lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        # Artefacto sin pickle (model_artifacts.py) que se carga en la primera predicción
+        self.artifact_dir = artifact_dir
+        # Registro versionado de artefactos (model_registry.py); permite
+        # cambiar de versión en caliente con reload_model()
+        self.registry = ModelRegistry(registry_dir) if registry_dir else None
         self.user_profiles = {}
         self.conversation_data = []
+        # Las actualizaciones de un mismo usuario se serializan; las de
+        # usuarios distintos avanzan en paralelo
+        self._profile_locks = StripedLock(PROFILE_LOCK_STRIPES)
+        
+        # Normalización de texto (memoizada); con fold_accents "música" y
+        # "musica" producen las mismas features
+        self.normalizer = TextNormalizer(fold_accents=fold_accents, cache_size=normalize_cache_size)
+        
+        # Caché de predicciones por texto normalizado (0 la desactiva)
+        self.prediction_cache = PredictionCache(maxsize=cache_size, ttl=cache_ttl)
+        
+        # Micro-batching de predicciones concurrentes (None lo desactiva; con
+        # 0 solo se agrupa lo que se acumuló mientras se clasificaba otro lote)
+        self.batch_window_ms = batch_window_ms
+        self.batch_max_size = batch_max_size
+        self.batcher = self._new_batcher()
+        
+        # Mensajes idénticos a un ejemplo del corpus (semillas o feedback)
+        # reciben sus etiquetas sin pasar por los clasificadores; el índice
+        # se publica con los modelos activos
+        if exact_match:
+            self._active = self._active._replace(phrase_index=PhraseIndex())
+        
+        # Almacenamiento de perfiles (SQLite por defecto, un perfil por fila)
+        self.profile_store = profile_store if profile_store is not None else create_profile_store()
+        
+        # Perfiles compartidos entre procesos (servidor con varios workers):
+        # cada petición relee el perfil del almacenamiento (solo si cambió su
+        # revisión) y lo reescribe en una transacción exclusiva
+        self.shared_profiles = shared_profiles
+        self._profile_revisions: Dict[str, int] = {}
+        if shared_profiles:
+            if flush_mode != 'sync':
+                raise ValueError("Los perfiles compartidos requieren flush_mode='sync'")
+            if not hasattr(self.profile_store, 'exclusive'):
+                raise ValueError("Los perfiles compartidos requieren el almacenamiento SQLite")
+        
+        # Calificaciones de lugares de todos los usuarios (se construye al
+        # cargar los perfiles y se actualiza con cada calificación); con
+        # perfiles compartidos vive en el mismo almacenamiento, para que
+        # todos los workers consulten el mismo agregado
+        self.place_index = SharedPlaceIndex(self.profile_store) if shared_profiles else PlaceIndex()
+        
+        # Escritura de perfiles: 'sync' (por petición), 'batch' o 'interval'
+        self.profile_flusher = ProfileFlusher(
+            self.profile_store,
+            self._snapshot_profiles,
+            mode=flush_mode,
+            interval_ms=flush_interval_ms,
+            batch_size=flush_batch_size
+        )
+        
+        # Corpus de entrenamiento persistente (semillas + feedback); solo se
+        # lee al reentrenar
+        self.corpus = TrainingCorpus(corpus_path, normalize=self.preprocess_text)
         
         # Cargar datos existentes si existen
-        self.load_models()
         self.load_user_data()
         
-        # Si no hay modelos entrenados, crear datasets iniciales
-        if self.mood_classifier is None:
-            self.create_initial_datasets()
-            self.train_models()
+        # Sin autoload los modelos se preparan después (ensure_models)
+        if not autoload:
+            return
+        
+        # Con un artefacto disponible el arranque no entrena ni deserializa
+        # pickles: el artefacto se carga en la primera predicción
+        if self.registry is not None and self.registry.current_version() is not None:
+            return
+        if model_artifacts.artifact_exists(artifact_dir):
+            return
+        if artifact_dir:
+            print(f"No hay artefacto en {artifact_dir}, se usan los modelos pickle")
+        
+        self.ensure_models()
+    
+    def ensure_models(self, retrain: bool = False, save: bool = True):
+        """Cargar los modelos pickle o, si faltan (o son de otro motor), entrenarlos
+        
+        Con `retrain` se entrena desde el corpus (sembrado si está vacío) sin
+        mirar los pickles. Con save=False no se escriben pickles ni se
+        publican artefactos.
+        """
+        if not retrain:
+            self.load_models()
+        if retrain or self.mood_classifier is None or not self._matches_engine():
+            self.train_models(save=save)
+            return
+        self._active = self._active._replace(phrase_index=self._build_phrase_index())
+        if save and self.registry is not None:
+            # Registro vacío: publicar los modelos cargados como primera versión
+            self._publish_models(self._active)
+    
+    @property
+    def mood_classifier(self):
+        return self._active.mood_classifier
+    
+    @property
+    def intent_classifier(self):
+        return self._active.intent_classifier
+    
+    @property
+    def phrase_index(self):
+        return self._active.phrase_index
+    
+    @property
+    def model_version(self) -> int:
+        return self._active.version
+    
+    @property
+    def model_loaded_at(self) -> str:
+        return self._active.loaded_at
+    
+    @property
+    def model_loaded(self) -> bool:
+        return self._active.predictor is not None
+    
+    @property
+    def artifact_version(self) -> str:
+        return self._active.artifact_version
+    
+    def _new_batcher(self):
+        if self.batch_window_ms is None:
+            return None
+        return MicroBatcher(self._classify_processed, self.batch_window_ms, self.batch_max_size)
+    
+    def _build_phrase_index(self):
+        """Índice de coincidencias exactas construido desde el corpus (sin publicarlo)"""
+        if self.phrase_index is None:
+            return None
+        self._ensure_corpus()
+        tasks = []
+        for task in ('mood', 'intent'):
+            texts, labels = self.corpus.load_task(task)
+            tasks.append(zip(self.normalizer.normalize_batch(texts), labels))
+        return self.phrase_index.rebuild(*tasks)
+    
+    def _matches_engine(self) -> bool:
+        """Indica si los modelos activos corresponden al motor y modo configurados"""
+        is_online = hasattr(self.mood_classifier[-1], 'partial_fit')
+        is_shared = shares_features(self.mood_classifier, self.intent_classifier)
+        return (is_online == (self.engine == 'online') and is_shared == self.shared_features
+                and self._matches_normalization())
+    
+    def _matches_normalization(self) -> bool:
+        """Indica si el vocabulario se construyó con la normalización actual
+        
+        Un modelo entrenado sin quitar tildes tiene términos como "música",
+        que nunca aparecerían con fold_accents activo. Los vectorizadores por
+        hashing no guardan vocabulario y no se pueden comprobar.
+        """
+        for classifier in (self.mood_classifier, self.intent_classifier):
+            vocabulary = getattr(classifier[0], 'vocabulary_', None)
+            if vocabulary and not all(self.normalizer.is_normalized(term) for term in vocabulary):
+                return False
+        return True
+    
+    def _activate_models(self, mood_classifier, intent_classifier, predictor=None, artifact_version: str = None,
+                         phrase_index: PhraseIndex = None):
+        """Publicar un nuevo par de modelos (y su índice de coincidencias exactas) de forma atómica
+        
+        Sin `phrase_index` se conserva el índice activo.
+        """
+        if predictor is None:
+            try:
+                predictor = build_predictor(mood_classifier, intent_classifier, compiled=self.compiled)
+            except ValueError as e:
+                predictor = build_predictor(mood_classifier, intent_classifier)
+                print(f"No se pudo compilar el modelo, se usa scikit-learn: {e}")
+        
+        if phrase_index is None:
+            phrase_index = self._active.phrase_index
+        self._active = ActiveModels(
+            mood_classifier, intent_classifier, predictor,
+            self._active.version + 1, datetime.now().isoformat(), artifact_version, phrase_index
+        )
+        
+        # Las predicciones en caché corresponden a los modelos anteriores
+        self.prediction_cache.clear()
     
     def create_initial_datasets(self):
         """Crear datasets iniciales para entrenar los modelos"""
@@ -183,117 +431,366 @@ class BarranquillaNLPModel:
             ("donde puedo desestresarme", "descanso")
         ]
     
+    def _ensure_corpus(self):
+        """Sembrar el corpus con los datasets iniciales la primera vez"""
+        if self.corpus.count() == 0:
+            self.create_initial_datasets()
+            self.corpus.add_examples('mood', self.mood_dataset, source='seed')
+            self.corpus.add_examples('intent', self.intent_dataset, source='seed')
+    
     def preprocess_text(self, text: str) -> str:
         """Preprocesar texto para análisis"""
-        text = text.lower()
-        text = re.sub(r'[^\w\s]', '', text)
-        text = re.sub(r'\s+', ' ', text).strip()
-        return text
-    
-    def train_models(self):
-        """Entrenar los modelos de clasificación"""
-        # Preparar datos para estado de ánimo
-        mood_texts = [self.preprocess_text(text) for text, _ in self.mood_dataset]
-        mood_labels = [label for _, label in self.mood_dataset]
-        
-        # Preparar datos para intenciones
-        intent_texts = [self.preprocess_text(text) for text, _ in self.intent_dataset]
-        intent_labels = [label for _, label in self.intent_dataset]
-        
-        # Entrenar clasificador de estado de ánimo
-        self.mood_classifier = Pipeline([
-            ('tfidf', TfidfVectorizer(max_features=500, ngram_range=(1, 2))),
-            ('clf', SVC(kernel='linear', probability=True))
-        ])
-        self.mood_classifier.fit(mood_texts, mood_labels)
-        
-        # Entrenar clasificador de intenciones
-        self.intent_classifier = Pipeline([
-            ('tfidf', TfidfVectorizer(max_features=500, ngram_range=(1, 2))),
-            ('clf', SVC(kernel='linear', probability=True))
-        ])
-        self.intent_classifier.fit(intent_texts, intent_labels)
-        
-        # Guardar modelos
-        self.save_models()
-        print("Modelos entrenados y guardados exitosamente")
+        return self.normalizer.normalize(text)
+    
+    def _new_vectorizer(self):
+        """Vectorizador sin entrenar del motor configurado"""
+        if self.engine == 'online':
+            # El vectorizador por hashing no tiene estado, así que los ejemplos
+            # nuevos se pueden proyectar sin reajustar el vocabulario
+            return HashingVectorizer(n_features=2 ** 16, ngram_range=(1, 2), alternate_sign=False)
+        # Con vectorizador compartido el vocabulario cubre ambos corpus
+        max_features = 1000 if self.shared_features else 500
+        return TfidfVectorizer(max_features=max_features, ngram_range=(1, 2))
+    
+    def _new_head(self):
+        """Clasificador sin entrenar del motor configurado"""
+        if self.engine == 'online':
+            return SGDClassifier(loss='log_loss', alpha=1e-4, max_iter=50, tol=None, random_state=42)
+        return SVC(kernel='linear', probability=True)
+    
+    def _new_pipeline(self, vectorizer=None) -> Pipeline:
+        """Pipeline del motor configurado (opcionalmente con un vectorizador ya entrenado)"""
+        vectorizer = vectorizer if vectorizer is not None else self._new_vectorizer()
+        step_name = 'hash' if self.engine == 'online' else 'tfidf'
+        return Pipeline([(step_name, vectorizer), ('clf', self._new_head())])
+    
+    def train_models(self, save: bool = True):
+        """Entrenar los modelos de clasificación
+        
+        Los modelos nuevos se entrenan aparte y se publican al terminar, así
+        que las predicciones concurrentes siguen usando los anteriores. Con
+        save=False solo quedan en memoria (sin pickles ni artefactos).
+        """
+        with self._train_lock, RETRAIN_SECONDS.labels('full').time():
+            self._ensure_corpus()
+            
+            # Preparar datos para estado de ánimo
+            mood_texts, mood_labels = self.corpus.load_task('mood')
+            mood_texts = self.normalizer.normalize_batch(mood_texts)
+            
+            # Preparar datos para intenciones
+            intent_texts, intent_labels = self.corpus.load_task('intent')
+            intent_texts = self.normalizer.normalize_batch(intent_texts)
+            
+            if self.shared_features:
+                # Un vectorizador sobre el corpus combinado y una cabeza por tarea
+                vectorizer = self._new_vectorizer().fit(mood_texts + intent_texts)
+                mood_classifier = self._new_pipeline(vectorizer)
+                mood_classifier[-1].fit(vectorizer.transform(mood_texts), mood_labels)
+                intent_classifier = self._new_pipeline(vectorizer)
+                intent_classifier[-1].fit(vectorizer.transform(intent_texts), intent_labels)
+            else:
+                # Entrenar clasificador de estado de ánimo
+                mood_classifier = self._new_pipeline()
+                mood_classifier.fit(mood_texts, mood_labels)
+                
+                # Entrenar clasificador de intenciones
+                intent_classifier = self._new_pipeline()
+                intent_classifier.fit(intent_texts, intent_labels)
+            
+            phrase_index = None
+            if self.phrase_index is not None:
+                phrase_index = self.phrase_index.rebuild(
+                    zip(mood_texts, mood_labels), zip(intent_texts, intent_labels)
+                )
+            self._activate_models(mood_classifier, intent_classifier, phrase_index=phrase_index)
+            
+            # Guardar modelos
+            if save:
+                self.save_models()
+        print("Modelos entrenados y guardados exitosamente" if save else "Modelos entrenados")
     
     def predict_mood_and_intent(self, text: str) -> Tuple[str, float, str, float]:
         """Predecir estado de ánimo e intención"""
+        start = time.perf_counter()
         processed_text = self.preprocess_text(text)
+        NORMALIZE_SECONDS.observe(time.perf_counter() - start)
         
-        # Predecir estado de ánimo
-        mood_pred = self.mood_classifier.predict([processed_text])[0]
-        mood_prob = max(self.mood_classifier.predict_proba([processed_text])[0])
+        phrase_index = self.phrase_index
+        known = None
+        if phrase_index is not None:
+            start = time.perf_counter()
+            known = phrase_index.lookup(processed_text)
+            if known is not None and None not in known:
+                EXACT_MATCH_SECONDS.observe(time.perf_counter() - start)
+                return known[0], 1.0, known[1], 1.0
         
-        # Predecir intención
-        intent_pred = self.intent_classifier.predict([processed_text])[0]
-        intent_prob = max(self.intent_classifier.predict_proba([processed_text])[0])
+        cached = self.prediction_cache.get(processed_text)
+        if cached is not None:
+            return self._apply_known_labels(cached, known)
         
-        return mood_pred, mood_prob, intent_pred, intent_prob
+        generation = self.prediction_cache.generation
+        start = time.perf_counter()
+        if known is not None:
+            # El índice conoce una de las etiquetas: solo se evalúa la otra cabeza
+            result = self._classify_partial([processed_text], [known])[0]
+        elif self.batcher is not None:
+            # Se clasifica en un lote junto con las peticiones concurrentes
+            result = self.batcher.predict(processed_text)
+        else:
+            result = self._classify_processed([processed_text])[0]
+        CLASSIFY_SECONDS.observe(time.perf_counter() - start)
+        self.prediction_cache.put(processed_text, result, generation)
+        return self._apply_known_labels(result, known)
     
-    def update_user_profile(self, user_id: str, message: str, feedback: str = None, rating: int = None) -> Dict:
-        """Actualizar perfil del usuario basado en mensaje y feedback"""
-        if user_id not in self.user_profiles:
-            self.user_profiles[user_id] = {
-                'preferences': [],
-                'mood_history': [],
-                'location_ratings': {},
-                'conversation_count': 0,
-                'avg_rating': 0.0,
-                'favorite_categories': [],
-                'last_interactions': []
-            }
+    @staticmethod
+    def _apply_known_labels(result: Tuple[str, float, str, float], known) -> Tuple[str, float, str, float]:
+        """Reemplazar por la etiqueta del índice (confianza 1.0) la tarea que la conozca"""
+        if known is None:
+            return result
+        mood, mood_conf, intent, intent_conf = result
+        if known[0] is not None:
+            mood, mood_conf = known[0], 1.0
+        if known[1] is not None:
+            intent, intent_conf = known[1], 1.0
+        return mood, mood_conf, intent, intent_conf
+    
+    def predict_batch(self, texts: List[str]) -> List[Tuple[str, float, str, float]]:
+        """Predecir estado de ánimo e intención para una lista de mensajes
         
-        profile = self.user_profiles[user_id]
-        profile['conversation_count'] += 1
+        Toda la lista se vectoriza y clasifica en una sola llamada por modelo;
+        los resultados conservan el orden de entrada.
+        """
+        if not texts:
+            return []
+        start = time.perf_counter()
+        processed_texts = self.normalizer.normalize_batch(texts)
+        NORMALIZE_SECONDS.observe(time.perf_counter() - start)
+        phrase_index = self.phrase_index
+        if phrase_index is None:
+            with CLASSIFY_BATCH_SECONDS.time():
+                return self._classify_processed(processed_texts)
+        
+        # Los textos sin etiquetas conocidas pasan por ambas cabezas; los que
+        # tienen una sola, solo por la que falta
+        with EXACT_MATCH_SECONDS.time():
+            known = [phrase_index.lookup(text) for text in processed_texts]
+        misses = [i for i, labels in enumerate(known) if labels is None]
+        partial = [i for i, labels in enumerate(known) if labels is not None and None in labels]
+        results = [None] * len(processed_texts)
+        if misses or partial:
+            with CLASSIFY_BATCH_SECONDS.time():
+                if misses:
+                    classified = self._classify_processed([processed_texts[i] for i in misses])
+                    for i, result in zip(misses, classified):
+                        results[i] = result
+                if partial:
+                    classified = self._classify_partial([processed_texts[i] for i in partial],
+                                                        [known[i] for i in partial])
+                    for i, result in zip(partial, classified):
+                        results[i] = result
+        for i, labels in enumerate(known):
+            if results[i] is None:
+                results[i] = (labels[0], 1.0, labels[1], 1.0)
+        return results
+    
+    def _classify_processed(self, processed_texts: List[str]) -> List[Tuple[str, float, str, float]]:
+        """Clasificar textos ya preprocesados con una sola pasada por modelo
+        
+        Cada texto se vectoriza una única vez por modelo y ambas cabezas
+        reutilizan esa matriz para la etiqueta y las probabilidades. La
+        etiqueta es la de predict() del clasificador y la confianza la mayor
+        probabilidad, como en la ruta original.
+        """
+        mood_labels, mood_probs, intent_labels, intent_probs = self._get_predictor().predict(processed_texts)
+        mood_confs = mood_probs.max(axis=1)
+        intent_confs = intent_probs.max(axis=1)
+        
+        return [
+            (mood_labels[i], mood_confs[i], intent_labels[i], intent_confs[i])
+            for i in range(len(processed_texts))
+        ]
+    
+    def _classify_partial(self, processed_texts: List[str], known: List) -> List[Tuple[str, float, str, float]]:
+        """Completar con su cabeza la etiqueta que el índice no conoce de cada texto
+        
+        Cada texto del lote tiene exactamente una etiqueta conocida, que se
+        devuelve con confianza 1.0.
+        """
+        results = [None] * len(processed_texts)
+        for task, position in (('mood', 0), ('intent', 1)):
+            pending = [i for i, labels in enumerate(known) if labels[position] is None]
+            if not pending:
+                continue
+            labels, probs = self._get_predictor().predict_task(task, [processed_texts[i] for i in pending])
+            for i, label, confidence in zip(pending, labels, probs.max(axis=1)):
+                if task == 'mood':
+                    results[i] = (label, confidence, known[i][1], 1.0)
+                else:
+                    results[i] = (known[i][0], 1.0, label, confidence)
+        return results
+    
+    def _get_predictor(self):
+        """Predictor activo, cargando el artefacto en el primer uso"""
+        predictor = self._active.predictor
+        if predictor is None:
+            with self._load_lock:
+                if self._active.predictor is None:
+                    if self.registry is not None:
+                        self._load_registry_version()
+                    else:
+                        self.load_artifact()
+                predictor = self._active.predictor
+        return predictor
+    
+    def load_artifact(self, directory: str = None):
+        """Cargar y activar un artefacto sin pickle (verificando checksums)"""
+        directory = directory or self.artifact_dir
+        predictor, manifest = model_artifacts.load_artifact(directory)
+        # El corpus (compartido entre procesos) puede traer feedback nuevo
+        self._activate_models(None, None, predictor=predictor, artifact_version=manifest['model_version'],
+                              phrase_index=self._build_phrase_index())
+        print(f"Artefacto {manifest['model_version']} cargado desde {directory}")
+    
+    def reload_model(self, version: str = None) -> bool:
+        """Cargar en caliente una versión del registro (por defecto, la activa)
         
-        # Analizar mensaje actual
-        mood, mood_conf, intent, intent_conf = self.predict_mood_and_intent(message)
+        El cambio es atómico: las peticiones en curso terminan con el modelo
+        anterior. Devuelve False si esa versión ya estaba en uso.
+        """
+        if self.registry is None:
+            raise ValueError("No hay un registro de modelos configurado")
+        with self._load_lock:
+            return self._load_registry_version(version)
+    
+    def _load_registry_version(self, version: str = None) -> bool:
+        version = version or self.registry.current_version()
+        if version is None:
+            raise ValueError("El registro de modelos no tiene una versión activa")
+        if version == self.artifact_version:
+            return False
+        self.load_artifact(self.registry.version_path(version))
+        return True
+    
+    def refresh_profile(self, user_id: str):
+        """Releer un perfil del almacenamiento si lo comparten varios procesos
         
-        # Actualizar historial de estados de ánimo
-        profile['mood_history'].append({
-            'mood': mood,
-            'confidence': mood_conf,
-            'timestamp': datetime.now().isoformat()
-        })
+        Solo se relee si su revisión cambió desde la última lectura; si no,
+        se conserva el mismo objeto (y su versión), de modo que lo derivado
+        del perfil en caché sigue siendo válido.
+        """
+        if not self.shared_profiles:
+            return
+        changed = self.profile_store.load_if_changed(user_id, self._profile_revisions.get(user_id))
+        if changed is not None:
+            profile, revision = changed
+            # El perfil y su revisión se instalan juntos; el índice de lugares
+            # compartido ya refleja el perfil guardado
+            with self._profile_locks.for_key(user_id):
+                self.user_profiles[user_id] = UserProfile.from_dict(profile)
+                self._profile_revisions[user_id] = revision
+    
+    def replace_profile(self, user_id: str, profile: UserProfile):
+        """Instalar un perfil completo para un usuario, actualizando el índice de lugares
         
-        # Mantener solo los últimos 10 estados de ánimo
-        if len(profile['mood_history']) > 10:
-            profile['mood_history'] = profile['mood_history'][-10:]
+        Con perfiles compartidos debe llamarse dentro de profile_transaction()
+        y guardarse el perfil antes de salir, para que el índice compartido y
+        el perfil se confirmen juntos.
+        """
+        with self._profile_locks.for_key(user_id):
+            previous = self.user_profiles.get(user_id)
+            if previous is not None:
+                self.place_index.remove_ratings(previous.rated_places())
+            self.user_profiles[user_id] = profile
+            self.place_index.add_ratings(profile.rated_places())
+    
+    @contextmanager
+    def profile_transaction(self, user_id: str):
+        """Bloque de lectura-modificación-escritura de un perfil
+        
+        Toma el candado del usuario, así que las actualizaciones concurrentes
+        de un mismo perfil no se pisan. Con perfiles compartidos, además, el
+        perfil se relee dentro de una transacción exclusiva del
+        almacenamiento, de modo que otro worker no pueda sobrescribirla.
+        """
+        with self._profile_locks.for_key(user_id):
+            with self.profile_store.exclusive() if self.shared_profiles else nullcontext():
+                self.refresh_profile(user_id)
+                try:
+                    yield
+                finally:
+                    # Invalidar lo derivado del perfil aunque se haya
+                    # modificado sin sus métodos (p. ej. conversation_count)
+                    profile = self.user_profiles.get(user_id)
+                    if profile is not None:
+                        profile.touch()
+    
+    def update_user_profile(self, user_id: str, message: str, feedback: str = None, rating: int = None,
+                            analysis: Tuple[str, float, str, float] = None,
+                            rated_place: str = None) -> UserProfile:
+        """Actualizar perfil del usuario basado en mensaje y feedback
+        
+        Si el llamador ya clasificó el mensaje puede pasar el resultado de
+        predict_mood_and_intent en `analysis` para no volver a inferirlo.
+        Con `rated_place` y `rating` ese lugar se califica (con la intención
+        del mensaje) en la misma transacción y escritura del perfil.
+        """
+        # Analizar mensaje actual (reutilizando el análisis si ya existe)
+        if analysis is None:
+            analysis = self.predict_mood_and_intent(message)
+        
+        # Incluye la espera por el candado del usuario y la escritura del perfil
+        with PROFILE_UPDATE_SECONDS.time(), self.profile_transaction(user_id):
+            return self._apply_profile_update(user_id, message, feedback, rating, analysis, rated_place)
+    
+    def rate_location(self, user_id: str, place: str, rating: int, intent: str = None) -> UserProfile:
+        """Calificar un lugar en el perfil del usuario y en el índice global de lugares"""
+        with self.profile_transaction(user_id):
+            profile = self.user_profiles.get(user_id)
+            if profile is None:
+                profile = self.user_profiles[user_id] = UserProfile()
+            self._rate_place(profile, place, rating, intent)
+            self.save_user_data(user_id)
+            return profile
+    
+    def _rate_place(self, profile: UserProfile, place: str, rating: int, intent: str):
+        """Calificar un lugar en un perfil y en el índice (sin guardar el perfil)"""
+        previous = profile.location_ratings.get(place)
+        previous_intent = profile.location_intent(place)
+        profile.rate_location(place, rating, intent)
+        self.place_index.rate(place, rating, intent, previous, previous_intent)
+    
+    def _apply_profile_update(self, user_id: str, message: str, feedback: str, rating: int,
+                              analysis: Tuple[str, float, str, float], rated_place: str = None) -> UserProfile:
+        profile = self.user_profiles.get(user_id)
+        if profile is None:
+            profile = self.user_profiles[user_id] = UserProfile()
+        
+        profile.conversation_count += 1
+        
+        mood, mood_conf, intent, intent_conf = analysis
+        
+        # Actualizar historial de estados de ánimo (se conservan los últimos 10)
+        profile.record_mood(mood, mood_conf)
         
         # Agregar intención a preferencias si la confianza es alta
-        if intent_conf > 0.6 and intent not in profile['preferences']:
-            profile['preferences'].append(intent)
-        
-        # Procesar feedback y rating
-        if feedback and rating:
-            # Actualizar calificaciones
-            if rating >= 4:
-                if intent not in profile['favorite_categories']:
-                    profile['favorite_categories'].append(intent)
-            
-            # Calcular rating promedio
-            ratings = list(profile['location_ratings'].values())
-            if ratings:
-                profile['avg_rating'] = sum(ratings) / len(ratings)
-        
-        # Guardar interacción actual
-        interaction = {
-            'message': message,
-            'mood': mood,
-            'intent': intent,
-            'feedback': feedback,
-            'rating': rating,
-            'timestamp': datetime.now().isoformat()
-        }
+        if intent_conf > 0.6:
+            profile.add_preference(intent)
+        
+        # Procesar feedback y rating (el rating promedio se mantiene al
+        # calificar lugares con rate_location)
+        if feedback and rating and rating >= 4:
+            profile.add_favorite_category(intent)
+        
+        # Guardar interacción actual (se conservan las últimas 5)
+        profile.record_interaction(message, mood, intent, feedback, rating)
         
-        profile['last_interactions'].append(interaction)
-        if len(profile['last_interactions']) > 5:
-            profile['last_interactions'] = profile['last_interactions'][-5:]
+        # Calificación del lugar recomendado, en la misma escritura
+        if rated_place and rating:
+            self._rate_place(profile, rated_place, rating, intent)
         
-        # Guardar datos actualizados
-        self.save_user_data()
+        # Guardar solo el perfil actualizado
+        self.save_user_data(user_id)
         
         return profile
     
@@ -304,71 +801,237 @@ class BarranquillaNLPModel:
         
         profile = self.user_profiles[user_id]
         
-        # Analizar patrones de estado de ánimo
-        recent_moods = [entry['mood'] for entry in profile['mood_history'][-5:]]
-        mood_pattern = max(set(recent_moods), key=recent_moods.count) if recent_moods else "neutral"
-        
-        # Preferencias principales
-        top_preferences = profile['favorite_categories'][:3] if profile['favorite_categories'] else profile['preferences'][:3]
-        
+        # Agregados mantenidos en cada actualización del perfil
         return {
-            'dominant_mood': mood_pattern,
-            'top_preferences': top_preferences,
-            'avg_rating': profile['avg_rating'],
-            'conversation_count': profile['conversation_count'],
-            'is_new_user': profile['conversation_count'] <= 2
+            'dominant_mood': profile.dominant_mood or "neutral",
+            'top_preferences': profile.top_preferences(3),
+            'avg_rating': profile.avg_rating,
+            'conversation_count': profile.conversation_count,
+            'is_new_user': profile.conversation_count <= 2
         }
     
     def save_models(self):
         """Guardar modelos entrenados"""
+        active = self._active
         try:
-            with open('mood_classifier.pkl', 'wb') as f:
-                pickle.dump(self.mood_classifier, f)
-            with open('intent_classifier.pkl', 'wb') as f:
-                pickle.dump(self.intent_classifier, f)
+            write_pickle_atomic('mood_classifier.pkl', active.mood_classifier)
+            write_pickle_atomic('intent_classifier.pkl', active.intent_classifier)
         except Exception as e:
             print(f"Error guardando modelos: {e}")
+        
+        self._publish_models(active)
+    
+    def _publish_models(self, active: ActiveModels):
+        """Exportar los modelos activos al artefacto y/o al registro configurados
+        
+        La versión publicada se anota en los modelos activos (si siguen
+        siéndolo) para que el vigilante del registro no vuelva a cargarla.
+        """
+        artifact_version = None
+        
+        # Mantener el artefacto al día para que el próximo arranque lo use
+        if self.artifact_dir:
+            try:
+                manifest = model_artifacts.save_artifact(
+                    self.artifact_dir, active.mood_classifier, active.intent_classifier
+                )
+                artifact_version = manifest['model_version']
+            except Exception as e:
+                print(f"Error guardando artefacto: {e}")
+        
+        # Bajo _load_lock, para que reload_model() no recargue la versión que
+        # se está publicando
+        with self._load_lock:
+            if self.registry is not None:
+                try:
+                    artifact_version = self.registry.publish(active.mood_classifier, active.intent_classifier)
+                except Exception as e:
+                    print(f"Error publicando modelo en el registro: {e}")
+            
+            if artifact_version is not None and self._active is active:
+                self._active = active._replace(artifact_version=artifact_version)
     
     def load_models(self):
         """Cargar modelos entrenados"""
         try:
-            if os.path.exists('mood_classifier.pkl'):
+            if os.path.exists('mood_classifier.pkl') and os.path.exists('intent_classifier.pkl'):
                 with open('mood_classifier.pkl', 'rb') as f:
-                    self.mood_classifier = pickle.load(f)
-            if os.path.exists('intent_classifier.pkl'):
+                    mood_classifier = pickle.load(f)
                 with open('intent_classifier.pkl', 'rb') as f:
-                    self.intent_classifier = pickle.load(f)
+                    intent_classifier = pickle.load(f)
+                self._relink_shared_vectorizer(mood_classifier, intent_classifier)
+                self._activate_models(mood_classifier, intent_classifier)
         except Exception as e:
             print(f"Error cargando modelos: {e}")
     
-    def save_user_data(self):
-        """Guardar datos de usuarios"""
+    def _relink_shared_vectorizer(self, mood_classifier: Pipeline, intent_classifier: Pipeline):
+        """Volver a compartir el vectorizador tras cargar los pipelines por separado
+        
+        Cada pipeline se guarda en su propio pickle, así que al cargarlos el
+        vectorizador común aparece duplicado; si ambos son idénticos se
+        reemplaza el del pipeline de intención por el de estado de ánimo.
+        """
+        mood_vectorizer, intent_vectorizer = mood_classifier[0], intent_classifier[0]
+        if type(mood_vectorizer) is not type(intent_vectorizer):
+            return
+        if mood_vectorizer.get_params() != intent_vectorizer.get_params():
+            return
+        if hasattr(mood_vectorizer, 'vocabulary_'):
+            if (mood_vectorizer.vocabulary_ != intent_vectorizer.vocabulary_
+                    or not np.array_equal(mood_vectorizer.idf_, intent_vectorizer.idf_)):
+                return
+        elif not self.shared_features:
+            # Los vectorizadores por hashing siempre son idénticos; solo se
+            # comparten si el modo compartido está activo
+            return
+        intent_classifier.steps[0] = (intent_classifier.steps[0][0], mood_vectorizer)
+    
+    def save_user_data(self, user_id: str = None):
+        """Guardar datos de usuarios
+        
+        Con user_id solo se marca ese perfil para escritura; según el modo
+        configurado se escribe de inmediato o en el próximo ciclo del flusher.
+        """
         try:
-            with open('user_profiles.json', 'w', encoding='utf-8') as f:
-                json.dump(self.user_profiles, f, ensure_ascii=False, indent=2)
+            if user_id is not None:
+                with PROFILE_SAVE_SECONDS.time():
+                    revisions = self.profile_flusher.mark_dirty(user_id)
+                if self.shared_profiles and revisions:
+                    # La escritura propia no obliga a releer el perfil en la próxima petición
+                    self._profile_revisions.update(revisions)
+            else:
+                self.profile_store.save_many(self._snapshot_profiles(list(self.user_profiles)))
         except Exception as e:
             print(f"Error guardando datos de usuarios: {e}")
     
+    def _snapshot_profiles(self, user_ids) -> Dict[str, Dict]:
+        """Perfiles indicados en formato JSON, para serializarlos fuera del hilo de la petición"""
+        snapshot = {}
+        for user_id in user_ids:
+            # Bajo el candado del usuario para no copiar un perfil a medio actualizar
+            with self._profile_locks.for_key(user_id):
+                if user_id in self.user_profiles:
+                    snapshot[user_id] = self.user_profiles[user_id].to_dict()
+        return snapshot
+    
+    def after_fork(self):
+        """Preparar una copia del modelo en un proceso hijo (servidor con workers)
+        
+        Los pesos se heredan del proceso maestro (copy-on-write); solo se
+        reabren las conexiones SQLite y se crean candados nuevos, ya que no
+        deben compartirse entre procesos.
+        """
+        self._train_lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self._profile_locks = StripedLock(PROFILE_LOCK_STRIPES)
+        # El hilo del micro-batching no existe en el hijo
+        self.batcher = self._new_batcher()
+        if hasattr(self.profile_store, 'reopen'):
+            self.profile_store.reopen()
+        self.corpus.reopen()
+    
+    def close(self):
+        """Escribir perfiles pendientes y cerrar el almacenamiento"""
+        if self.batcher is not None:
+            self.batcher.close()
+        self.profile_flusher.close()
+        self.profile_store.close()
+        self.corpus.close()
+    
     def load_user_data(self):
-        """Cargar datos de usuarios"""
-        try:
-            if os.path.exists('user_profiles.json'):
-                with open('user_profiles.json', 'r', encoding='utf-8') as f:
-                    self.user_profiles = json.load(f)
-        except Exception as e:
-            print(f"Error cargando datos de usuarios: {e}")
+        """Cargar datos de usuarios
+        
+        Un perfil que no se puede leer se omite (y se informa) sin impedir
+        que se carguen los demás.
+        """
+        # Con perfiles compartidos el índice de lugares se recalcula en el
+        # almacenamiento sin que otro proceso escriba entre medio
+        with self.profile_store.exclusive() if self.shared_profiles else nullcontext():
+            try:
+                stored = self.profile_store.load_all()
+            except Exception as e:
+                print(f"Error cargando datos de usuarios: {e}")
+                return
+            profiles = {}
+            for user_id, profile in stored.items():
+                try:
+                    profiles[user_id] = UserProfile.from_dict(profile)
+                except Exception as e:
+                    print(f"Error cargando el perfil {user_id}, se omite: {e}")
+            self.user_profiles = profiles
+            self.place_index.rebuild(
+                rating for profile in self.user_profiles.values() for rating in profile.rated_places()
+            )
     
     def retrain_with_feedback(self, user_message: str, correct_mood: str, correct_intent: str):
         """Reentrenar modelos con feedback del usuario"""
-        # Agregar nuevos datos a los datasets
-        processed_message = self.preprocess_text(user_message)
+        self.retrain_with_feedback_batch([(user_message, correct_mood, correct_intent)])
+    
+    def record_feedback(self, feedback_items: List[Tuple[str, str, str]]):
+        """Persistir feedback (mensaje, estado, intención) en el corpus"""
+        self._ensure_corpus()
+        self.corpus.add_examples('mood', [(message, mood) for message, mood, _ in feedback_items])
+        self.corpus.add_examples('intent', [(message, intent) for message, _, intent in feedback_items])
+    
+    def retrain_with_feedback_batch(self, feedback_items: List[Tuple[str, str, str]], record: bool = True):
+        """Reentrenar una sola vez con varios feedbacks (mensaje, estado, intención)
         
-        self.mood_dataset.append((processed_message, correct_mood))
-        self.intent_dataset.append((processed_message, correct_intent))
+        Con `record=False` el feedback ya está en el corpus (RetrainWorker lo
+        guarda al recibirlo) y no se vuelve a escribir.
+        """
+        # Agregar nuevos datos al corpus (los repetidos se ignoran)
+        if record:
+            self.record_feedback(feedback_items)
+        
+        # Con el motor en línea basta con aprender los ejemplos nuevos
+        if self.engine == 'online' and self._partial_update(feedback_items):
+            print(f"Modelos actualizados en línea con {len(feedback_items)} feedback(s) nuevo(s)")
+            return
         
         # Reentrenar modelos
         self.train_models()
-        print("Modelos reentrenados con nuevo feedback")
+        print(f"Modelos reentrenados con {len(feedback_items)} feedback(s) nuevo(s)")
+    
+    def _partial_update(self, feedback_items: List[Tuple[str, str, str]]) -> bool:
+        """Actualizar los modelos en línea solo con los ejemplos nuevos
+        
+        Devuelve False si no es posible (modelo no incremental o etiquetas
+        nuevas) y hace falta un reentrenamiento completo.
+        """
+        texts = self.normalizer.normalize_batch([message for message, _, _ in feedback_items])
+        mood_labels = [mood for _, mood, _ in feedback_items]
+        intent_labels = [intent for _, _, intent in feedback_items]
+        
+        with self._train_lock:
+            active = self._active
+            classifiers = (active.mood_classifier, active.intent_classifier)
+            for classifier, labels in zip(classifiers, (mood_labels, intent_labels)):
+                if classifier is None:
+                    return False
+                estimator = classifier[-1]
+                if not hasattr(estimator, 'partial_fit') or not set(labels) <= set(estimator.classes_):
+                    return False
+            
+            start = time.perf_counter()
+            # Actualizar una copia para que las peticiones en curso sigan con el
+            # modelo actual (copiando el par junto se conserva el vectorizador compartido)
+            mood_classifier, intent_classifier = copy.deepcopy(classifiers)
+            mood_features = mood_classifier[:-1].transform(texts)
+            if shares_features(mood_classifier, intent_classifier):
+                intent_features = mood_features
+            else:
+                intent_features = intent_classifier[:-1].transform(texts)
+            for _ in range(self.online_epochs):
+                mood_classifier[-1].partial_fit(mood_features, mood_labels)
+                intent_classifier[-1].partial_fit(intent_features, intent_labels)
+            
+            phrase_index = None
+            if self.phrase_index is not None:
+                phrase_index = self.phrase_index.add(zip(texts, mood_labels, intent_labels))
+            self._activate_models(mood_classifier, intent_classifier, phrase_index=phrase_index)
+            self.save_models()
+            RETRAIN_SECONDS.labels('online').observe(time.perf_counter() - start)
+        return True
 
 # Ejemplo de uso y testing
 if __name__ == "__main__":
@@ -402,9 +1065,9 @@ if __name__ == "__main__":
         profile = nlp_model.update_user_profile(user_id, msg, feedback, rating)
         print(f"\nInteracción #{i+1}")
         print(f"Mensaje: {msg}")
-        print(f"Perfil actualizado - Conversaciones: {profile['conversation_count']}")
-        print(f"Preferencias: {profile['preferences']}")
-        print(f"Rating promedio: {profile['avg_rating']:.1f}")
+        print(f"Perfil actualizado - Conversaciones: {profile.conversation_count}")
+        print(f"Preferencias: {profile.to_dict()['preferences']}")
+        print(f"Rating promedio: {profile.avg_rating:.1f}")
     
     # Obtener insights finales
     insights = nlp_model.get_user_insights(user_id)
@@ -0,0 +1,273 @@
+"""Artefactos de modelo sin pickle: arreglos .npy + manifiesto JSON
+
+Un artefacto es un directorio con un archivo .npy por arreglo (se pueden
+abrir con mmap) y un manifest.json con la versión del formato, la
+configuración del vectorizador, las clases y el SHA-256 de cada archivo.
+
+El directorio publicado es un enlace simbólico a un directorio versionado
+oculto junto a él (.<nombre>.v*); publicar una versión nueva reemplaza el
+enlace de forma atómica, así que siempre hay un artefacto completo.
+
+Uso (desde src/screens):
+    python -m model_artifacts build model_artifact            # desde los pickles o el corpus
+    python -m model_artifacts build model_artifact --retrain  # reentrenar desde el corpus
+    python -m model_artifacts verify model_artifact
+"""
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from datetime import datetime
+from typing import Dict
+
+import numpy as np
+
+from compiled_model import CompiledSVC, CompiledTfidf
+from predictors import HeadsPredictor, shares_features
+
+FORMAT_VERSION = 1
+MANIFEST = 'manifest.json'
+HEADS = ('mood', 'intent')
+
+
+def _sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _vectorizer_arrays(vectorizer: CompiledTfidf) -> Dict[str, np.ndarray]:
+    terms = sorted(vectorizer.vocabulary, key=vectorizer.vocabulary.get)
+    return {'terms': np.array(terms, dtype=str), 'idf': vectorizer.idf}
+
+
+def _vectorizer_config(vectorizer: CompiledTfidf) -> Dict:
+    return {
+        'ngram_range': list(vectorizer.ngram_range),
+        'lowercase': vectorizer.lowercase,
+        'token_pattern': vectorizer.token_pattern,
+        'norm': vectorizer.norm,
+        'sublinear_tf': vectorizer.sublinear_tf
+    }
+
+
+def _publish(staging: str, directory: str):
+    """Convertir un directorio ya escrito en la versión publicada en `directory`
+
+    El enlace nuevo reemplaza al anterior con os.replace (atómico). El
+    directorio de la versión anterior se conserva para los lectores que la
+    estén cargando y los más antiguos se borran.
+    """
+    parent, name = os.path.split(os.path.abspath(directory))
+    prefix = f'.{name}.v'
+    target = tempfile.mkdtemp(dir=parent, prefix=f"{prefix}{datetime.now().strftime('%Y%m%d%H%M%S%f')}_")
+    os.replace(staging, target)
+
+    previous = None
+    if os.path.islink(directory):
+        previous = os.path.realpath(directory)
+    elif os.path.isdir(directory):
+        # Artefacto con el formato anterior (directorio real): se aparta una
+        # única vez para poder reemplazarlo por el enlace
+        previous = tempfile.mkdtemp(dir=parent, prefix=prefix)
+        os.replace(directory, previous)
+
+    link = f"{target}.link"
+    os.symlink(os.path.basename(target), link)
+    os.replace(link, directory)
+
+    keep = {os.path.basename(target), os.path.basename(previous or '')}
+    for entry in os.listdir(parent):
+        if entry.startswith(prefix) and entry not in keep:
+            shutil.rmtree(os.path.join(parent, entry), ignore_errors=True)
+
+
+def remove_artifact(directory: str):
+    """Borrar un artefacto publicado (el enlace y su directorio versionado)"""
+    if os.path.islink(directory):
+        target = os.path.realpath(directory)
+        os.unlink(directory)
+        shutil.rmtree(target, ignore_errors=True)
+    else:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def save_artifact(directory: str, mood_pipeline, intent_pipeline, model_version: str = None) -> Dict:
+    """Exportar un par de pipelines TF-IDF + SVC lineal a un artefacto
+
+    Se escribe en un directorio temporal que se publica al final (ver
+    _publish), así que un lector nunca ve un artefacto a medio escribir ni
+    se queda sin artefacto. Devuelve el manifiesto.
+    """
+    shared = shares_features(mood_pipeline, intent_pipeline)
+    vectorizers = {'mood': CompiledTfidf.from_vectorizer(mood_pipeline[0])}
+    vectorizers['intent'] = vectorizers['mood'] if shared else CompiledTfidf.from_vectorizer(intent_pipeline[0])
+    heads = {
+        'mood': CompiledSVC.from_estimator(mood_pipeline[-1]),
+        'intent': CompiledSVC.from_estimator(intent_pipeline[-1])
+    }
+
+    arrays = {}
+    vectorizer_names = {'mood': 'mood_vectorizer', 'intent': 'mood_vectorizer' if shared else 'intent_vectorizer'}
+    for head in HEADS:
+        for name, array in _vectorizer_arrays(vectorizers[head]).items():
+            arrays[f"{vectorizer_names[head]}.{name}"] = array
+        svc = heads[head]
+        arrays[f"{head}_head.classes"] = np.asarray(svc.classes_, dtype=str)
+        arrays[f"{head}_head.coef"] = svc.coef
+        arrays[f"{head}_head.intercept"] = svc.intercept
+        arrays[f"{head}_head.prob_a"] = svc.prob_a
+        arrays[f"{head}_head.prob_b"] = svc.prob_b
+
+    parent = os.path.dirname(os.path.abspath(directory))
+    os.makedirs(parent, exist_ok=True)
+    staging = tempfile.mkdtemp(dir=parent, prefix='.tmp_artifact_')
+    try:
+        files = {}
+        for name, array in arrays.items():
+            filename = f"{name}.npy"
+            np.save(os.path.join(staging, filename), array, allow_pickle=False)
+            files[name] = {'file': filename, 'sha256': _sha256(os.path.join(staging, filename))}
+
+        manifest = {
+            'format_version': FORMAT_VERSION,
+            'model_version': model_version or datetime.now().strftime('%Y%m%d%H%M%S%f'),
+            'created_at': datetime.now().isoformat(),
+            'shared_features': shared,
+            'heads': {
+                head: {
+                    'vectorizer': vectorizer_names[head],
+                    'labels': [str(label) for label in heads[head].classes_]
+                }
+                for head in HEADS
+            },
+            'vectorizers': {
+                vectorizer_names[head]: _vectorizer_config(vectorizers[head]) for head in HEADS
+            },
+            'arrays': files
+        }
+        with open(os.path.join(staging, MANIFEST), 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+
+        _publish(staging, directory)
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+    return manifest
+
+
+def read_manifest(directory: str) -> Dict:
+    """Leer el manifiesto de un artefacto (ValueError si el formato no es compatible)"""
+    with open(os.path.join(directory, MANIFEST), 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    if manifest.get('format_version') != FORMAT_VERSION:
+        raise ValueError(f"Formato de artefacto no soportado: {manifest.get('format_version')}")
+    return manifest
+
+
+def artifact_exists(directory: str) -> bool:
+    return bool(directory) and os.path.exists(os.path.join(directory, MANIFEST))
+
+
+def load_artifact(directory: str, verify: bool = True, mmap: bool = True):
+    """Cargar un artefacto como HeadsPredictor compilado
+
+    Devuelve (predictor, manifiesto). Con `verify` se comprueba el SHA-256
+    de cada archivo antes de usarlo; con `mmap` los pesos se mapean en
+    memoria en lugar de copiarse. El enlace se resuelve al empezar para no
+    mezclar archivos de dos versiones si se publica otra durante la carga.
+    """
+    while True:
+        target = os.path.realpath(directory)
+        try:
+            return _load_version(target, verify, mmap)
+        except FileNotFoundError:
+            # Las publicaciones siguientes borraron esta versión durante la
+            # carga: se reintenta con la que está publicada ahora
+            if os.path.realpath(directory) == target:
+                raise
+
+
+def _load_version(directory: str, verify: bool, mmap: bool):
+    manifest = read_manifest(directory)
+
+    def load(name: str) -> np.ndarray:
+        entry = manifest['arrays'][name]
+        path = os.path.join(directory, entry['file'])
+        if verify and _sha256(path) != entry['sha256']:
+            raise ValueError(f"Checksum inválido en {entry['file']}")
+        return np.load(path, mmap_mode='r' if mmap else None, allow_pickle=False)
+
+    vectorizers = {}
+    for name, config in manifest['vectorizers'].items():
+        terms = load(f"{name}.terms")
+        vectorizers[name] = CompiledTfidf(
+            {str(term): index for index, term in enumerate(terms)},
+            load(f"{name}.idf"),
+            ngram_range=tuple(config['ngram_range']),
+            lowercase=config['lowercase'],
+            token_pattern=config['token_pattern'],
+            norm=config['norm'],
+            sublinear_tf=config['sublinear_tf']
+        )
+
+    heads = {}
+    for head in HEADS:
+        heads[head] = CompiledSVC(
+            np.array(load(f"{head}_head.classes"), dtype=object),
+            load(f"{head}_head.coef"),
+            load(f"{head}_head.intercept"),
+            load(f"{head}_head.prob_a"),
+            load(f"{head}_head.prob_b")
+        )
+
+    predictor = HeadsPredictor(
+        vectorizers[manifest['heads']['mood']['vectorizer']], heads['mood'],
+        vectorizers[manifest['heads']['intent']['vectorizer']], heads['intent']
+    )
+    return predictor, manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Construir o verificar artefactos del modelo NLP")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    build = subparsers.add_parser('build', help="Exportar el modelo actual a un artefacto")
+    build.add_argument('output', help="Directorio del artefacto")
+    build.add_argument('--retrain', action='store_true', help="Reentrenar desde el corpus antes de exportar")
+    build.add_argument('--shared-features', action='store_true', help="Entrenar con vectorizador compartido")
+    verify = subparsers.add_parser('verify', help="Comprobar manifiesto y checksums")
+    verify.add_argument('directory', help="Directorio del artefacto")
+    args = parser.parse_args()
+
+    if args.command == 'verify':
+        _, manifest = load_artifact(args.directory)
+        print(f"Artefacto válido: versión {manifest['model_version']} ({len(manifest['arrays'])} arreglos)")
+        return
+
+    # Importación diferida: el servidor solo necesita este módulo para cargar
+    from model import BarranquillaNLPModel
+    from profile_store import SQLiteProfileStore
+
+    # Solo se escribe el artefacto: sin pickles y, si no hay corpus, con uno en memoria
+    corpus_path = 'training_corpus.db' if os.path.exists('training_corpus.db') else ':memory:'
+    nlp_model = BarranquillaNLPModel(
+        cache_size=0,
+        profile_store=SQLiteProfileStore(':memory:'),
+        corpus_path=corpus_path,
+        shared_features=args.shared_features,
+        autoload=False
+    )
+    try:
+        nlp_model.ensure_models(retrain=args.retrain, save=False)
+        manifest = save_artifact(args.output, nlp_model.mood_classifier, nlp_model.intent_classifier)
+    finally:
+        nlp_model.close()
+    print(f"Artefacto {manifest['model_version']} escrito en {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,161 @@
+"""Registro versionado de artefactos del modelo
+
+Estructura en disco:
+    <raíz>/versions/<versión>    artefacto publicado (model_artifacts.py)
+    <raíz>/CURRENT               nombre de la versión activa
+
+Publicar una versión escribe el artefacto completo y después reemplaza
+CURRENT de forma atómica; los servidores detectan el cambio (sondeo,
+señal o endpoint de administración) y cargan la nueva versión.
+
+Uso (desde src/screens):
+    python -m model_registry publish model_registry            # modelo actual como versión nueva
+    python -m model_registry publish model_registry --retrain  # reentrenar desde el corpus
+    python -m model_registry list model_registry
+    python -m model_registry activate model_registry <versión>
+"""
+import argparse
+import os
+import tempfile
+import threading
+from datetime import datetime
+from typing import Callable, List, Optional
+
+import model_artifacts
+
+
+class ModelRegistry:
+    """Versiones de artefactos en disco con un puntero a la activa"""
+
+    def __init__(self, root: str, keep: int = 5):
+        if keep < 1:
+            raise ValueError(f"El registro debe conservar al menos una versión (keep={keep})")
+        self.root = root
+        self.keep = keep
+        self.versions_dir = os.path.join(root, 'versions')
+        self.current_file = os.path.join(root, 'CURRENT')
+        os.makedirs(self.versions_dir, exist_ok=True)
+
+    def version_path(self, version: str) -> str:
+        return os.path.join(self.versions_dir, version)
+
+    def versions(self) -> List[str]:
+        """Versiones disponibles, de la más antigua a la más reciente"""
+        return sorted(
+            name for name in os.listdir(self.versions_dir)
+            if not name.startswith('.') and model_artifacts.artifact_exists(self.version_path(name))
+        )
+
+    def current_version(self) -> Optional[str]:
+        """Versión activa según CURRENT (None si todavía no hay ninguna)"""
+        try:
+            with open(self.current_file, 'r', encoding='utf-8') as f:
+                version = f.read().strip()
+        except FileNotFoundError:
+            return None
+        return version or None
+
+    def activate(self, version: str):
+        """Apuntar CURRENT a una versión existente (también sirve para volver atrás)"""
+        if not model_artifacts.artifact_exists(self.version_path(version)):
+            raise ValueError(f"Versión de modelo desconocida: {version}")
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, prefix='.tmp_current_')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(version)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.current_file)
+
+    def publish(self, mood_pipeline, intent_pipeline, activate: bool = True) -> str:
+        """Guardar un par de pipelines como versión nueva y (opcionalmente) activarla"""
+        version = datetime.now().strftime('%Y%m%d%H%M%S%f')
+        model_artifacts.save_artifact(self.version_path(version), mood_pipeline, intent_pipeline,
+                                      model_version=version)
+        if activate:
+            self.activate(version)
+        self.prune()
+        return version
+
+    def prune(self):
+        """Borrar las versiones más antiguas, conservando `keep` y la activa"""
+        current = self.current_version()
+        stale = [version for version in self.versions()[:-self.keep] if version != current]
+        for version in stale:
+            model_artifacts.remove_artifact(self.version_path(version))
+
+
+class RegistryWatcher:
+    """Sondeo periódico de CURRENT; llama a `on_change` cuando cambia la versión"""
+
+    def __init__(self, registry: ModelRegistry, on_change: Callable[[str], None], interval: float = 5.0):
+        self.registry = registry
+        self.on_change = on_change
+        self.interval = interval
+        self._last_seen = registry.current_version()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='model-registry-watcher', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            try:
+                version = self.registry.current_version()
+                if version and version != self._last_seen:
+                    self._last_seen = version
+                    self.on_change(version)
+            except Exception as e:
+                print(f"Error vigilando el registro de modelos: {e}")
+
+    def stop(self):
+        self._stopped.set()
+        self._thread.join()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gestionar el registro de modelos NLP")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    publish = subparsers.add_parser('publish', help="Publicar el modelo actual como versión nueva")
+    publish.add_argument('root', help="Directorio del registro")
+    publish.add_argument('--retrain', action='store_true', help="Reentrenar desde el corpus antes de publicar")
+    publish.add_argument('--shared-features', action='store_true', help="Entrenar con vectorizador compartido")
+    listing = subparsers.add_parser('list', help="Listar las versiones disponibles")
+    listing.add_argument('root', help="Directorio del registro")
+    activate = subparsers.add_parser('activate', help="Activar una versión existente")
+    activate.add_argument('root', help="Directorio del registro")
+    activate.add_argument('version', help="Versión a activar")
+    args = parser.parse_args()
+
+    registry = ModelRegistry(args.root)
+    if args.command == 'list':
+        current = registry.current_version()
+        for version in registry.versions():
+            print(f"{'*' if version == current else ' '} {version}")
+        return
+    if args.command == 'activate':
+        registry.activate(args.version)
+        print(f"Versión {args.version} activada")
+        return
+
+    # Importación diferida: el servidor solo necesita este módulo para leer el registro
+    from model import BarranquillaNLPModel
+    from profile_store import SQLiteProfileStore
+
+    # Solo se escribe en el registro: sin pickles y, si no hay corpus, con uno en memoria
+    corpus_path = 'training_corpus.db' if os.path.exists('training_corpus.db') else ':memory:'
+    nlp_model = BarranquillaNLPModel(
+        cache_size=0,
+        profile_store=SQLiteProfileStore(':memory:'),
+        corpus_path=corpus_path,
+        shared_features=args.shared_features,
+        autoload=False
+    )
+    try:
+        nlp_model.ensure_models(retrain=args.retrain, save=False)
+        version = registry.publish(nlp_model.mood_classifier, nlp_model.intent_classifier)
+    finally:
+        nlp_model.close()
+    print(f"Versión {version} publicada y activada en {args.root}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,203 @@
+"""Reglas de personalización (tips y contexto para DeepSeek) como tablas
+
+Las reglas se declaran como datos y se compilan una sola vez, al importar
+el módulo, en tablas indexadas por (estado de ánimo, intención, segmento
+de usuario). Generar los tips o el contexto es entonces una búsqueda en
+un dict más el formateo de las partes que dependen de valores concretos
+(confianzas, conteos, lugares).
+
+El contexto se arma en dos partes: profile_context() depende solo del
+perfil (y se puede cachear por versión del perfil) y render_context() le
+agrega el análisis del mensaje actual.
+
+El segmento de usuario resume los umbrales de las reglas:
+  - si es un usuario nuevo (según los insights);
+  - experiencia: 'regular' (hasta 5 conversaciones), 'experienced' (6 a 10)
+    y 'veteran' (más de 10);
+  - satisfacción: 'low' (rating promedio < 3), 'mid' y 'high' (>= 4.5).
+"""
+import itertools
+from collections import namedtuple
+from typing import Dict, List, Optional, Tuple
+
+Segment = Tuple[bool, str, str]
+
+EXPERIENCE_LEVELS = ('regular', 'experienced', 'veteran')
+SATISFACTION_LEVELS = ('low', 'mid', 'high')
+
+# --- Tips de personalización -------------------------------------------
+
+# Por categoría entre las preferencias principales (en este orden)
+PREFERENCE_TIPS = (
+    ('comer', "Este usuario disfruta de experiencias gastronómicas - recomienda restaurantes y comida típica"),
+    ('entretenimiento', "Le gusta la diversión y entretenimiento - sugiere vida nocturna y actividades sociales"),
+    ('cultura', "Interesado en cultura e historia - recomienda museos, monumentos y sitios históricos"),
+    ('naturaleza', "Disfruta la naturaleza - sugiere parques, playa y actividades al aire libre"),
+)
+
+# Por estado de ánimo dominante
+DOMINANT_MOOD_TIPS = {
+    'estresado': "Usuario frecuentemente estresado - prioriza lugares tranquilos y relajantes",
+    'energetico': "Usuario generalmente energético - sugiere actividades dinámicas y emocionantes",
+    'relajado': "Prefiere ambientes tranquilos - recomienda lugares apacibles",
+}
+
+# Por experiencia (el de usuario nuevo tiene prioridad)
+NEW_USER_TIP = "Usuario nuevo - da información básica sobre Barranquilla y lugares icónicos"
+EXPERIENCE_TIPS = {
+    'veteran': "Usuario experimentado - puede sugerir lugares menos conocidos y experiencias únicas",
+}
+
+# Por satisfacción
+SATISFACTION_TIPS = {
+    'high': "Usuario muy satisfecho con recomendaciones previas - mantén el nivel de calidad",
+    'low': "Usuario no muy satisfecho - ajusta el tipo de recomendaciones",
+}
+
+# --- Contexto para DeepSeek --------------------------------------------
+
+NEW_USER_CONTEXT = "USUARIO NUEVO: Proporciona información básica sobre Barranquilla"
+
+# Recomendación según (intención actual, estado de ánimo actual); None en
+# el estado de ánimo es el caso por defecto de esa intención
+CONTEXT_RECOMMENDATIONS = {
+    ('comer', 'estresado'): "Recomienda lugares tranquilos para comer, evita lugares muy concurridos",
+    ('comer', 'feliz'): "Sugiere experiencias gastronómicas divertidas y sociales",
+    ('entretenimiento', 'energetico'): "Recomienda vida nocturna activa y lugares con música en vivo",
+    ('cultura', 'relajado'): "Sugiere museos tranquilos y sitios históricos contemplativos",
+    ('naturaleza', 'estresado'): "Prioriza parques tranquilos y lugares junto al mar para relajarse",
+    ('naturaleza', None): "Sugiere actividades al aire libre y experiencias en la naturaleza",
+}
+
+# Instrucciones especiales por nivel de satisfacción y de experiencia
+SATISFACTION_INSTRUCTIONS = {
+    'low': "ATENCIÓN: Usuario no muy satisfecho - ajusta recomendaciones",
+}
+EXPERIENCE_INSTRUCTIONS = {
+    'experienced': "Usuario experimentado - evita repetir lugares ya recomendados",
+    'veteran': "Usuario experimentado - evita repetir lugares ya recomendados",
+}
+
+
+def user_segment(insights: Dict) -> Segment:
+    """Segmento (usuario nuevo, experiencia, satisfacción) a partir de los insights"""
+    conversation_count = insights.get('conversation_count', 0)
+    if conversation_count > 10:
+        experience = 'veteran'
+    elif conversation_count > 5:
+        experience = 'experienced'
+    else:
+        experience = 'regular'
+
+    avg_rating = insights.get('avg_rating', 0)
+    if avg_rating >= 4.5:
+        satisfaction = 'high'
+    elif avg_rating < 3:
+        satisfaction = 'low'
+    else:
+        satisfaction = 'mid'
+    return bool(insights.get('is_new_user')), experience, satisfaction
+
+
+_SEGMENTS = tuple(itertools.product((False, True), EXPERIENCE_LEVELS, SATISFACTION_LEVELS))
+
+
+def _compile_tips() -> Dict[Tuple[Optional[str], Segment], Tuple[str, ...]]:
+    """Tips que no dependen de las preferencias, por (estado dominante, segmento)"""
+    table = {}
+    for mood, segment in itertools.product((None,) + tuple(DOMINANT_MOOD_TIPS), _SEGMENTS):
+        is_new, experience, satisfaction = segment
+        lines = [DOMINANT_MOOD_TIPS.get(mood), NEW_USER_TIP if is_new else EXPERIENCE_TIPS.get(experience),
+                 SATISFACTION_TIPS.get(satisfaction)]
+        table[(mood, segment)] = tuple(line for line in lines if line)
+    return table
+
+
+def _compile_context() -> Dict[Tuple[Optional[str], Optional[str], Segment], Tuple[str, ...]]:
+    """Líneas finales del contexto por (estado actual, intención actual, segmento)"""
+    moods = {None} | {mood for _, mood in CONTEXT_RECOMMENDATIONS if mood is not None}
+    intents = {None} | {intent for intent, _ in CONTEXT_RECOMMENDATIONS}
+    table = {}
+    for mood, intent, segment in itertools.product(moods, intents, _SEGMENTS):
+        _, experience, satisfaction = segment
+        recommendation = CONTEXT_RECOMMENDATIONS.get(
+            (intent, mood), CONTEXT_RECOMMENDATIONS.get((intent, None))
+        )
+        lines = [recommendation, SATISFACTION_INSTRUCTIONS.get(satisfaction),
+                 EXPERIENCE_INSTRUCTIONS.get(experience)]
+        table[(mood, intent, segment)] = tuple(line for line in lines if line)
+    return table
+
+
+_TIPS = _compile_tips()
+_CONTEXT = _compile_context()
+_TIP_MOODS = frozenset(DOMINANT_MOOD_TIPS)
+_CONTEXT_MOODS = frozenset(mood for _, mood in CONTEXT_RECOMMENDATIONS if mood is not None)
+_CONTEXT_INTENTS = frozenset(intent for intent, _ in CONTEXT_RECOMMENDATIONS)
+
+
+def personalization_tips(insights: Dict) -> List[str]:
+    """Tips de personalización para el perfil descrito por `insights`"""
+    top_preferences = insights.get('top_preferences', [])
+    tips = [tip for category, tip in PREFERENCE_TIPS if category in top_preferences]
+    mood = insights.get('dominant_mood', '')
+    tips.extend(_TIPS[(mood if mood in _TIP_MOODS else None, user_segment(insights))])
+    return tips
+
+
+# Partes del contexto que dependen solo del perfil (se pueden cachear por versión)
+ProfileContext = namedtuple('ProfileContext', ['header', 'details', 'segment'])
+
+
+def profile_context(profile, insights: Dict) -> ProfileContext:
+    """Partes del contexto para DeepSeek que no dependen del mensaje actual"""
+    # Información básica del usuario
+    if insights.get('is_new_user'):
+        header = NEW_USER_CONTEXT
+    else:
+        header = f"Usuario con {insights.get('conversation_count', 0)} conversaciones previas"
+
+    details = []
+    top_prefs = insights.get('top_preferences', [])
+    if top_prefs:
+        details.append(f"PREFERENCIAS PRINCIPALES: {', '.join(top_prefs)}")
+
+    recent_moods = profile.recent_moods(3)
+    if recent_moods:
+        details.append(f"ESTADOS RECIENTES: {' → '.join(recent_moods)}")
+
+    avg_rating = insights.get('avg_rating', 0)
+    if avg_rating > 0:
+        details.append(f"SATISFACCIÓN PROMEDIO: {avg_rating:.1f}/5.0")
+
+    # Lugares mejor calificados
+    high_rated = [place for place, rating in profile.location_ratings.items() if rating >= 4]
+    if high_rated:
+        details.append(f"LUGARES QUE LE GUSTARON: {', '.join(high_rated[:3])}")
+
+    return ProfileContext(header, tuple(details), user_segment(insights))
+
+
+def render_context(profile_part: ProfileContext, current_mood: str, current_intent: str,
+                   mood_conf: float, intent_conf: float) -> str:
+    """Contexto completo: la parte del perfil más el análisis del mensaje actual"""
+    context = [
+        profile_part.header,
+        f"ESTADO ACTUAL: {current_mood} (confianza: {mood_conf:.1f})",
+        f"INTENCIÓN: {current_intent} (confianza: {intent_conf:.1f})",
+    ]
+    context.extend(profile_part.details)
+    # Recomendaciones e instrucciones especiales compiladas
+    context.extend(_CONTEXT[(
+        current_mood if current_mood in _CONTEXT_MOODS else None,
+        current_intent if current_intent in _CONTEXT_INTENTS else None,
+        profile_part.segment
+    )])
+    return "\n".join(context)
+
+
+def deepseek_context(profile, insights: Dict, current_mood: str, current_intent: str,
+                     mood_conf: float, intent_conf: float) -> str:
+    """Contexto personalizado para DeepSeek R1"""
+    return render_context(profile_context(profile, insights), current_mood, current_intent,
+                          mood_conf, intent_conf)
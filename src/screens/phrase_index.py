@@ -0,0 +1,93 @@
+import threading
+from typing import Dict, Iterable, Optional, Tuple
+
+# (estado de ánimo, intención); None si esa tarea no conoce el texto
+KnownLabels = Tuple[Optional[str], Optional[str]]
+
+
+class LookupCounters:
+    """Consultas y aciertos de un índice, compartidos entre sus versiones"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.lookups = 0
+        self.hits = 0
+        self.partial_hits = 0
+
+    def record(self, known: Optional[KnownLabels]):
+        with self._lock:
+            self.lookups += 1
+            if known is not None:
+                if known[0] is not None and known[1] is not None:
+                    self.hits += 1
+                else:
+                    self.partial_hits += 1
+
+    def snapshot(self) -> Tuple[int, int, int]:
+        with self._lock:
+            return self.lookups, self.hits, self.partial_hits
+
+
+class PhraseIndex:
+    """Índice hash de textos normalizados del corpus -> etiquetas conocidas
+
+    Un mensaje idéntico (tras normalizar) a un ejemplo de entrenamiento o a
+    una corrección de feedback recibe directamente sus etiquetas. Si un
+    texto aparece con varias etiquetas en una tarea, gana el ejemplo más
+    reciente (las correcciones se agregan después de las semillas).
+
+    Un índice no cambia una vez construido: rebuild() y add() devuelven uno
+    nuevo (con los mismos contadores), que el modelo publica junto con los
+    clasificadores entrenados sobre el mismo corpus.
+    """
+
+    def __init__(self, entries: Dict[str, KnownLabels] = None, counters: LookupCounters = None):
+        self._entries: Dict[str, KnownLabels] = entries if entries is not None else {}
+        self._counters = counters if counters is not None else LookupCounters()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def _merge(entries: Dict[str, KnownLabels], mood_examples: Iterable[Tuple[str, str]],
+               intent_examples: Iterable[Tuple[str, str]]):
+        for text, mood in mood_examples:
+            entries[text] = (mood, entries.get(text, (None, None))[1])
+        for text, intent in intent_examples:
+            entries[text] = (entries.get(text, (None, None))[0], intent)
+
+    def rebuild(self, mood_examples: Iterable[Tuple[str, str]],
+                intent_examples: Iterable[Tuple[str, str]]) -> 'PhraseIndex':
+        """Índice nuevo con ejemplos (texto normalizado, etiqueta) de cada tarea"""
+        entries = {}
+        self._merge(entries, mood_examples, intent_examples)
+        return PhraseIndex(entries, self._counters)
+
+    def add(self, examples: Iterable[Tuple[str, str, str]]) -> 'PhraseIndex':
+        """Índice nuevo con correcciones (texto normalizado, estado, intención) agregadas"""
+        examples = list(examples)
+        entries = dict(self._entries)
+        self._merge(
+            entries,
+            [(text, mood) for text, mood, _ in examples],
+            [(text, intent) for text, _, intent in examples]
+        )
+        return PhraseIndex(entries, self._counters)
+
+    def lookup(self, text: str) -> Optional[KnownLabels]:
+        """Etiquetas conocidas de un texto normalizado (None si no está en el índice)"""
+        known = self._entries.get(text)
+        self._counters.record(known)
+        return known
+
+    def stats(self) -> Dict:
+        """Tamaño del índice y tasa de aciertos (completos: ambas etiquetas conocidas)"""
+        lookups, hits, partial_hits = self._counters.snapshot()
+        return {
+            'size': len(self._entries),
+            'lookups': lookups,
+            'hits': hits,
+            'partial_hits': partial_hits,
+            'hit_rate': hits / lookups if lookups else 0.0,
+            'any_hit_rate': (hits + partial_hits) / lookups if lookups else 0.0
+        }
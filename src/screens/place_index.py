@@ -0,0 +1,187 @@
+import heapq
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# (lugar, calificación, intención); la intención es None si no se conoce
+PlaceRating = Tuple[str, int, Optional[str]]
+
+
+def top_rated(ratings: Dict[str, int], k: int, lowest: bool = False) -> List[Tuple[str, int]]:
+    """Los `k` lugares mejor (o peor) calificados de un dict lugar -> calificación
+
+    Equivale a ordenar todo el dict y cortar (los empates conservan el orden
+    del dict), pero con un heap de tamaño `k`.
+    """
+    select = heapq.nsmallest if lowest else heapq.nlargest
+    return select(k, ratings.items(), key=lambda item: item[1])
+
+
+class PlaceIndex:
+    """Calificaciones de lugares de todos los usuarios, agregadas por lugar
+
+    Guarda la suma y el número de calificaciones de cada lugar, en total y
+    por intención (la de la conversación en que se calificó). Se mantiene
+    con cada calificación: la anterior del mismo usuario a ese lugar se
+    descuenta y la nueva se suma, así que las consultas no recorren los
+    perfiles. Vive en la memoria del proceso; con perfiles compartidos
+    entre procesos se usa SharedPlaceIndex.
+    """
+
+    def __init__(self):
+        # lugar -> [suma, conteo]
+        self._totals: Dict[str, List[int]] = {}
+        # intención -> lugar -> [suma, conteo]
+        self._by_intent: Dict[str, Dict[str, List[int]]] = {}
+        self._rating_count = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._totals)
+
+    @staticmethod
+    def _apply(table: Dict[str, List[int]], place: str, rating: int, sign: int):
+        entry = table.get(place)
+        if entry is None:
+            entry = table[place] = [0, 0]
+        entry[0] += sign * rating
+        entry[1] += sign
+        if not entry[1]:
+            del table[place]
+
+    def _update(self, place: str, rating: int, intent: Optional[str], sign: int):
+        self._apply(self._totals, place, rating, sign)
+        if intent is not None:
+            places = self._by_intent.setdefault(intent, {})
+            self._apply(places, place, rating, sign)
+            if not places:
+                del self._by_intent[intent]
+        self._rating_count += sign
+
+    def rate(self, place: str, rating: int, intent: Optional[str] = None,
+             previous: Optional[int] = None, previous_intent: Optional[str] = None):
+        """Registrar una calificación, reemplazando la anterior (`previous`) del mismo usuario"""
+        with self._lock:
+            if previous is not None:
+                self._update(place, previous, previous_intent, -1)
+            self._update(place, rating, intent, 1)
+
+    def add_ratings(self, ratings: Iterable[PlaceRating]):
+        """Sumar las calificaciones de un perfil (al cargarlo)"""
+        with self._lock:
+            for place, rating, intent in ratings:
+                self._update(place, rating, intent, 1)
+
+    def remove_ratings(self, ratings: Iterable[PlaceRating]):
+        """Descontar las calificaciones de un perfil (al reemplazarlo)"""
+        with self._lock:
+            for place, rating, intent in ratings:
+                self._update(place, rating, intent, -1)
+
+    def rebuild(self, ratings: Iterable[PlaceRating]):
+        """Reemplazar el índice con las calificaciones de todos los perfiles"""
+        index = PlaceIndex()
+        index.add_ratings(ratings)
+        with self._lock:
+            self._totals = index._totals
+            self._by_intent = index._by_intent
+            self._rating_count = index._rating_count
+
+    def top_places(self, k: int = 10, intent: str = None, min_ratings: int = 1) -> List[Dict]:
+        """Los `k` lugares con mejor promedio (en total o para una intención)
+
+        Los empates en el promedio se resuelven por número de calificaciones;
+        `min_ratings` descarta lugares con muy pocas.
+        """
+        with self._lock:
+            table = self._totals if intent is None else self._by_intent.get(intent, {})
+            best = heapq.nlargest(
+                k,
+                ((place, total, count) for place, (total, count) in table.items() if count >= min_ratings),
+                key=lambda item: (item[1] / item[2], item[2])
+            )
+        return [
+            {"place": place, "avg_rating": total / count, "ratings": count}
+            for place, total, count in best
+        ]
+
+    def place_stats(self, place: str) -> Optional[Dict]:
+        """Promedio y número de calificaciones de un lugar, con el desglose por intención"""
+        with self._lock:
+            entry = self._totals.get(place)
+            if entry is None:
+                return None
+            total, count = entry
+            by_intent = {
+                intent: {"avg_rating": places[place][0] / places[place][1], "ratings": places[place][1]}
+                for intent, places in self._by_intent.items() if place in places
+            }
+        return {"place": place, "avg_rating": total / count, "ratings": count, "by_intent": by_intent}
+
+    def stats(self) -> Dict:
+        """Lugares, calificaciones e intenciones en el índice"""
+        with self._lock:
+            return {
+                'places': len(self._totals),
+                'ratings': self._rating_count,
+                'intents': len(self._by_intent)
+            }
+
+
+class SharedPlaceIndex:
+    """Índice de lugares en el almacenamiento SQLite compartido por varios procesos
+
+    Misma interfaz que PlaceIndex, pero las sumas y conteos viven en el
+    archivo de perfiles (SQLiteProfileStore). Cada calificación se aplica
+    dentro de la transacción exclusiva que escribe el perfil, así que todos
+    los workers responden con el mismo agregado, y las consultas leen solo
+    la tabla de lugares.
+    """
+
+    def __init__(self, store):
+        self.store = store
+
+    def __len__(self) -> int:
+        return self.stats()['places']
+
+    def rate(self, place: str, rating: int, intent: Optional[str] = None,
+             previous: Optional[int] = None, previous_intent: Optional[str] = None):
+        """Registrar una calificación, reemplazando la anterior (`previous`) del mismo usuario"""
+        changes = [(place, previous, previous_intent, -1)] if previous is not None else []
+        changes.append((place, rating, intent, 1))
+        self.store.update_place_ratings(changes)
+
+    def add_ratings(self, ratings: Iterable[PlaceRating]):
+        """Sumar las calificaciones de un perfil que todavía no está en el almacenamiento"""
+        self.store.update_place_ratings((place, rating, intent, 1) for place, rating, intent in ratings)
+
+    def remove_ratings(self, ratings: Iterable[PlaceRating]):
+        """Descontar las calificaciones de un perfil (al reemplazarlo)"""
+        self.store.update_place_ratings((place, rating, intent, -1) for place, rating, intent in ratings)
+
+    def rebuild(self, ratings: Iterable[PlaceRating]):
+        """Reemplazar el índice con las calificaciones de todos los perfiles"""
+        self.store.replace_place_ratings(ratings)
+
+    def top_places(self, k: int = 10, intent: str = None, min_ratings: int = 1) -> List[Dict]:
+        """Los `k` lugares con mejor promedio (en total o para una intención)"""
+        return [
+            {"place": place, "avg_rating": total / count, "ratings": count}
+            for place, total, count in self.store.top_places(k, intent, min_ratings)
+        ]
+
+    def place_stats(self, place: str) -> Optional[Dict]:
+        """Promedio y número de calificaciones de un lugar, con el desglose por intención"""
+        rows = {intent: (total, count) for intent, total, count in self.store.place_ratings(place)}
+        if '' not in rows:
+            return None
+        total, count = rows.pop('')
+        by_intent = {
+            intent: {"avg_rating": intent_total / intent_count, "ratings": intent_count}
+            for intent, (intent_total, intent_count) in rows.items()
+        }
+        return {"place": place, "avg_rating": total / count, "ratings": count, "by_intent": by_intent}
+
+    def stats(self) -> Dict:
+        """Lugares, calificaciones e intenciones en el índice"""
+        places, ratings, intents = self.store.place_rating_stats()
+        return {'places': places, 'ratings': ratings, 'intents': intents}
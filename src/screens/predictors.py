@@ -0,0 +1,90 @@
+from typing import Sequence, Tuple
+
+import numpy as np
+
+from compiled_model import CHUNK_SIZE, CompiledSVC, CompiledTfidf
+
+
+def predict_head(head, features) -> Tuple[np.ndarray, np.ndarray]:
+    """Etiquetas (regla de decisión del clasificador) y probabilidades de una cabeza
+
+    La etiqueta sale de predict() y no del argmax de las probabilidades:
+    con pocos ejemplos la calibración de Platt del SVC puede contradecir su
+    función de decisión.
+    """
+    if hasattr(head, 'predict_with_proba'):
+        return head.predict_with_proba(features)
+    return head.predict(features), head.predict_proba(features)
+
+
+class HeadsPredictor:
+    """Vectorizador(es) y cabezas de estado de ánimo e intención
+
+    Cada texto se vectoriza una sola vez por vectorizador; si ambas cabezas
+    comparten vectorizador, una sola vez en total.
+    """
+
+    def __init__(self, mood_vectorizer, mood_head, intent_vectorizer, intent_head):
+        self.mood_vectorizer = mood_vectorizer
+        self.mood_head = mood_head
+        self.intent_vectorizer = intent_vectorizer
+        self.intent_head = intent_head
+
+    @property
+    def shared(self) -> bool:
+        return self.mood_vectorizer is self.intent_vectorizer
+
+    @property
+    def classes_(self) -> Tuple[np.ndarray, np.ndarray]:
+        return self.mood_head.classes_, self.intent_head.classes_
+
+    def predict(self, texts: Sequence[str]) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """Etiquetas y probabilidades de estado de ánimo e intención"""
+        results = ([], [], [], [])
+        for start in range(0, len(texts), CHUNK_SIZE):
+            chunk = texts[start:start + CHUNK_SIZE]
+            mood_features = self.mood_vectorizer.transform(chunk)
+            intent_features = mood_features if self.shared else self.intent_vectorizer.transform(chunk)
+            mood_labels, mood_probs = predict_head(self.mood_head, mood_features)
+            intent_labels, intent_probs = predict_head(self.intent_head, intent_features)
+            for collected, part in zip(results, (mood_labels, mood_probs, intent_labels, intent_probs)):
+                collected.append(part)
+        mood_labels, mood_probs, intent_labels, intent_probs = results
+        return (np.concatenate(mood_labels), np.vstack(mood_probs),
+                np.concatenate(intent_labels), np.vstack(intent_probs))
+
+    def predict_task(self, task: str, texts: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """Etiquetas y probabilidades de una sola cabeza ('mood' o 'intent')"""
+        if task == 'mood':
+            vectorizer, head = self.mood_vectorizer, self.mood_head
+        else:
+            vectorizer, head = self.intent_vectorizer, self.intent_head
+        labels, probs = [], []
+        for start in range(0, len(texts), CHUNK_SIZE):
+            chunk_labels, chunk_probs = predict_head(head, vectorizer.transform(texts[start:start + CHUNK_SIZE]))
+            labels.append(chunk_labels)
+            probs.append(chunk_probs)
+        return np.concatenate(labels), np.vstack(probs)
+
+
+def shares_features(mood_pipeline, intent_pipeline) -> bool:
+    """Indica si ambos pipelines usan el mismo vectorizador"""
+    return mood_pipeline[0] is intent_pipeline[0]
+
+
+def build_predictor(mood_pipeline, intent_pipeline, compiled: bool = False) -> HeadsPredictor:
+    """Predictor de inferencia para un par de pipelines entrenados
+
+    Con `compiled` se extraen los pesos a NumPy (ValueError si el pipeline
+    no es compilable). Si ambos pipelines comparten vectorizador, se usa
+    un único paso de vectorización para las dos cabezas.
+    """
+    shared = shares_features(mood_pipeline, intent_pipeline)
+    if compiled:
+        mood_vectorizer = CompiledTfidf.from_vectorizer(mood_pipeline[0])
+        intent_vectorizer = mood_vectorizer if shared else CompiledTfidf.from_vectorizer(intent_pipeline[0])
+        return HeadsPredictor(
+            mood_vectorizer, CompiledSVC.from_estimator(mood_pipeline[-1]),
+            intent_vectorizer, CompiledSVC.from_estimator(intent_pipeline[-1])
+        )
+    return HeadsPredictor(mood_pipeline[0], mood_pipeline[-1], intent_pipeline[0], intent_pipeline[-1])
@@ -0,0 +1,108 @@
+"""Servidor de producción: un maestro precarga el modelo y crea N workers con fork()
+
+El maestro importa server.py (carga o entrena el modelo una sola vez),
+abre el socket y crea los workers; los pesos del modelo quedan compartidos
+por copy-on-write y los perfiles se comparten a través de SQLite.
+
+Uso (desde src/screens):
+    NLP_WORKERS=4 python prefork.py
+
+Variables: NLP_WORKERS (por defecto, número de CPUs), NLP_HOST, NLP_PORT.
+Por defecto se activan los perfiles compartidos (NLP_SHARED_PROFILES=1) y
+el registro de modelos (NLP_REGISTRY_DIR=model_registry). Solo el primer
+worker reentrena y publica en el registro (si termina, su reemplazo hereda
+el papel); los demás guardan el feedback en el corpus compartido y
+recargan los modelos publicados.
+"""
+import gc
+import os
+import signal
+import socket
+import sys
+
+from werkzeug.serving import make_server
+
+
+def serve_worker(app_module, listener: socket.socket, host: str, port: int, hup_handler, trainer: bool):
+    """Bucle de un worker: atiende peticiones sobre el socket heredado"""
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    signal.signal(signal.SIGHUP, hup_handler)
+    app_module.after_fork(trainer=trainer)
+    server = make_server(host, port, app_module.app, threaded=True, fd=listener.fileno())
+    server.serve_forever()
+
+
+def main():
+    workers = int(os.environ.get('NLP_WORKERS', os.cpu_count() or 1))
+    host = os.environ.get('NLP_HOST', '0.0.0.0')
+    port = int(os.environ.get('NLP_PORT', 8080))
+    os.environ.setdefault('NLP_SHARED_PROFILES', '1')
+    os.environ.setdefault('NLP_REGISTRY_DIR', 'model_registry')
+
+    listener = socket.create_server((host, port), backlog=1024)
+    listener.set_inheritable(True)
+
+    # Precarga: modelo, perfiles y predictor se crean una sola vez en el maestro
+    import server as app_module
+    app_module.nlp_model.predict_mood_and_intent('hola')
+    app_module.prepare_fork()
+    # Sacar los objetos precargados del recolector de ciclos para que no
+    # toque (y copie) sus páginas en cada worker
+    gc.freeze()
+
+    # Manejador de SIGHUP de server.py (recarga desde el registro) para los workers
+    hup_handler = signal.getsignal(signal.SIGHUP)
+    if hup_handler in (signal.SIG_DFL, None):
+        hup_handler = signal.SIG_IGN
+    # pid -> número de worker; el worker 0 es el que reentrena
+    children = {}
+    stopping = False
+
+    def spawn(slot: int):
+        pid = os.fork()
+        if pid == 0:
+            try:
+                serve_worker(app_module, listener, host, port, hup_handler, trainer=slot == 0)
+            except Exception as e:
+                print(f"Error en el worker {os.getpid()}: {e}")
+                os._exit(1)
+            os._exit(0)
+        children[pid] = slot
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            os.kill(pid, signal.SIGTERM)
+
+    def forward_hup(signum, frame):
+        # Cada worker recarga el modelo desde el registro
+        for pid in list(children):
+            os.kill(pid, signal.SIGHUP)
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGHUP, forward_hup)
+
+    for slot in range(workers):
+        spawn(slot)
+    print(f"🚀 Maestro {os.getpid()} sirviendo en {host}:{port} con {workers} worker(s)")
+    sys.stdout.flush()
+
+    # Reemplazar los workers que terminen inesperadamente
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        slot = children.pop(pid, None)
+        if slot is not None and not stopping:
+            print(f"Worker {pid} terminó (estado {status}), se crea otro")
+            spawn(slot)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,442 @@
+"""Almacenamiento persistente de perfiles de usuario
+
+Uso (migración):
+    python profile_store.py import user_profiles.json   # JSON -> SQLite
+    python profile_store.py export user_profiles.json   # SQLite -> JSON
+"""
+import atexit
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from metrics import PROFILE_FLUSH_ERRORS, PROFILE_FLUSH_SECONDS
+
+FLUSH_MODES = ('sync', 'batch', 'interval')
+
+
+def write_json_atomic(path: str, data, indent: int = None):
+    """Escribir JSON en un archivo temporal y reemplazar el destino de forma atómica"""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp_', suffix='.json')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=indent)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+class StripedLock:
+    """Candados por usuario repartidos en un número fijo de franjas
+
+    La misma clave siempre usa el mismo candado (sus actualizaciones se
+    serializan); claves distintas casi siempre caen en franjas distintas y
+    avanzan en paralelo. Los candados son reentrantes.
+    """
+
+    def __init__(self, stripes: int = 64):
+        self._locks = [threading.RLock() for _ in range(stripes)]
+
+    def for_key(self, key: str) -> threading.RLock:
+        return self._locks[hash(key) % len(self._locks)]
+
+
+class JSONProfileStore:
+    """Formato original: todos los perfiles en un único archivo JSON
+
+    Cada escritura reescribe el archivo completo (de forma atómica), así que
+    solo es recomendable para pocos usuarios o para exportar.
+    """
+
+    def __init__(self, path: str = 'user_profiles.json'):
+        self.path = path
+        self._profiles = {}
+        self._lock = threading.Lock()
+
+    def load_all(self) -> Dict[str, Dict]:
+        """Cargar todos los perfiles"""
+        with self._lock:
+            if os.path.exists(self.path):
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    self._profiles = json.load(f)
+            return dict(self._profiles)
+
+    def save(self, user_id: str, profile: Dict):
+        """Guardar un perfil"""
+        self.save_many({user_id: profile})
+
+    def save_many(self, profiles: Dict[str, Dict]):
+        """Guardar varios perfiles en una sola escritura"""
+        with self._lock:
+            self._profiles.update(profiles)
+            write_json_atomic(self.path, self._profiles, indent=2)
+
+    def count(self) -> int:
+        """Número de perfiles almacenados"""
+        with self._lock:
+            return len(self._profiles)
+
+    def close(self):
+        pass
+
+
+class SQLiteProfileStore:
+    """Un perfil por fila en SQLite: cada actualización escribe solo ese perfil
+
+    Varios procesos pueden compartir el mismo archivo (modo WAL); exclusive()
+    permite leer y reescribir un perfil sin perder escrituras concurrentes.
+    Cada escritura incrementa la revisión del perfil, así que un proceso
+    puede saber si otro lo cambió sin releerlo (load_if_changed()).
+
+    El mismo archivo guarda la suma y el número de calificaciones de cada
+    lugar (en total y por intención), para que todos los procesos consulten
+    un único índice de lugares (place_index.SharedPlaceIndex).
+    """
+
+    def __init__(self, path: str = 'user_profiles.db', synchronous: str = 'FULL'):
+        self.path = path
+        # FULL: fsync en cada commit; NORMAL: fsync solo en checkpoints del WAL
+        if synchronous.upper() not in ('OFF', 'NORMAL', 'FULL', 'EXTRA'):
+            raise ValueError(f"Valor de synchronous no válido: {synchronous}")
+        self.synchronous = synchronous.upper()
+        # Reentrante: save_many() se puede llamar dentro de exclusive()
+        self._lock = threading.RLock()
+        self._connect()
+
+    def _connect(self):
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(f'PRAGMA synchronous={self.synchronous}')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS profiles ('
+            'user_id TEXT PRIMARY KEY, '
+            'data TEXT NOT NULL, '
+            'revision INTEGER NOT NULL DEFAULT 0)'
+        )
+        columns = [row[1] for row in self._conn.execute('PRAGMA table_info(profiles)')]
+        if 'revision' not in columns:
+            # Archivos creados antes de existir la revisión
+            self._conn.execute('ALTER TABLE profiles ADD COLUMN revision INTEGER NOT NULL DEFAULT 0')
+        # intent = '' para el agregado de todas las intenciones
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS place_ratings ('
+            'place TEXT NOT NULL, '
+            'intent TEXT NOT NULL, '
+            'total INTEGER NOT NULL, '
+            'count INTEGER NOT NULL, '
+            'PRIMARY KEY (place, intent))'
+        )
+        self._conn.commit()
+
+    def reopen(self):
+        """Abrir una conexión nueva (en un proceso hijo tras fork)"""
+        self._lock = threading.RLock()
+        self._connect()
+
+    @contextmanager
+    def exclusive(self):
+        """Transacción de escritura exclusiva, también frente a otros procesos
+
+        Mientras dura, ningún otro proceso puede escribir perfiles; la
+        transacción termina con el próximo save() o al salir del bloque.
+        """
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                yield
+            except BaseException:
+                if self._conn.in_transaction:
+                    self._conn.rollback()
+                raise
+            if self._conn.in_transaction:
+                self._conn.commit()
+
+    def load_all(self) -> Dict[str, Dict]:
+        """Cargar todos los perfiles"""
+        with self._lock:
+            rows = self._conn.execute('SELECT user_id, data FROM profiles').fetchall()
+        return {user_id: json.loads(data) for user_id, data in rows}
+
+    def load(self, user_id: str) -> Dict:
+        """Cargar un perfil (None si no existe)"""
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT data FROM profiles WHERE user_id = ?', (user_id,)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def load_if_changed(self, user_id: str, revision: Optional[int]) -> Optional[Tuple[Dict, int]]:
+        """Perfil y su revisión si la guardada no es `revision` (None si no cambió o no existe)"""
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT data, revision FROM profiles WHERE user_id = ? AND revision IS NOT ?',
+                (user_id, revision)
+            ).fetchone()
+        return (json.loads(row[0]), row[1]) if row else None
+
+    def save(self, user_id: str, profile: Dict) -> int:
+        """Guardar un perfil; devuelve su revisión nueva"""
+        return self.save_many({user_id: profile})[user_id]
+
+    def save_many(self, profiles: Dict[str, Dict]) -> Dict[str, int]:
+        """Guardar varios perfiles en una sola transacción; devuelve la revisión nueva de cada uno"""
+        rows = [
+            (user_id, json.dumps(profile, ensure_ascii=False))
+            for user_id, profile in profiles.items()
+        ]
+        with self._lock, self._conn:
+            self._conn.executemany(
+                'INSERT INTO profiles (user_id, data) VALUES (?, ?) '
+                'ON CONFLICT(user_id) DO UPDATE SET data = excluded.data, revision = revision + 1',
+                rows
+            )
+            # Dentro de la misma transacción: ningún otro proceso escribió entre medio
+            return {
+                user_id: self._conn.execute(
+                    'SELECT revision FROM profiles WHERE user_id = ?', (user_id,)
+                ).fetchone()[0]
+                for user_id in profiles
+            }
+
+    def count(self) -> int:
+        """Número de perfiles almacenados"""
+        with self._lock:
+            return self._conn.execute('SELECT COUNT(*) FROM profiles').fetchone()[0]
+
+    def _apply_place_ratings(self, changes: Iterable[Tuple[str, int, Optional[str], int]]):
+        for place, rating, intent, sign in changes:
+            for key in ('', intent) if intent else ('',):
+                self._conn.execute(
+                    'INSERT INTO place_ratings (place, intent, total, count) VALUES (?, ?, ?, ?) '
+                    'ON CONFLICT(place, intent) DO UPDATE SET '
+                    'total = total + excluded.total, count = count + excluded.count',
+                    (place, key, sign * rating, sign)
+                )
+            self._conn.execute('DELETE FROM place_ratings WHERE place = ? AND count = 0', (place,))
+
+    def update_place_ratings(self, changes: Iterable[Tuple[str, int, Optional[str], int]]):
+        """Sumar (signo 1) o descontar (signo -1) calificaciones (lugar, calificación, intención, signo)
+
+        Dentro de exclusive() los cambios forman parte de esa transacción y
+        se confirman junto con el perfil; fuera, en una transacción propia.
+        """
+        with self._lock:
+            if self._conn.in_transaction:
+                self._apply_place_ratings(changes)
+            else:
+                with self._conn:
+                    self._apply_place_ratings(changes)
+
+    def replace_place_ratings(self, ratings: Iterable[Tuple[str, int, Optional[str]]]):
+        """Reemplazar los agregados por los de las calificaciones indicadas (lugar, calificación, intención)"""
+        with self._lock:
+            in_transaction = self._conn.in_transaction
+            try:
+                self._conn.execute('DELETE FROM place_ratings')
+                self._apply_place_ratings((place, rating, intent, 1) for place, rating, intent in ratings)
+            except BaseException:
+                if not in_transaction:
+                    self._conn.rollback()
+                raise
+            if not in_transaction:
+                self._conn.commit()
+
+    def top_places(self, k: int, intent: Optional[str] = None,
+                   min_ratings: int = 1) -> List[Tuple[str, int, int]]:
+        """(lugar, suma, conteo) de los `k` lugares con mejor promedio"""
+        with self._lock:
+            return self._conn.execute(
+                'SELECT place, total, count FROM place_ratings WHERE intent = ? AND count >= ? '
+                'ORDER BY CAST(total AS REAL) / count DESC, count DESC LIMIT ?',
+                (intent or '', min_ratings, k)
+            ).fetchall()
+
+    def place_ratings(self, place: str) -> List[Tuple[str, int, int]]:
+        """(intención, suma, conteo) de un lugar; intención '' para el total"""
+        with self._lock:
+            return self._conn.execute(
+                'SELECT intent, total, count FROM place_ratings WHERE place = ?', (place,)
+            ).fetchall()
+
+    def place_rating_stats(self) -> Tuple[int, int, int]:
+        """Lugares, calificaciones e intenciones con calificaciones"""
+        with self._lock:
+            places, ratings = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(count), 0) FROM place_ratings WHERE intent = ''"
+            ).fetchone()
+            intents = self._conn.execute(
+                "SELECT COUNT(DISTINCT intent) FROM place_ratings WHERE intent != ''"
+            ).fetchone()[0]
+        return places, ratings, intents
+
+    def import_json(self, path: str) -> int:
+        """Importar perfiles desde un archivo JSON del formato original"""
+        with open(path, 'r', encoding='utf-8') as f:
+            profiles = json.load(f)
+        self.save_many(profiles)
+        return len(profiles)
+
+    def export_json(self, path: str) -> int:
+        """Exportar todos los perfiles al formato JSON original"""
+        profiles = self.load_all()
+        write_json_atomic(path, profiles, indent=2)
+        return len(profiles)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class ProfileFlusher:
+    """Escritura diferida (write-behind) de perfiles modificados
+
+    Modos:
+      - 'sync': cada perfil se escribe en el momento en que se marca.
+      - 'batch': un hilo en segundo plano escribe cuando se acumulan
+        `batch_size` perfiles pendientes o, como máximo, cada `interval_ms`.
+      - 'interval': el hilo escribe los pendientes cada `interval_ms`.
+
+    Al cerrar (o al terminar el proceso) siempre se escriben los pendientes.
+    """
+
+    def __init__(self, store, snapshot: Callable[[Iterable[str]], Dict[str, Dict]],
+                 mode: str = 'sync', interval_ms: int = 1000, batch_size: int = 100):
+        if mode not in FLUSH_MODES:
+            raise ValueError(f"Modo de escritura desconocido: {mode}")
+        self.store = store
+        self.snapshot = snapshot
+        self.mode = mode
+        self.interval = interval_ms / 1000.0
+        self.batch_size = batch_size
+
+        self._dirty = {}  # user_id -> instante en que quedó pendiente
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = False
+        self.flush_count = 0
+        self.last_flush_at = None
+        self.last_flush_duration = 0.0
+        self.last_error = None
+
+        self._thread = None
+        if mode != 'sync':
+            self._thread = threading.Thread(target=self._run, name='profile-flusher', daemon=True)
+            self._thread.start()
+            atexit.register(self.close)
+
+    def mark_dirty(self, user_id: str):
+        """Registrar que un perfil cambió y debe persistirse
+
+        En modo 'sync' devuelve lo que devuelva el almacenamiento al guardar
+        (las revisiones nuevas en SQLite).
+        """
+        if self.mode == 'sync':
+            start = time.perf_counter()
+            try:
+                revisions = self.store.save_many(self.snapshot([user_id]))
+            except Exception:
+                PROFILE_FLUSH_ERRORS.inc()
+                raise
+            PROFILE_FLUSH_SECONDS.observe(time.perf_counter() - start)
+            return revisions
+        with self._lock:
+            self._dirty.setdefault(user_id, time.monotonic())
+            pending = len(self._dirty)
+        if self.mode == 'batch' and pending >= self.batch_size:
+            self._wakeup.set()
+
+    def flush(self):
+        """Escribir ahora todos los perfiles pendientes"""
+        with self._flush_lock:
+            with self._lock:
+                dirty, self._dirty = self._dirty, {}
+            if not dirty:
+                return
+            start = time.monotonic()
+            try:
+                self.store.save_many(self.snapshot(dirty))
+                self.last_error = None
+            except Exception as e:
+                # Conservar los pendientes para reintentar en el próximo ciclo
+                with self._lock:
+                    for user_id, since in dirty.items():
+                        self._dirty[user_id] = min(since, self._dirty.get(user_id, since))
+                self.last_error = str(e)
+                PROFILE_FLUSH_ERRORS.inc()
+                print(f"Error guardando perfiles pendientes: {e}")
+                return
+            self.flush_count += 1
+            self.last_flush_at = time.time()
+            self.last_flush_duration = time.monotonic() - start
+            PROFILE_FLUSH_SECONDS.observe(self.last_flush_duration)
+
+    def _run(self):
+        while not self._stopped:
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            self.flush()
+
+    def stats(self) -> Dict:
+        """Estado de la escritura diferida, incluido el retraso del pendiente más antiguo"""
+        with self._lock:
+            pending = len(self._dirty)
+            oldest = min(self._dirty.values()) if self._dirty else None
+        return {
+            'mode': self.mode,
+            'pending': pending,
+            'flush_lag_seconds': time.monotonic() - oldest if oldest is not None else 0.0,
+            'flush_count': self.flush_count,
+            'last_flush_at': self.last_flush_at,
+            'last_flush_duration_seconds': self.last_flush_duration,
+            'last_error': self.last_error
+        }
+
+    def close(self):
+        """Detener el hilo y escribir los pendientes"""
+        self._stopped = True
+        self._wakeup.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+        self.flush()
+
+
+def create_profile_store(kind: str = 'sqlite', path: str = None, synchronous: str = 'FULL'):
+    """Crear el almacenamiento de perfiles indicado ('sqlite' o 'json')
+
+    Al crear un almacenamiento SQLite vacío se importa automáticamente
+    user_profiles.json si existe, para migrar instalaciones anteriores.
+    """
+    if kind == 'json':
+        return JSONProfileStore(path or 'user_profiles.json')
+    if kind != 'sqlite':
+        raise ValueError(f"Tipo de almacenamiento desconocido: {kind}")
+
+    store = SQLiteProfileStore(path or 'user_profiles.db', synchronous=synchronous)
+    if store.count() == 0 and os.path.exists('user_profiles.json'):
+        imported = store.import_json('user_profiles.json')
+        print(f"Migrados {imported} perfiles desde user_profiles.json")
+    return store
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 3 or sys.argv[1] not in ('import', 'export'):
+        print(__doc__)
+        sys.exit(1)
+
+    store = SQLiteProfileStore()
+    if sys.argv[1] == 'import':
+        print(f"Importados {store.import_json(sys.argv[2])} perfiles")
+    else:
+        print(f"Exportados {store.export_json(sys.argv[2])} perfiles")
+    store.close()
@@ -0,0 +1,162 @@
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Tuple
+
+
+class RetrainWorker:
+    """Reentrenamiento en segundo plano a partir del feedback recibido
+
+    El feedback se encola y un hilo dedicado lo procesa: tras recibir el
+    primer elemento espera `debounce_seconds` para agrupar ráfagas y entrena
+    una sola vez con todo lo acumulado. El modelo entrena los pipelines
+    nuevos aparte y los publica de forma atómica al terminar.
+
+    Si el entrenamiento falla, el lote vuelve a la cola (junto con el
+    feedback que llegue mientras tanto) y se reintenta tras
+    `retry_seconds`, hasta `max_retries` veces. Después se descarta de la
+    cola y se cuenta en `dropped_feedback`; ese feedback ya está en el
+    corpus, así que el próximo reentrenamiento completo lo incluye.
+
+    Con varios procesos (prefork.py) solo uno entrena y publica. En los
+    demás (`train=False`) el feedback solo se guarda en el corpus
+    compartido; el que entrena lo detecta sondeando el corpus cada
+    `corpus_poll_seconds` y reentrena con el corpus completo.
+    """
+
+    def __init__(self, nlp_model, debounce_seconds: float = 2.0, retry_seconds: float = 5.0,
+                 max_retries: int = 3, train: bool = True, corpus_poll_seconds: float = None):
+        self.nlp_model = nlp_model
+        self.debounce_seconds = debounce_seconds
+        self.retry_seconds = retry_seconds
+        self.max_retries = max_retries
+        self.train = train
+        self.corpus_poll_seconds = corpus_poll_seconds
+        self._corpus_version = nlp_model.corpus.data_version() if corpus_poll_seconds else None
+
+        self._pending: List[Tuple[str, str, str]] = []
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._idle = threading.Event()
+        self._idle.set()
+
+        self.state = 'idle' if train else 'delegated'
+        self.retrain_count = 0
+        self.last_started_at = None
+        self.last_finished_at = None
+        self.last_duration_seconds = None
+        self.last_batch_size = 0
+        self.last_error = None
+        self.failed_attempts = 0
+        self.dropped_feedback = 0
+
+        if train:
+            self._thread = threading.Thread(target=self._run, name='retrain-worker', daemon=True)
+            self._thread.start()
+
+    def submit(self, user_message: str, correct_mood: str, correct_intent: str) -> Dict:
+        """Persistir y encolar un feedback para el próximo reentrenamiento"""
+        self.nlp_model.record_feedback([(user_message, correct_mood, correct_intent)])
+        if not self.train:
+            return self.status()
+        with self._lock:
+            self._pending.append((user_message, correct_mood, correct_intent))
+            self._idle.clear()
+            if self.state == 'idle':
+                self.state = 'pending'
+        self._wakeup.set()
+        return self.status()
+
+    def wait_idle(self, timeout: float = None) -> bool:
+        """Esperar a que no quede feedback pendiente ni entrenamiento en curso"""
+        return self._idle.wait(timeout)
+
+    def _corpus_changed(self) -> bool:
+        """Indica si otro proceso guardó feedback en el corpus desde la última consulta"""
+        if not self.corpus_poll_seconds:
+            return False
+        version = self.nlp_model.corpus.data_version()
+        changed = version != self._corpus_version
+        self._corpus_version = version
+        return changed
+
+    def _run(self):
+        while True:
+            woken = self._wakeup.wait(self.corpus_poll_seconds or None)
+            external = self._corpus_changed()
+            if not woken and not external:
+                continue
+            # Agrupar el feedback que llegue durante la ventana de espera
+            time.sleep(self.debounce_seconds)
+            self._wakeup.clear()
+            external = self._corpus_changed() or external
+
+            with self._lock:
+                batch, self._pending = self._pending, []
+                if not batch and not external:
+                    continue
+                self.state = 'training'
+                self.last_started_at = datetime.now().isoformat()
+
+            start = time.monotonic()
+            error = None
+            try:
+                if external:
+                    # El feedback de otros procesos solo está en el corpus
+                    self.nlp_model.train_models()
+                else:
+                    # submit() ya guardó el lote en el corpus
+                    self.nlp_model.retrain_with_feedback_batch(batch, record=False)
+            except Exception as e:
+                error = e
+                print(f"Error reentrenando con feedback: {e}")
+
+            with self._lock:
+                self.last_duration_seconds = time.monotonic() - start
+                self.last_finished_at = datetime.now().isoformat()
+                self.last_batch_size = len(batch)
+                retry = False
+                if error is None:
+                    self.retrain_count += 1
+                    self.last_error = None
+                    self.failed_attempts = 0
+                else:
+                    self.last_error = str(error)
+                    self.failed_attempts += 1
+                    retry = self.failed_attempts <= self.max_retries
+                    if retry:
+                        self._pending = batch + self._pending
+                        if external:
+                            # Forzar que el reintento vuelva a entrenar con el corpus
+                            self._corpus_version = None
+                    else:
+                        self.dropped_feedback += len(batch)
+                        self.failed_attempts = 0
+                if retry:
+                    self.state = 'retrying'
+                elif self._pending:
+                    self.state = 'pending'
+                else:
+                    self.state = 'idle'
+                    self._idle.set()
+
+            if retry:
+                time.sleep(self.retry_seconds)
+                self._wakeup.set()
+
+    def status(self) -> Dict:
+        """Estado del reentrenamiento y versión del modelo activo"""
+        with self._lock:
+            return {
+                'state': self.state,
+                'pending_feedback': len(self._pending),
+                'retrain_count': self.retrain_count,
+                'last_started_at': self.last_started_at,
+                'last_finished_at': self.last_finished_at,
+                'last_duration_seconds': self.last_duration_seconds,
+                'last_batch_size': self.last_batch_size,
+                'last_error': self.last_error,
+                'failed_attempts': self.failed_attempts,
+                'dropped_feedback': self.dropped_feedback,
+                'model_version': self.nlp_model.model_version
+            }
@@ -1,8 +1,21 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, g, request, jsonify
 from flask_cors import CORS
+import os
+import signal
+import threading
+import time
 import uuid
 import hashlib
+import hmac
 from model import BarranquillaNLPModel
+from profile_store import create_profile_store
+from retrain_worker import RetrainWorker
+from model_registry import RegistryWatcher
+from prediction_cache import PredictionCache
+import personalization_rules
+from place_index import top_rated
+from user_profile import UserProfile
+import metrics
 import json
 from datetime import datetime
 
@@ -11,7 +24,178 @@ app = Flask(__name__)
 CORS(app)  # Permitir requests desde React Native
 
 # Inicializar modelo NLP
-nlp_model = BarranquillaNLPModel()
+nlp_model = BarranquillaNLPModel(
+    cache_size=int(os.environ.get('NLP_CACHE_SIZE', 1024)),
+    cache_ttl=float(os.environ['NLP_CACHE_TTL']) if os.environ.get('NLP_CACHE_TTL') else None,
+    profile_store=create_profile_store(
+        os.environ.get('NLP_PROFILE_STORE', 'sqlite'),
+        os.environ.get('NLP_PROFILE_PATH'),
+        synchronous=os.environ.get('NLP_SQLITE_SYNCHRONOUS', 'FULL')
+    ),
+    flush_mode=os.environ.get('NLP_FLUSH_MODE', 'sync'),
+    flush_interval_ms=int(os.environ.get('NLP_FLUSH_INTERVAL_MS', 1000)),
+    flush_batch_size=int(os.environ.get('NLP_FLUSH_BATCH_SIZE', 100)),
+    corpus_path=os.environ.get('NLP_CORPUS_PATH', 'training_corpus.db'),
+    engine=os.environ.get('NLP_ENGINE', 'svc'),
+    compiled=os.environ.get('NLP_COMPILED', '0') == '1',
+    shared_features=os.environ.get('NLP_SHARED_FEATURES', '0') == '1',
+    artifact_dir=os.environ.get('NLP_ARTIFACT_DIR'),
+    registry_dir=os.environ.get('NLP_REGISTRY_DIR'),
+    shared_profiles=os.environ.get('NLP_SHARED_PROFILES', '0') == '1',
+    fold_accents=os.environ.get('NLP_FOLD_ACCENTS', '0') == '1',
+    batch_window_ms=float(os.environ['NLP_BATCH_WINDOW_MS']) if os.environ.get('NLP_BATCH_WINDOW_MS') else None,
+    batch_max_size=int(os.environ.get('NLP_BATCH_MAX_SIZE', 32)),
+    exact_match=os.environ.get('NLP_EXACT_MATCH', '1') == '1'
+)
+
+# Reentrenamiento en segundo plano a partir de /feedback
+RETRAIN_DEBOUNCE_SECONDS = float(os.environ.get('NLP_RETRAIN_DEBOUNCE_SECONDS', 2.0))
+# Con varios workers, cada cuánto revisa el que entrena si los demás guardaron feedback
+CORPUS_POLL_SECONDS = float(os.environ.get('NLP_CORPUS_POLL_SECONDS', 5.0))
+retrain_worker = RetrainWorker(nlp_model, debounce_seconds=RETRAIN_DEBOUNCE_SECONDS)
+
+# Insights y parte del contexto para DeepSeek que dependen del perfil, por
+# (usuario, versión del perfil); un perfil modificado cambia de versión
+context_cache = PredictionCache(maxsize=int(os.environ.get('NLP_CONTEXT_CACHE_SIZE', 4096)))
+
+# Tamaño máximo de lote aceptado por /analyze_batch
+MAX_BATCH_SIZE = 10000
+
+# Métricas que ya mantienen otros componentes; se leen en cada /metrics
+metrics.REGISTRY.gauge(
+    'nlp_model_version', 'Versión del modelo activo (aumenta con cada reentrenamiento o recarga)',
+    lambda: nlp_model.model_version
+)
+metrics.REGISTRY.gauge(
+    'nlp_prediction_cache', 'Estado de la caché de predicciones', lambda: {
+        key: value for key, value in nlp_model.prediction_cache.stats().items()
+        if isinstance(value, (int, float)) and not isinstance(value, bool)
+    }, ['stat']
+)
+metrics.REGISTRY.gauge(
+    'nlp_normalization_cache', 'Estado de la caché de normalización de texto',
+    lambda: nlp_model.normalizer.cache_stats(), ['stat']
+)
+metrics.REGISTRY.gauge(
+    'nlp_context_cache', 'Estado de la caché de contextos personalizados', lambda: {
+        key: value for key, value in context_cache.stats().items()
+        if isinstance(value, (int, float)) and not isinstance(value, bool)
+    }, ['stat']
+)
+metrics.REGISTRY.gauge(
+    'nlp_exact_match', 'Índice de coincidencias exactas con el corpus (aciertos y tamaño)',
+    lambda: nlp_model.phrase_index.stats() if nlp_model.phrase_index is not None else {}, ['stat']
+)
+metrics.REGISTRY.gauge(
+    'nlp_place_index', 'Índice global de calificaciones de lugares',
+    lambda: nlp_model.place_index.stats(), ['stat']
+)
+metrics.REGISTRY.gauge(
+    'nlp_user_profiles', 'Perfiles de usuario en memoria', lambda: len(nlp_model.user_profiles)
+)
+metrics.REGISTRY.gauge(
+    'nlp_profile_flush_pending', 'Perfiles modificados pendientes de escritura',
+    lambda: nlp_model.profile_flusher.stats()['pending']
+)
+metrics.REGISTRY.gauge(
+    'nlp_profile_flush_lag_seconds', 'Antigüedad del perfil pendiente más antiguo',
+    lambda: nlp_model.profile_flusher.stats()['flush_lag_seconds']
+)
+metrics.REGISTRY.gauge(
+    'nlp_retrain_pending_feedback', 'Feedback en cola para el próximo reentrenamiento',
+    lambda: retrain_worker.status()['pending_feedback']
+)
+
+TIPS_SECONDS = metrics.STAGE_SECONDS.labels('tips')
+CONTEXT_SECONDS = metrics.STAGE_SECONDS.labels('context')
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request_metrics(response):
+    """Contar la petición y registrar su duración por endpoint"""
+    started = g.pop('request_started', None)
+    # La regla de la ruta (no la URL) mantiene acotado el número de series
+    endpoint = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+    metrics.REQUESTS.labels(endpoint, request.method, str(response.status_code)).inc()
+    if started is not None:
+        metrics.REQUEST_SECONDS.labels(endpoint).observe(time.perf_counter() - started)
+    return response
+
+# Token requerido por los endpoints /admin; sin token configurado quedan desactivados
+ADMIN_TOKEN = os.environ.get('NLP_ADMIN_TOKEN')
+
+def admin_denied():
+    """Respuesta de error si la petición no puede usar los endpoints /admin (None si puede)"""
+    if not ADMIN_TOKEN:
+        return jsonify({"error": "Endpoint de administración desactivado (definir NLP_ADMIN_TOKEN)"}), 404
+    token = request.headers.get('X-Admin-Token', '')
+    if not hmac.compare_digest(token.encode(), ADMIN_TOKEN.encode()):
+        return jsonify({"error": "No autorizado"}), 403
+    return None
+
+def reload_model_safely(version=None):
+    """Recargar el modelo desde el registro registrando (sin propagar) los errores"""
+    try:
+        if nlp_model.reload_model(version):
+            print(f"Modelo {nlp_model.artifact_version} activado")
+    except Exception as e:
+        print(f"Error recargando modelo: {e}")
+
+def start_registry_watcher():
+    """Sondear el registro de modelos (si hay uno) para recargar en caliente"""
+    poll_seconds = float(os.environ.get('NLP_REGISTRY_POLL_SECONDS', 5.0))
+    if nlp_model.registry is None or poll_seconds <= 0:
+        return None
+    return RegistryWatcher(nlp_model.registry, reload_model_safely, interval=poll_seconds)
+
+# Recarga en caliente: sondeo del registro y señal SIGHUP
+registry_watcher = start_registry_watcher()
+if nlp_model.registry is not None:
+    if hasattr(signal, 'SIGHUP') and threading.current_thread() is threading.main_thread():
+        # La carga se hace en otro hilo: el manejador de señales interrumpe al
+        # hilo principal, que podría tener tomado el candado de carga
+        signal.signal(
+            signal.SIGHUP,
+            lambda signum, frame: threading.Thread(target=reload_model_safely, daemon=True).start()
+        )
+
+def prepare_fork():
+    """Dejar el proceso maestro listo para crear workers con fork() (prefork.py)
+    
+    El maestro no atiende peticiones: se detienen el sondeo del registro y el
+    micro-batching y se cierran las conexiones SQLite, que no deben
+    heredarse abiertas.
+    """
+    global registry_watcher
+    if registry_watcher is not None:
+        registry_watcher.stop()
+        registry_watcher = None
+    # Su hilo no pasaría a los workers (cada uno crea el suyo en after_fork)
+    if nlp_model.batcher is not None:
+        nlp_model.batcher.close()
+    nlp_model.profile_store.close()
+    nlp_model.corpus.close()
+
+def after_fork(trainer: bool = True):
+    """Reabrir recursos propios del proceso en un worker recién creado
+    
+    Solo el worker `trainer` reentrena y publica (pickles, artefacto y
+    registro); los demás guardan el feedback en el corpus compartido y
+    reciben los modelos nuevos recargándolos desde el registro.
+    """
+    global retrain_worker, registry_watcher
+    nlp_model.after_fork()
+    # Los hilos del maestro no existen en el hijo
+    if trainer:
+        retrain_worker = RetrainWorker(
+            nlp_model, debounce_seconds=RETRAIN_DEBOUNCE_SECONDS, corpus_poll_seconds=CORPUS_POLL_SECONDS
+        )
+    else:
+        retrain_worker = RetrainWorker(nlp_model, train=False)
+    registry_watcher = start_registry_watcher()
 
 def generate_user_id(device_info=None):
     """Generar ID único para el usuario basado en información del dispositivo"""
@@ -30,9 +214,30 @@ def health_check():
     return jsonify({
         "status": "healthy",
         "timestamp": datetime.now().isoformat(),
-        "model_loaded": nlp_model.mood_classifier is not None
+        "worker_pid": os.getpid(),
+        "model_loaded": nlp_model.model_loaded,
+        "artifact_version": nlp_model.artifact_version,
+        "model_version": nlp_model.model_version,
+        "engine": nlp_model.engine,
+        "compiled": nlp_model.compiled,
+        "shared_features": nlp_model.shared_features,
+        "model_loaded_at": nlp_model.model_loaded_at,
+        "registry_version": nlp_model.registry.current_version() if nlp_model.registry else None,
+        "retrain": retrain_worker.status(),
+        "prediction_cache": nlp_model.prediction_cache.stats(),
+        "normalization_cache": nlp_model.normalizer.cache_stats(),
+        "micro_batching": nlp_model.batcher.stats() if nlp_model.batcher else None,
+        "exact_match": nlp_model.phrase_index.stats() if nlp_model.phrase_index is not None else None,
+        "context_cache": context_cache.stats(),
+        "place_index": nlp_model.place_index.stats(),
+        "profile_flush": nlp_model.profile_flusher.stats()
     })
 
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Métricas en formato de texto de Prometheus"""
+    return Response(metrics.REGISTRY.render(), content_type=metrics.CONTENT_TYPE)
+
 @app.route('/analyze_message', methods=['POST'])
 def analyze_message():
     """Analizar mensaje del usuario y devolver estado de ánimo e intención"""
@@ -58,6 +263,41 @@ def analyze_message():
     except Exception as e:
         return jsonify({"error": f"Error analizando mensaje: {str(e)}"}), 500
 
+@app.route('/analyze_batch', methods=['POST'])
+def analyze_batch():
+    """Analizar una lista de mensajes en una sola pasada por el modelo"""
+    try:
+        data = request.get_json()
+        
+        if not data or not isinstance(data.get('messages'), list):
+            return jsonify({"error": "Lista de mensajes requerida"}), 400
+        
+        messages = data['messages']
+        if len(messages) > MAX_BATCH_SIZE:
+            return jsonify({"error": f"Máximo {MAX_BATCH_SIZE} mensajes por lote"}), 400
+        if not all(isinstance(message, str) for message in messages):
+            return jsonify({"error": "Todos los mensajes deben ser texto"}), 400
+        
+        # Predecir estado de ánimo e intención de todo el lote
+        predictions = nlp_model.predict_batch(messages)
+        
+        return jsonify({
+            "results": [
+                {
+                    "mood": mood,
+                    "mood_confidence": float(mood_conf),
+                    "intent": intent,
+                    "intent_confidence": float(intent_conf)
+                }
+                for mood, mood_conf, intent, intent_conf in predictions
+            ],
+            "count": len(predictions),
+            "timestamp": datetime.now().isoformat()
+        })
+        
+    except Exception as e:
+        return jsonify({"error": f"Error analizando lote: {str(e)}"}), 500
+
 @app.route('/update_profile', methods=['POST'])
 def update_profile():
     """Actualizar perfil del usuario con mensaje y feedback"""
@@ -78,23 +318,30 @@ def update_profile():
         user_id = data.get('user_id', 'default_user')
         
         # Si hay perfil actual, usarlo para inicializar
-        if current_profile and user_id not in nlp_model.user_profiles:
-            nlp_model.user_profiles[user_id] = current_profile
+        if current_profile:
+            with nlp_model.profile_transaction(user_id):
+                if user_id not in nlp_model.user_profiles:
+                    nlp_model.replace_profile(user_id, UserProfile.from_dict(current_profile))
+                    # Sus calificaciones ya cuentan en el índice de lugares
+                    nlp_model.save_user_data(user_id)
+        
+        # Analizar mensaje actual una sola vez y reutilizarlo en el perfil
+        analysis = nlp_model.predict_mood_and_intent(message) if message else None
         
         # Actualizar perfil
-        updated_profile = nlp_model.update_user_profile(user_id, message, feedback, rating)
+        updated_profile = nlp_model.update_user_profile(user_id, message, feedback, rating, analysis=analysis)
         
         # Obtener insights del usuario
         insights = nlp_model.get_user_insights(user_id)
         
-        # Analizar mensaje actual
-        mood, mood_conf, intent, intent_conf = nlp_model.predict_mood_and_intent(message) if message else ("neutral", 0.5, "general", 0.5)
+        mood, mood_conf, intent, intent_conf = analysis if analysis else ("neutral", 0.5, "general", 0.5)
         
-        # Generar recomendaciones personalizadas basadas en el perfil
-        personalization_tips = generate_personalization_tips(updated_profile, insights)
+        # Generar recomendaciones personalizadas basadas en los insights del perfil
+        with TIPS_SECONDS.time():
+            personalization_tips = personalization_rules.personalization_tips(insights)
         
         return jsonify({
-            "user_profile": updated_profile,
+            "user_profile": updated_profile.to_dict(),
             "insights": insights,
             "current_analysis": {
                 "mood": mood,
@@ -115,13 +362,14 @@ def get_user_profile():
     try:
         data = request.get_json()
         user_id = data.get('user_id', 'default_user')
+        nlp_model.refresh_profile(user_id)
         
         if user_id in nlp_model.user_profiles:
             profile = nlp_model.user_profiles[user_id]
             insights = nlp_model.get_user_insights(user_id)
             
             return jsonify({
-                "user_profile": profile,
+                "user_profile": profile.to_dict(),
                 "insights": insights,
                 "found": True
             })
@@ -143,19 +391,29 @@ def get_personalized_context():
         user_id = data.get('user_id', 'default_user')
         current_message = data.get('message', '')
         
-        # Obtener perfil e insights
-        if user_id in nlp_model.user_profiles:
-            profile = nlp_model.user_profiles[user_id]
-            insights = nlp_model.get_user_insights(user_id)
-        else:
-            profile = {}
-            insights = {"is_new_user": True}
+        # Obtener insights y la parte del contexto que depende del perfil,
+        # de la caché si el perfil no cambió desde la última vez (con perfiles
+        # compartidos, refresh_profile conserva la versión si nadie lo escribió)
+        nlp_model.refresh_profile(user_id)
+        profile = nlp_model.user_profiles.get(user_id)
+        # Todos los usuarios sin perfil comparten la misma entrada
+        context_key = (user_id, profile.version) if profile is not None else None
+        cached = context_cache.get(context_key)
+        if cached is None:
+            if profile is not None:
+                insights = nlp_model.get_user_insights(user_id)
+            else:
+                insights = {"is_new_user": True}
+            cached = (insights, personalization_rules.profile_context(profile or UserProfile(), insights))
+            context_cache.put(context_key, cached)
+        insights, profile_part = cached
         
         # Analizar mensaje actual
         mood, mood_conf, intent, intent_conf = nlp_model.predict_mood_and_intent(current_message)
         
-        # Generar contexto personalizado
-        context = generate_deepseek_context(profile, insights, mood, intent, mood_conf, intent_conf)
+        # Completar el contexto con el análisis del mensaje (búsqueda en tablas)
+        with CONTEXT_SECONDS.time():
+            context = personalization_rules.render_context(profile_part, mood, intent, mood_conf, intent_conf)
         
         return jsonify({
             "personalized_context": context,
@@ -182,129 +440,56 @@ def process_feedback():
         correct_intent = data.get('correct_intent', '')
         
         if user_message and correct_mood and correct_intent:
-            # Reentrenar modelo con feedback
-            nlp_model.retrain_with_feedback(user_message, correct_mood, correct_intent)
+            # Encolar feedback; el modelo se reentrena en segundo plano
+            retrain_status = retrain_worker.submit(user_message, correct_mood, correct_intent)
             
             return jsonify({
-                "message": "Feedback procesado y modelo actualizado",
-                "status": "success"
-            })
+                "message": "Feedback recibido, el modelo se actualizará en segundo plano",
+                "status": "queued",
+                "retrain": retrain_status
+            }), 202
         else:
             return jsonify({"error": "Datos de feedback incompletos"}), 400
             
     except Exception as e:
         return jsonify({"error": f"Error procesando feedback: {str(e)}"}), 500
 
-def generate_personalization_tips(profile, insights):
-    """Generar tips de personalización basados en el perfil del usuario"""
-    tips = []
-    
-    # Tips basados en preferencias
-    if 'comer' in insights.get('top_preferences', []):
-        tips.append("Este usuario disfruta de experiencias gastronómicas - recomienda restaurantes y comida típica")
-    
-    if 'entretenimiento' in insights.get('top_preferences', []):
-        tips.append("Le gusta la diversión y entretenimiento - sugiere vida nocturna y actividades sociales")
-    
-    if 'cultura' in insights.get('top_preferences', []):
-        tips.append("Interesado en cultura e historia - recomienda museos, monumentos y sitios históricos")
-    
-    if 'naturaleza' in insights.get('top_preferences', []):
-        tips.append("Disfruta la naturaleza - sugiere parques, playa y actividades al aire libre")
-    
-    # Tips basados en patrones de estado de ánimo
-    dominant_mood = insights.get('dominant_mood', '')
-    if dominant_mood == 'estresado':
-        tips.append("Usuario frecuentemente estresado - prioriza lugares tranquilos y relajantes")
-    elif dominant_mood == 'energetico':
-        tips.append("Usuario generalmente energético - sugiere actividades dinámicas y emocionantes")
-    elif dominant_mood == 'relajado':
-        tips.append("Prefiere ambientes tranquilos - recomienda lugares apacibles")
-    
-    # Tips basados en experiencia
-    if insights.get('is_new_user'):
-        tips.append("Usuario nuevo - da información básica sobre Barranquilla y lugares icónicos")
-    elif insights.get('conversation_count', 0) > 10:
-        tips.append("Usuario experimentado - puede sugerir lugares menos conocidos y experiencias únicas")
-    
-    # Tips basados en ratings
-    avg_rating = insights.get('avg_rating', 0)
-    if avg_rating >= 4.5:
-        tips.append("Usuario muy satisfecho con recomendaciones previas - mantén el nivel de calidad")
-    elif avg_rating < 3:
-        tips.append("Usuario no muy satisfecho - ajusta el tipo de recomendaciones")
-    
-    return tips
+@app.route('/retrain_status', methods=['GET'])
+def get_retrain_status():
+    """Estado del reentrenamiento en segundo plano, versión del modelo y corpus"""
+    status = retrain_worker.status()
+    status['corpus'] = nlp_model.corpus.stats()
+    return jsonify(status)
 
-def generate_deepseek_context(profile, insights, current_mood, current_intent, mood_conf, intent_conf):
-    """Generar contexto personalizado para DeepSeek R1"""
-    
-    # Información básica del usuario
-    context = []
-    
-    if insights.get('is_new_user'):
-        context.append("USUARIO NUEVO: Proporciona información básica sobre Barranquilla")
-    else:
-        context.append(f"Usuario con {insights.get('conversation_count', 0)} conversaciones previas")
-    
-    # Estado de ánimo actual
-    context.append(f"ESTADO ACTUAL: {current_mood} (confianza: {mood_conf:.1f})")
-    context.append(f"INTENCIÓN: {current_intent} (confianza: {intent_conf:.1f})")
-    
-    # Preferencias principales
-    top_prefs = insights.get('top_preferences', [])
-    if top_prefs:
-        context.append(f"PREFERENCIAS PRINCIPALES: {', '.join(top_prefs)}")
-    
-    # Historial de estados de ánimo
-    if profile.get('mood_history'):
-        recent_moods = [entry['mood'] for entry in profile['mood_history'][-3:]]
-        context.append(f"ESTADOS RECIENTES: {' → '.join(recent_moods)}")
-    
-    # Rating promedio
-    avg_rating = insights.get('avg_rating', 0)
-    if avg_rating > 0:
-        context.append(f"SATISFACCIÓN PROMEDIO: {avg_rating:.1f}/5.0")
-    
-    # Lugares mejor calificados
-    location_ratings = profile.get('location_ratings', {})
-    high_rated = [place for place, rating in location_ratings.items() if rating >= 4]
-    if high_rated:
-        context.append(f"LUGARES QUE LE GUSTARON: {', '.join(high_rated[:3])}")
-    
-    # Recomendaciones específicas basadas en el análisis
-    recommendations = []
-    
-    if current_intent == 'comer' and current_mood == 'estresado':
-        recommendations.append("Recomienda lugares tranquilos para comer, evita lugares muy concurridos")
-    elif current_intent == 'comer' and current_mood == 'feliz':
-        recommendations.append("Sugiere experiencias gastronómicas divertidas y sociales")
-    elif current_intent == 'entretenimiento' and current_mood == 'energetico':
-        recommendations.append("Recomienda vida nocturna activa y lugares con música en vivo")
-    elif current_intent == 'cultura' and current_mood == 'relajado':
-        recommendations.append("Sugiere museos tranquilos y sitios históricos contemplativos")
-    elif current_intent == 'naturaleza':
-        if current_mood == 'estresado':
-            recommendations.append("Prioriza parques tranquilos y lugares junto al mar para relajarse")
-        else:
-            recommendations.append("Sugiere actividades al aire libre y experiencias en la naturaleza")
-    
-    if recommendations:
-        context.extend(recommendations)
-    
-    # Instrucciones especiales
-    special_instructions = []
-    
-    if avg_rating < 3:
-        special_instructions.append("ATENCIÓN: Usuario no muy satisfecho - ajusta recomendaciones")
-    
-    if insights.get('conversation_count', 0) > 5:
-        special_instructions.append("Usuario experimentado - evita repetir lugares ya recomendados")
-    
-    if special_instructions:
-        context.extend(special_instructions)
-    
-    return "\n".join(context)
+@app.route('/admin/reload_model', methods=['POST'])
+def admin_reload_model():
+    """Cargar en caliente la versión activa del registro o activar una versión concreta"""
+    try:
+        denied = admin_denied()
+        if denied is not None:
+            return denied
+        if nlp_model.registry is None:
+            return jsonify({"error": "No hay un registro de modelos configurado"}), 400
+        
+        data = request.get_json(silent=True) or {}
+        version = data.get('version')
+        if version is not None:
+            if version not in nlp_model.registry.versions():
+                return jsonify({"error": f"Versión de modelo desconocida: {version}"}), 404
+            # Mover CURRENT para que el resto de procesos también cambien de versión
+            nlp_model.registry.activate(version)
+        
+        reloaded = nlp_model.reload_model(version)
+        
+        return jsonify({
+            "reloaded": reloaded,
+            "artifact_version": nlp_model.artifact_version,
+            "model_loaded_at": nlp_model.model_loaded_at,
+            "available_versions": nlp_model.registry.versions()
+        })
+        
+    except Exception as e:
+        return jsonify({"error": f"Error recargando modelo: {str(e)}"}), 500
 
 @app.route('/save_interaction', methods=['POST'])
 def save_interaction():
@@ -319,29 +504,24 @@ def save_interaction():
         rating = data.get('rating', None)
         
         # Analizar mensaje del usuario
-        mood, mood_conf, intent, intent_conf = nlp_model.predict_mood_and_intent(user_message)
+        analysis = nlp_model.predict_mood_and_intent(user_message)
+        mood, mood_conf, intent, intent_conf = analysis
         
-        # Actualizar perfil con la interacción completa
+        # Actualizar perfil con la interacción completa; si hay rating, se
+        # asocia al lugar (y a la intención del mensaje en el índice global
+        # de lugares) en la misma transacción
         updated_profile = nlp_model.update_user_profile(
             user_id=user_id,
             message=user_message,
             feedback=f"Lugar recomendado: {recommended_place}",
-            rating=rating
+            rating=rating,
+            analysis=analysis,
+            rated_place=recommended_place
         )
         
-        # Si hay rating, asociarlo al lugar específico
-        if rating and recommended_place:
-            if user_id not in nlp_model.user_profiles:
-                nlp_model.user_profiles[user_id] = {}
-            
-            if 'location_ratings' not in nlp_model.user_profiles[user_id]:
-                nlp_model.user_profiles[user_id]['location_ratings'] = {}
-            
-            nlp_model.user_profiles[user_id]['location_ratings'][recommended_place] = rating
-        
         return jsonify({
             "message": "Interacción guardada exitosamente",
-            "user_profile": updated_profile,
+            "user_profile": updated_profile.to_dict(),
             "analysis": {
                 "mood": mood,
                 "intent": intent,
@@ -361,23 +541,20 @@ def get_recommendations_history():
     try:
         data = request.get_json()
         user_id = data.get('user_id', 'default_user')
+        nlp_model.refresh_profile(user_id)
         
         if user_id in nlp_model.user_profiles:
             profile = nlp_model.user_profiles[user_id]
             
             # Extraer historial de lugares con ratings
-            location_ratings = profile.get('location_ratings', {})
+            location_ratings = profile.location_ratings
             
             # Extraer historial de conversaciones
-            conversation_history = profile.get('conversation_history', [])
+            conversation_history = profile.extra_field('conversation_history', [])
             
             # Obtener lugares mejor y peor calificados
-            if location_ratings:
-                best_places = sorted(location_ratings.items(), key=lambda x: x[1], reverse=True)[:5]
-                worst_places = sorted(location_ratings.items(), key=lambda x: x[1])[:3]
-            else:
-                best_places = []
-                worst_places = []
+            best_places = top_rated(location_ratings, 5)
+            worst_places = top_rated(location_ratings, 3, lowest=True)
             
             return jsonify({
                 "location_ratings": location_ratings,
@@ -398,17 +575,54 @@ def get_recommendations_history():
     except Exception as e:
         return jsonify({"error": f"Error obteniendo historial: {str(e)}"}), 500
 
+@app.route('/top_places', methods=['POST'])
+def get_top_places():
+    """Lugares mejor calificados por todos los usuarios (en total o para una intención)"""
+    try:
+        data = request.get_json(silent=True) or {}
+        if not isinstance(data, dict):
+            return jsonify({"error": "Datos inválidos"}), 400
+        
+        intent = data.get('intent')
+        place = data.get('place')
+        if not all(value is None or isinstance(value, str) for value in (intent, place)):
+            return jsonify({"error": "intent y place deben ser texto"}), 400
+        try:
+            limit = int(data.get('limit', 10))
+            min_ratings = int(data.get('min_ratings', 1))
+        except (TypeError, ValueError):
+            return jsonify({"error": "limit y min_ratings deben ser números enteros"}), 400
+        if limit < 1 or min_ratings < 1:
+            return jsonify({"error": "limit y min_ratings deben ser mayores que cero"}), 400
+        
+        response = {
+            "intent": intent,
+            "top_places": nlp_model.place_index.top_places(limit, intent, min_ratings)
+        }
+        # Detalle (con desglose por intención) de un lugar concreto
+        if place:
+            response["place"] = nlp_model.place_index.place_stats(place)
+        return jsonify(response)
+        
+    except Exception as e:
+        return jsonify({"error": f"Error obteniendo lugares: {str(e)}"}), 500
+
 if __name__ == '__main__':
     print("🚀 Iniciando servidor de BarranquillaChatBot...")
     print("📡 Endpoints disponibles:")
     print("  - GET  /health - Estado del servidor")
     print("  - POST /analyze_message - Analizar mensaje del usuario")
+    print("  - POST /analyze_batch - Analizar lista de mensajes")
     print("  - POST /update_profile - Actualizar perfil del usuario")
     print("  - POST /get_user_profile - Obtener perfil del usuario")
     print("  - POST /personalized_context - Contexto personalizado para DeepSeek")
     print("  - POST /feedback - Procesar feedback del modelo")
+    print("  - GET  /retrain_status - Estado del reentrenamiento")
+    print("  - GET  /metrics - Métricas en formato Prometheus")
+    print("  - POST /admin/reload_model - Recargar el modelo desde el registro")
     print("  - POST /save_interaction - Guardar interacción completa")
     print("  - POST /get_recommendations_history - Historial de recomendaciones")
+    print("  - POST /top_places - Lugares mejor calificados por todos los usuarios")
     print()
     print("🧠 Modelo NLP cargado y listo para usar")
     print("🌐 CORS habilitado para React Native")
@@ -0,0 +1,43 @@
+"""Configuración común de las pruebas del servidor NLP
+
+Los módulos del servidor viven en src/screens y se importan por nombre.
+El modelo escribe sus archivos (pickles, corpus, perfiles) en el
+directorio de trabajo, así que toda la sesión corre en uno temporal.
+"""
+import os
+import sys
+
+import pytest
+
+SCREENS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if SCREENS_DIR not in sys.path:
+    sys.path.insert(0, SCREENS_DIR)
+
+
+@pytest.fixture(scope='session', autouse=True)
+def session_workdir(tmp_path_factory):
+    """Directorio de trabajo temporal para toda la sesión"""
+    previous = os.getcwd()
+    workdir = tmp_path_factory.mktemp('nlp_workdir')
+    os.chdir(workdir)
+    yield workdir
+    os.chdir(previous)
+
+
+@pytest.fixture(scope='session')
+def server_module(session_workdir):
+    """server.py importado (con su modelo entrenado) en el directorio temporal"""
+    import server
+    yield server
+    server.nlp_model.close()
+
+
+@pytest.fixture(scope='session')
+def client(server_module):
+    return server_module.app.test_client()
+
+
+@pytest.fixture(scope='session')
+def analysis(server_module):
+    """Análisis real (ánimo, confianza, intención, confianza) de un mensaje de comida"""
+    return server_module.nlp_model.predict_mood_and_intent('quiero comer arepas')
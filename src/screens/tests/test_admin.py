@@ -0,0 +1,31 @@
+"""Acceso a los endpoints /admin según NLP_ADMIN_TOKEN"""
+import pytest
+
+
+def test_admin_is_disabled_without_token(client, server_module, monkeypatch):
+    monkeypatch.setattr(server_module, 'ADMIN_TOKEN', None)
+
+    response = client.post('/admin/reload_model', json={})
+
+    assert response.status_code == 404
+    assert 'NLP_ADMIN_TOKEN' in response.get_json()['error']
+
+
+@pytest.mark.parametrize('headers', [{}, {'X-Admin-Token': 'otro'}, {'X-Admin-Token': ''}])
+def test_admin_rejects_missing_or_wrong_token(client, server_module, monkeypatch, headers):
+    monkeypatch.setattr(server_module, 'ADMIN_TOKEN', 'secreto')
+
+    response = client.post('/admin/reload_model', json={}, headers=headers)
+
+    assert response.status_code == 403
+
+
+def test_admin_accepts_the_configured_token(client, server_module, monkeypatch):
+    monkeypatch.setattr(server_module, 'ADMIN_TOKEN', 'secreto')
+    monkeypatch.setattr(server_module.nlp_model, 'registry', None)
+
+    response = client.post('/admin/reload_model', json={}, headers={'X-Admin-Token': 'secreto'})
+
+    # Autorizado: llega a la comprobación del registro
+    assert response.status_code == 400
+    assert 'registro' in response.get_json()['error']
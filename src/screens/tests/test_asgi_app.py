@@ -0,0 +1,123 @@
+"""Modo ASGI: mismas respuestas que Flask, pools por tipo de ruta y límite del cuerpo"""
+import asyncio
+import json
+import threading
+
+import pytest
+
+from asgi_app import READ_ROUTES, AsyncNLPApp
+
+
+def asgi_request(app, method, path, body=b'', headers=None, chunks=None):
+    """Estado, cabeceras y cuerpo de una petición a la aplicación ASGI
+
+    Con `chunks` el cuerpo llega en varios mensajes (sin Content-Length).
+    """
+    if headers is None:
+        headers = [(b'content-type', b'application/json'), (b'content-length', str(len(body)).encode())]
+    parts = chunks if chunks is not None else [body]
+    messages = [
+        {'type': 'http.request', 'body': part, 'more_body': i < len(parts) - 1}
+        for i, part in enumerate(parts)
+    ]
+    scope = {
+        'type': 'http', 'http_version': '1.1', 'method': method, 'scheme': 'http',
+        'path': path, 'root_path': '', 'query_string': b'', 'headers': headers,
+        'server': ('127.0.0.1', 80), 'client': ('127.0.0.1', 0)
+    }
+    response = {'body': b''}
+
+    async def receive():
+        if messages:
+            return messages.pop(0)
+        return {'type': 'http.disconnect'}
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            response['status'] = message['status']
+            response['headers'] = dict(message['headers'])
+        else:
+            response['body'] += message.get('body', b'')
+
+    asyncio.run(app(scope, receive, send))
+    return response['status'], response['headers'], response['body']
+
+
+@pytest.fixture
+def asgi(server_module):
+    app = AsyncNLPApp(server_module.app, workers=2, read_workers=1, max_body_bytes=4096)
+    yield app
+    app.close()
+
+
+def comparable(body: bytes):
+    try:
+        data = json.loads(body)
+    except ValueError:
+        return body
+    if isinstance(data, dict):
+        data.pop('timestamp', None)
+    return data
+
+
+@pytest.mark.parametrize('method, path, payload', [
+    ('POST', '/analyze_message', {'message': 'quiero comer arepas'}),
+    ('POST', '/analyze_message', {}),
+    ('POST', '/analyze_batch', {'messages': ['hola', 'busco playa']}),
+    ('POST', '/analyze_batch', {'messages': 'hola'}),
+    ('POST', '/get_user_profile', {'user_id': 'asgi_sin_perfil'}),
+    ('POST', '/personalized_context', {'user_id': 'asgi_sin_perfil', 'message': 'quiero rumba'}),
+    ('POST', '/top_places', {'limit': 5}),
+    ('POST', '/top_places', {'limit': 'cinco'}),
+    ('POST', '/analyze_message', b'{no es json'),
+    ('GET', '/no_existe', None),
+])
+def test_responses_match_the_flask_app(client, asgi, method, path, payload):
+    body = payload if isinstance(payload, bytes) else json.dumps(payload).encode() if payload is not None else b''
+    expected = client.open(path, method=method, data=body, content_type='application/json')
+
+    status, headers, content = asgi_request(asgi, method, path, body)
+
+    assert status == expected.status_code
+    assert headers[b'content-type'].decode() == expected.headers['Content-Type']
+    assert comparable(content) == comparable(expected.get_data())
+
+
+def test_routes_are_served_by_their_pool():
+    def thread_name(environ, start_response):
+        start_response('200 OK', [('Content-Type', 'text/plain')])
+        return [threading.current_thread().name.encode()]
+
+    app = AsyncNLPApp(thread_name, workers=1, read_workers=1)
+    try:
+        assert '/top_places' in READ_ROUTES
+        for path in ('/health', '/get_user_profile', '/top_places'):
+            assert asgi_request(app, 'POST', path)[2].startswith(b'nlp-read'), path
+        for path in ('/analyze_message', '/update_profile', '/feedback'):
+            assert asgi_request(app, 'POST', path)[2].startswith(b'nlp-inference'), path
+    finally:
+        app.close()
+
+
+def test_declared_oversized_body_is_rejected(asgi):
+    headers = [(b'content-type', b'application/json'), (b'content-length', b'5000')]
+
+    status, _, content = asgi_request(asgi, 'POST', '/analyze_message', headers=headers, chunks=[b'{}'])
+
+    assert status == 413
+    assert 'error' in json.loads(content)
+
+
+def test_streamed_oversized_body_is_rejected(asgi):
+    chunks = [b'{"message": "'] + [b'a' * 1024] * 5 + [b'"}']
+
+    status, _, _ = asgi_request(asgi, 'POST', '/analyze_message',
+                                headers=[(b'content-type', b'application/json')], chunks=chunks)
+
+    assert status == 413
+
+
+def test_body_within_the_limit_is_served(asgi):
+    body = json.dumps({'message': 'a' * 3000}).encode()
+
+    assert asgi_request(asgi, 'POST', '/analyze_message', body)[0] == 200
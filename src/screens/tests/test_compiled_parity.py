@@ -0,0 +1,52 @@
+"""Las rutas compiladas predicen lo mismo que los pipelines de scikit-learn"""
+import numpy as np
+import pytest
+
+from compiled_model import CompiledPipeline
+from model import BarranquillaNLPModel
+from predictors import build_predictor
+
+ATOL = 1e-6
+
+
+@pytest.fixture(scope='module', params=[False, True], ids=['separate', 'shared_features'])
+def trained(request, tmp_path_factory):
+    """Modelo SVC entrenado sobre los datasets semilla y sus textos de entrenamiento"""
+    workdir = tmp_path_factory.mktemp('parity')
+    with pytest.MonkeyPatch.context() as patch:
+        patch.chdir(workdir)
+        model = BarranquillaNLPModel(
+            corpus_path=str(workdir / 'corpus.db'), shared_features=request.param, exact_match=False
+        )
+        texts = {
+            task: model.normalizer.normalize_batch(model.corpus.load_task(task)[0])
+            for task in ('mood', 'intent')
+        }
+        yield model, texts
+        model.close()
+
+
+@pytest.mark.parametrize('task', ['mood', 'intent'])
+def test_compiled_pipeline_matches_sklearn(trained, task):
+    model, texts = trained
+    pipeline = getattr(model, f'{task}_classifier')
+    compiled = CompiledPipeline.from_pipeline(pipeline)
+
+    np.testing.assert_array_equal(compiled.predict(texts[task]), pipeline.predict(texts[task]))
+    np.testing.assert_allclose(
+        compiled.predict_proba(texts[task]), pipeline.predict_proba(texts[task]), rtol=0, atol=ATOL
+    )
+
+
+@pytest.mark.parametrize('task', ['mood', 'intent'])
+def test_compiled_predictor_matches_sklearn(trained, task):
+    model, texts = trained
+    reference = build_predictor(model.mood_classifier, model.intent_classifier)
+    compiled = build_predictor(model.mood_classifier, model.intent_classifier, compiled=True)
+
+    expected = reference.predict(texts[task])
+    actual = compiled.predict(texts[task])
+    for labels in (0, 2):
+        np.testing.assert_array_equal(actual[labels], expected[labels])
+    for probs in (1, 3):
+        np.testing.assert_allclose(actual[probs], expected[probs], rtol=0, atol=ATOL)
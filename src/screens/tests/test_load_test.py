@@ -0,0 +1,47 @@
+"""Suite de carga: cobertura de endpoints, percentiles y comparación con la línea base"""
+import load_test
+
+BASELINE = {
+    "analyze_message": {"p95_ms": 2.0, "p99_ms": 3.0, "throughput_rps": 500.0, "errors": 0}
+}
+
+
+def result(p95_ms=2.0, p99_ms=3.0, throughput_rps=500.0, errors=0):
+    return {"analyze_message": {
+        "p95_ms": p95_ms, "p99_ms": p99_ms, "throughput_rps": throughput_rps, "errors": errors
+    }}
+
+
+def test_suite_covers_every_endpoint_without_errors(server_module):
+    # /feedback dispara reentrenamientos en segundo plano; se prueba aparte
+    endpoints = [name for name, _, _, _ in load_test.ENDPOINTS if name != "feedback"]
+    transport = load_test.FlaskClientTransport(server_module.app)
+
+    results = load_test.run_suite(transport, requests=5, endpoints=endpoints)
+
+    assert list(results) == endpoints
+    for name, summary in results.items():
+        assert summary["requests"] == 5, name
+        assert summary["errors"] == 0, name
+
+
+def test_percentile_uses_nearest_rank():
+    values = [float(v) for v in range(1, 101)]
+    assert load_test.percentile(values, 50) == 50.0
+    assert load_test.percentile(values, 99) == 99.0
+    assert load_test.percentile([7.0], 95) == 7.0
+
+
+def test_compare_flags_regressions_beyond_tolerance():
+    assert load_test.compare(result(), BASELINE) == []
+    assert load_test.compare(result(p95_ms=2.3), BASELINE, tolerance=0.2) == []
+    assert load_test.compare(result(p95_ms=3.0), BASELINE) == ["analyze_message: p95_ms 2.00 -> 3.00 ms"]
+    assert load_test.compare(result(throughput_rps=300.0), BASELINE) == [
+        "analyze_message: throughput 500 -> 300 peticiones/s"
+    ]
+    assert load_test.compare(result(errors=2), BASELINE) == ["analyze_message: errores 0 -> 2"]
+
+
+def test_compare_ignores_sub_millisecond_noise():
+    baseline = {"analyze_message": dict(BASELINE["analyze_message"], p95_ms=0.2)}
+    assert load_test.compare(result(p95_ms=0.6), baseline) == []
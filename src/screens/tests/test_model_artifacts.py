@@ -0,0 +1,135 @@
+"""Artefactos del modelo y registro de versiones: publicación atómica y CLI"""
+import os
+import shutil
+import threading
+
+import pytest
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.pipeline import Pipeline
+from sklearn.svm import SVC
+
+import model_artifacts
+from model_registry import ModelRegistry
+
+TEXTS = [
+    'estoy feliz', 'qué alegría', 'muy contento hoy', 'me siento genial',
+    'estoy triste', 'qué pena', 'me siento mal', 'día horrible',
+    'tengo hambre', 'quiero comer', 'busco restaurante', 'algo de comida'
+]
+LABELS = ['feliz'] * 4 + ['triste'] * 4 + ['hambre'] * 4
+
+
+@pytest.fixture(scope='module')
+def pipelines():
+    def train():
+        pipeline = Pipeline([('tfidf', TfidfVectorizer()), ('clf', SVC(kernel='linear', probability=True))])
+        return pipeline.fit(TEXTS, LABELS)
+    return train(), train()
+
+
+def hidden_versions(directory):
+    parent, name = os.path.split(directory)
+    return [entry for entry in os.listdir(parent) if entry.startswith(f'.{name}.v')]
+
+
+def test_republish_never_leaves_directory_without_artifact(tmp_path, pipelines):
+    directory = str(tmp_path / 'artifact')
+    model_artifacts.save_artifact(directory, *pipelines, model_version='v0')
+    errors = []
+    stop = threading.Event()
+
+    def read():
+        while not stop.is_set():
+            try:
+                predictor, _ = model_artifacts.load_artifact(directory)
+                predictor.predict(['estoy feliz'])
+            except Exception as e:
+                errors.append(e)
+
+    reader = threading.Thread(target=read)
+    reader.start()
+    try:
+        for version in range(1, 20):
+            model_artifacts.save_artifact(directory, *pipelines, model_version=f'v{version}')
+    finally:
+        stop.set()
+        reader.join()
+
+    assert errors == []
+    assert model_artifacts.read_manifest(directory)['model_version'] == 'v19'
+    # La versión publicada y la anterior
+    assert len(hidden_versions(directory)) == 2
+
+
+def test_replaces_artifact_in_previous_layout(tmp_path, pipelines):
+    directory = str(tmp_path / 'artifact')
+    model_artifacts.save_artifact(directory, *pipelines, model_version='old')
+    real = str(tmp_path / 'real')
+    shutil.copytree(directory, real)
+    model_artifacts.remove_artifact(directory)
+    os.replace(real, directory)
+
+    model_artifacts.save_artifact(directory, *pipelines, model_version='new')
+
+    assert os.path.islink(directory)
+    assert model_artifacts.read_manifest(directory)['model_version'] == 'new'
+
+
+def test_registry_prune_removes_version_directories(tmp_path, pipelines):
+    registry = ModelRegistry(str(tmp_path / 'registry'), keep=2)
+    published = [registry.publish(*pipelines) for _ in range(4)]
+
+    assert registry.versions() == published[-2:]
+    assert sorted(os.listdir(registry.versions_dir)) == sorted(
+        published[-2:] + [os.path.basename(os.path.realpath(registry.version_path(v))) for v in published[-2:]]
+    )
+
+
+def test_registry_rejects_keep_below_one(tmp_path):
+    with pytest.raises(ValueError):
+        ModelRegistry(str(tmp_path / 'registry'), keep=0)
+
+
+@pytest.mark.parametrize('extra', [[], ['--retrain']])
+def test_build_trains_once_and_writes_only_the_artifact(tmp_path, monkeypatch, extra):
+    from model import BarranquillaNLPModel
+
+    monkeypatch.chdir(tmp_path)
+    trained = []
+    original = BarranquillaNLPModel.train_models
+
+    def counted(self, *args, **kwargs):
+        trained.append(kwargs.get('save', True))
+        return original(self, *args, **kwargs)
+
+    monkeypatch.setattr(BarranquillaNLPModel, 'train_models', counted)
+    monkeypatch.setattr('sys.argv', ['model_artifacts', 'build', 'artifact'] + extra)
+
+    model_artifacts.main()
+
+    assert trained == [False]
+    directory = str(tmp_path / 'artifact')
+    assert sorted(os.listdir(tmp_path)) == sorted(['artifact'] + hidden_versions(directory))
+    assert model_artifacts.artifact_exists('artifact')
+
+
+def test_registry_publish_trains_once_and_writes_only_the_registry(tmp_path, monkeypatch):
+    import model_registry
+    from model import BarranquillaNLPModel
+
+    monkeypatch.chdir(tmp_path)
+    trained = []
+    original = BarranquillaNLPModel.train_models
+
+    def counted(self, *args, **kwargs):
+        trained.append(kwargs.get('save', True))
+        return original(self, *args, **kwargs)
+
+    monkeypatch.setattr(BarranquillaNLPModel, 'train_models', counted)
+    monkeypatch.setattr('sys.argv', ['model_registry', 'publish', 'registry', '--retrain'])
+
+    model_registry.main()
+
+    assert trained == [False]
+    assert os.listdir(tmp_path) == ['registry']
+    assert len(ModelRegistry(str(tmp_path / 'registry')).versions()) == 1
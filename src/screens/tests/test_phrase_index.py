@@ -0,0 +1,67 @@
+"""Índice de coincidencias exactas de frases del corpus y del feedback"""
+import benchmarks
+from model import BarranquillaNLPModel
+from phrase_index import PhraseIndex
+
+
+def test_rebuild_and_add_return_new_indexes_with_shared_counters():
+    index = PhraseIndex().rebuild([('hola', 'feliz')], [('hola', 'saludo')])
+    extended = index.add([('chao', 'triste', 'despedida')])
+
+    assert index.lookup('chao') is None
+    assert extended.lookup('chao') == ('triste', 'despedida')
+    assert extended.lookup('hola') == ('feliz', 'saludo')
+    assert index.stats()['lookups'] == extended.stats()['lookups'] == 3
+    assert extended.stats()['hits'] == 2
+
+
+def test_retrain_publishes_index_with_the_models(server_module):
+    nlp_model = server_module.nlp_model
+    message = 'me encanta el carnaval de barranquilla con mis primos'
+    before = nlp_model._active
+    nlp_model.retrain_with_feedback_batch([(message, 'feliz', 'entretenimiento')])
+    after = nlp_model._active
+
+    assert after.version > before.version
+    assert after.phrase_index is not before.phrase_index
+    assert after.phrase_index.lookup(nlp_model.preprocess_text(message)) == ('feliz', 'entretenimiento')
+    assert before.phrase_index.lookup(nlp_model.preprocess_text(message)) is None
+
+
+def test_sample_messages_reach_the_classifiers(server_module):
+    nlp_model = server_module.nlp_model
+    for message in benchmarks.SAMPLE_MESSAGES:
+        assert nlp_model.phrase_index.lookup(nlp_model.preprocess_text(message)) is None, message
+
+
+def test_exact_match_bench_leaves_model_untouched(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    nlp_model = BarranquillaNLPModel(corpus_path=str(tmp_path / 'corpus.db'), exact_match=False)
+    try:
+        results = benchmarks.bench_exact_match(nlp_model, size=40)
+        assert nlp_model.phrase_index is None
+        assert results['sin_indice']['hit_rate'] == 0.0
+        assert results['indice']['hit_rate'] > 0.0
+    finally:
+        nlp_model.close()
+
+
+def test_partial_hits_only_run_the_missing_head(server_module, monkeypatch):
+    nlp_model = server_module.nlp_model
+    messages = ['tengo hambre', 'busco bar', 'quiero spa']
+    processed = [nlp_model.preprocess_text(message) for message in messages]
+    known = [nlp_model.phrase_index.lookup(text) for text in processed]
+    assert all(labels[0] is None and labels[1] is not None for labels in known)
+    expected = [
+        nlp_model._apply_known_labels(result, labels)
+        for result, labels in zip(nlp_model._classify_processed(processed), known)
+    ]
+
+    def both_heads(texts):
+        raise AssertionError('una coincidencia parcial no debe evaluar ambas cabezas')
+
+    monkeypatch.setattr(nlp_model._get_predictor(), 'predict', both_heads)
+    nlp_model.prediction_cache.clear()
+
+    assert nlp_model.predict_batch(messages) == expected
+    assert [nlp_model.predict_mood_and_intent(message) for message in messages] == expected
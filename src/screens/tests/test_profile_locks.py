@@ -0,0 +1,67 @@
+"""Actualizaciones concurrentes de un mismo perfil sin perder escrituras"""
+import sys
+import threading
+import time
+import uuid
+
+import pytest
+
+from user_profile import UserProfile
+
+THREADS = 8
+PLACES = 40
+
+
+@pytest.fixture
+def racy_profiles(monkeypatch):
+    """Ceder el GIL dentro de las lecturas-modificaciones de un perfil
+
+    Sin el candado por usuario, otro hilo se cuela entre la lectura de la
+    calificación anterior y la escritura de la nueva en casi cada llamada.
+    """
+    original = UserProfile.location_intent
+
+    def location_intent(self, place):
+        time.sleep(0)
+        return original(self, place)
+
+    monkeypatch.setattr(UserProfile, 'location_intent', location_intent)
+    previous = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    yield
+    sys.setswitchinterval(previous)
+
+
+def rating_for(place: int) -> int:
+    return place % 5 + 1
+
+
+def test_concurrent_updates_of_one_user_are_exact(server_module, racy_profiles, analysis):
+    nlp_model = server_module.nlp_model
+    intent = analysis[2]
+    user_id = f"lock_test_{uuid.uuid4().hex}"
+    places = [f"{user_id}_lugar_{i}" for i in range(PLACES)]
+    start = threading.Barrier(THREADS)
+
+    def worker():
+        start.wait()
+        for i, place in enumerate(places):
+            nlp_model.rate_location(user_id, place, rating_for(i), intent)
+            nlp_model.update_user_profile(user_id, f"mensaje {i}", analysis=analysis)
+
+    threads = [threading.Thread(target=worker) for _ in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    profile = nlp_model.user_profiles[user_id]
+    assert profile.conversation_count == THREADS * PLACES
+    assert profile.rating_count == PLACES
+    assert profile.rating_sum == sum(rating_for(i) for i in range(PLACES))
+    # Cada lugar lo calificó un solo usuario: una calificación en el índice
+    for i, place in enumerate(places):
+        assert nlp_model.place_index.place_stats(place) == {
+            'place': place, 'avg_rating': rating_for(i), 'ratings': 1,
+            'by_intent': {intent: {'avg_rating': rating_for(i), 'ratings': 1}}
+        }
@@ -0,0 +1,104 @@
+"""Worker de reentrenamiento: reintentos, registro único del feedback y delegación"""
+import time
+
+from retrain_worker import RetrainWorker
+from training_corpus import TrainingCorpus
+
+
+class FlakyModel:
+    """Modelo falso cuyo reentrenamiento falla las primeras `failures` veces"""
+
+    model_version = 1
+
+    def __init__(self, failures: int):
+        self.failures = failures
+        self.batches = []
+        self.recorded = []
+
+    def record_feedback(self, feedback_items):
+        self.recorded.append(list(feedback_items))
+
+    def retrain_with_feedback_batch(self, feedback_items, record=True):
+        if record:
+            self.record_feedback(feedback_items)
+        self.batches.append(list(feedback_items))
+        if len(self.batches) <= self.failures:
+            raise RuntimeError('entrenamiento fallido')
+
+
+def test_failed_batch_is_retried():
+    model = FlakyModel(failures=2)
+    worker = RetrainWorker(model, debounce_seconds=0, retry_seconds=0, max_retries=3)
+    worker.submit('hola', 'feliz', 'saludo')
+    assert worker.wait_idle(5)
+
+    assert model.batches == [[('hola', 'feliz', 'saludo')]] * 3
+    status = worker.status()
+    assert status['retrain_count'] == 1
+    assert status['last_error'] is None
+    assert status['dropped_feedback'] == 0
+
+
+def test_batch_dropped_after_max_retries_is_reported():
+    model = FlakyModel(failures=10)
+    worker = RetrainWorker(model, debounce_seconds=0, retry_seconds=0, max_retries=1)
+    worker.submit('hola', 'feliz', 'saludo')
+    assert worker.wait_idle(5)
+
+    assert len(model.batches) == 2
+    status = worker.status()
+    assert status['state'] == 'idle'
+    assert status['retrain_count'] == 0
+    assert status['dropped_feedback'] == 1
+    assert status['last_error'] == 'entrenamiento fallido'
+
+
+def test_feedback_is_recorded_once_per_item():
+    model = FlakyModel(failures=1)
+    worker = RetrainWorker(model, debounce_seconds=0, retry_seconds=0)
+    worker.submit('hola', 'feliz', 'saludo')
+    worker.submit('chao', 'triste', 'despedida')
+    assert worker.wait_idle(5)
+
+    assert sorted(item for batch in model.recorded for item in batch) == [
+        ('chao', 'triste', 'despedida'), ('hola', 'feliz', 'saludo')
+    ]
+
+
+class CorpusModel:
+    """Modelo falso con un corpus real que cuenta los reentrenamientos completos"""
+
+    model_version = 1
+
+    def __init__(self, corpus):
+        self.corpus = corpus
+        self.full_retrains = 0
+
+    def record_feedback(self, feedback_items):
+        for message, mood, intent in feedback_items:
+            self.corpus.add_examples('mood', [(message, mood)])
+            self.corpus.add_examples('intent', [(message, intent)])
+
+    def train_models(self):
+        self.full_retrains += 1
+
+
+def test_only_trainer_retrains_feedback_from_other_processes(tmp_path):
+    path = str(tmp_path / 'corpus.db')
+    trainer_model = CorpusModel(TrainingCorpus(path))
+    # Otro worker: su propia conexión al mismo corpus
+    other_model = CorpusModel(TrainingCorpus(path))
+    trainer = RetrainWorker(trainer_model, debounce_seconds=0, corpus_poll_seconds=0.01)
+    delegated = RetrainWorker(other_model, train=False)
+
+    status = delegated.submit('hola', 'feliz', 'saludo')
+    assert status['state'] == 'delegated'
+    assert other_model.full_retrains == 0
+
+    deadline = time.monotonic() + 5
+    while trainer_model.full_retrains == 0 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert trainer_model.full_retrains == 1
+    assert trainer.wait_idle(5)
+    assert trainer.status()['retrain_count'] == 1
+    assert trainer_model.corpus.load_task('mood') == (['hola'], ['feliz'])
@@ -0,0 +1,161 @@
+"""Perfiles e índice de lugares compartidos entre workers en un SQLite común"""
+import sqlite3
+
+import pytest
+
+from model import BarranquillaNLPModel
+from profile_store import SQLiteProfileStore
+
+
+@pytest.fixture
+def shared_model(tmp_path, monkeypatch):
+    """Modelo con perfiles compartidos y la conexión de otro worker al mismo archivo"""
+    monkeypatch.chdir(tmp_path)
+    path = str(tmp_path / 'profiles.db')
+    nlp_model = BarranquillaNLPModel(
+        profile_store=SQLiteProfileStore(path),
+        corpus_path=str(tmp_path / 'corpus.db'),
+        shared_profiles=True
+    )
+    other_worker = SQLiteProfileStore(path)
+    yield nlp_model, other_worker
+    other_worker.close()
+    nlp_model.close()
+
+
+def test_refresh_keeps_profile_until_another_worker_writes(shared_model, analysis):
+    nlp_model, other_worker = shared_model
+    nlp_model.update_user_profile('ana', 'quiero comer arepas', analysis=analysis)
+
+    nlp_model.refresh_profile('ana')
+    profile = nlp_model.user_profiles['ana']
+    version = profile.version
+    for _ in range(3):
+        nlp_model.refresh_profile('ana')
+    assert nlp_model.user_profiles['ana'] is profile
+    assert profile.version == version
+
+    changed = other_worker.load('ana')
+    changed['conversation_count'] = 10
+    other_worker.save('ana', changed)
+
+    nlp_model.refresh_profile('ana')
+    assert nlp_model.user_profiles['ana'].conversation_count == 10
+    assert nlp_model.user_profiles['ana'].version != version
+
+
+def test_own_write_does_not_reload_the_profile(shared_model, analysis):
+    nlp_model, _ = shared_model
+    nlp_model.update_user_profile('carla', 'quiero comer arepas', analysis=analysis)
+    profile = nlp_model.rate_location('carla', 'Malecón', 5, analysis[2])
+    version = profile.version
+
+    nlp_model.refresh_profile('carla')
+    assert nlp_model.user_profiles['carla'] is profile
+    assert profile.version == version
+    assert nlp_model.place_index.place_stats('Malecón')['ratings'] == 1
+
+
+def test_own_writes_are_not_lost_on_refresh(shared_model, analysis):
+    nlp_model, other_worker = shared_model
+    for i in range(3):
+        nlp_model.update_user_profile('beto', f"mensaje {i}", analysis=analysis)
+        other_worker.save('beto', dict(other_worker.load('beto'), conversation_count=20 * (i + 1)))
+
+    nlp_model.refresh_profile('beto')
+    assert nlp_model.user_profiles['beto'].conversation_count == 60
+
+
+def test_store_adds_revision_to_existing_files(tmp_path):
+    path = str(tmp_path / 'profiles.db')
+    with sqlite3.connect(path) as conn:
+        conn.execute('CREATE TABLE profiles (user_id TEXT PRIMARY KEY, data TEXT NOT NULL)')
+        conn.execute('INSERT INTO profiles VALUES (?, ?)', ('ana', '{"conversation_count": 1}'))
+    conn.close()
+
+    store = SQLiteProfileStore(path)
+    try:
+        assert store.load_if_changed('ana', None) == ({'conversation_count': 1}, 0)
+        assert store.load_if_changed('ana', 0) is None
+        store.save('ana', {'conversation_count': 2})
+        assert store.load_if_changed('ana', 0) == ({'conversation_count': 2}, 1)
+    finally:
+        store.close()
+
+
+def test_interaction_and_rating_share_one_transaction(shared_model, analysis, monkeypatch):
+    nlp_model, other_worker = shared_model
+    store = nlp_model.profile_store
+    calls = {'exclusive': 0, 'save_many': 0}
+
+    def counted(name):
+        original = getattr(store, name)
+
+        def wrapper(*args, **kwargs):
+            calls[name] += 1
+            return original(*args, **kwargs)
+        return wrapper
+
+    for name in calls:
+        monkeypatch.setattr(store, name, counted(name))
+
+    profile = nlp_model.update_user_profile('dani', 'quiero comer arepas', 'Lugar recomendado: Malecón', 5,
+                                            analysis=analysis, rated_place='Malecón')
+
+    assert calls == {'exclusive': 1, 'save_many': 1}
+    assert profile.location_ratings == {'Malecón': 5}
+    assert other_worker.load('dani')['location_ratings'] == {'Malecón': 5}
+    assert nlp_model.place_index.place_stats('Malecón')['by_intent'] == {analysis[2]: {'avg_rating': 5.0, 'ratings': 1}}
+
+
+def test_workers_share_one_place_index(shared_model, tmp_path):
+    nlp_model, _ = shared_model
+    second_worker = BarranquillaNLPModel(
+        profile_store=SQLiteProfileStore(str(tmp_path / 'profiles.db')),
+        corpus_path=str(tmp_path / 'corpus.db'),
+        shared_profiles=True
+    )
+    try:
+        nlp_model.rate_location('eva', 'Malecón', 5, 'comer')
+        second_worker.rate_location('fito', 'Malecón', 3, 'comer')
+        second_worker.rate_location('fito', 'Museo', 4, 'cultura')
+        # Otro worker cambia la calificación de eva: se descuenta la anterior
+        second_worker.rate_location('eva', 'Malecón', 1, 'cultura')
+
+        for worker in (nlp_model, second_worker):
+            assert worker.place_index.top_places(10) == [
+                {'place': 'Museo', 'avg_rating': 4.0, 'ratings': 1},
+                {'place': 'Malecón', 'avg_rating': 2.0, 'ratings': 2}
+            ]
+            assert worker.place_index.place_stats('Malecón')['by_intent'] == {
+                'comer': {'avg_rating': 3.0, 'ratings': 1},
+                'cultura': {'avg_rating': 1.0, 'ratings': 1}
+            }
+            assert worker.place_index.stats() == {'places': 2, 'ratings': 3, 'intents': 2}
+    finally:
+        second_worker.close()
+
+
+def test_shared_place_index_is_built_from_existing_profiles(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    path = str(tmp_path / 'profiles.db')
+    store = SQLiteProfileStore(path)
+    store.save_many({
+        'ana': {'location_ratings': {'Malecón': 4}, 'location_intents': {'Malecón': 'comer'}},
+        'beto': {'location_ratings': {'Malecón': 2, 'Museo': 5}}
+    })
+    store.replace_place_ratings([])
+    store.close()
+
+    nlp_model = BarranquillaNLPModel(
+        profile_store=SQLiteProfileStore(path), corpus_path=str(tmp_path / 'corpus.db'), shared_profiles=True
+    )
+    try:
+        assert nlp_model.place_index.top_places(10, min_ratings=2) == [
+            {'place': 'Malecón', 'avg_rating': 3.0, 'ratings': 2}
+        ]
+        assert nlp_model.place_index.top_places(10, 'comer') == [
+            {'place': 'Malecón', 'avg_rating': 4.0, 'ratings': 1}
+        ]
+    finally:
+        nlp_model.close()
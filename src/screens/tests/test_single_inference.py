@@ -0,0 +1,44 @@
+"""Cada petición de perfil clasifica su mensaje una sola vez"""
+import itertools
+
+import pytest
+
+_messages = itertools.count()
+
+
+def unique_message() -> str:
+    # Mensajes nuevos: ni la caché de predicciones ni el índice de frases los conocen
+    return f"hoy quiero salir a conocer algo distinto número {next(_messages)}"
+
+
+@pytest.fixture
+def classify_calls(server_module, monkeypatch):
+    """Textos de cada llamada a _classify_processed del modelo del servidor"""
+    calls = []
+    original = server_module.nlp_model._classify_processed
+
+    def counting(processed_texts):
+        calls.append(list(processed_texts))
+        return original(processed_texts)
+
+    monkeypatch.setattr(server_module.nlp_model, '_classify_processed', counting)
+    return calls
+
+
+def test_update_profile_classifies_once(client, classify_calls):
+    response = client.post('/update_profile', json={
+        'user_id': 'una_inferencia', 'message': unique_message(), 'feedback': 'me gustó', 'rating': 5
+    })
+    assert response.status_code == 200
+    assert len(classify_calls) == 1
+    assert len(classify_calls[0]) == 1
+
+
+def test_save_interaction_classifies_once(client, classify_calls):
+    response = client.post('/save_interaction', json={
+        'user_id': 'una_inferencia', 'user_message': unique_message(),
+        'bot_response': 'Te recomiendo el Malecón', 'recommended_place': 'Malecón del Río', 'rating': 4
+    })
+    assert response.status_code == 200
+    assert len(classify_calls) == 1
+    assert len(classify_calls[0]) == 1
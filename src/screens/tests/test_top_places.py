@@ -0,0 +1,50 @@
+"""Ranking de lugares mejor calificados (/top_places)"""
+import uuid
+
+import pytest
+
+
+def test_top_places_ranks_rated_places(client, server_module):
+    user_id = f"top_{uuid.uuid4().hex}"
+    place = f"{user_id}_Malecón"
+    server_module.nlp_model.rate_location(user_id, place, 5, 'turismo')
+
+    response = client.post('/top_places', json={'intent': 'turismo', 'limit': 50, 'place': place})
+
+    assert response.status_code == 200
+    body = response.get_json()
+    assert place in [entry['place'] for entry in body['top_places']]
+    assert body['place']['ratings'] == 1
+
+
+def test_save_interaction_rates_the_recommended_place(client):
+    user_id = f"top_{uuid.uuid4().hex}"
+    place = f"{user_id}_Museo"
+
+    response = client.post('/save_interaction', json={
+        'user_id': user_id, 'user_message': 'quiero conocer un museo', 'bot_response': 'Te recomiendo...',
+        'recommended_place': place, 'rating': 4
+    })
+
+    assert response.status_code == 200
+    assert response.get_json()['user_profile']['location_ratings'] == {place: 4}
+    stats = client.post('/top_places', json={'place': place}).get_json()['place']
+    assert stats['ratings'] == 1
+    assert stats['by_intent'] == {response.get_json()['analysis']['intent']: {'avg_rating': 4.0, 'ratings': 1}}
+
+
+@pytest.mark.parametrize('payload', [
+    {'limit': 'diez'},
+    {'limit': None},
+    {'limit': 0},
+    {'min_ratings': [1]},
+    {'min_ratings': -1},
+    {'intent': {'no': 'texto'}},
+    {'place': 3},
+    ['no', 'es', 'un', 'objeto']
+])
+def test_top_places_rejects_bad_input(client, payload):
+    response = client.post('/top_places', json=payload)
+
+    assert response.status_code == 400
+    assert 'error' in response.get_json()
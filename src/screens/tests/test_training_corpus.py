@@ -0,0 +1,48 @@
+"""Corpus de entrenamiento en SQLite: reetiquetado y migración del esquema"""
+import sqlite3
+
+from training_corpus import TrainingCorpus
+
+
+def test_relabel_replaces_previous_label(tmp_path):
+    corpus = TrainingCorpus(str(tmp_path / 'corpus.db'), normalize=str.lower)
+    assert corpus.add_examples('mood', [('Qué chévere', 'feliz')]) == 1
+    assert corpus.add_examples('mood', [('qué chévere', 'feliz')]) == 0
+    assert corpus.add_examples('mood', [('QUÉ CHÉVERE', 'emocionado')]) == 1
+
+    assert corpus.count('mood') == 1
+    assert corpus.load_task('mood') == (['QUÉ CHÉVERE'], ['emocionado'])
+    corpus.close()
+
+
+def test_old_schema_keeps_latest_label(tmp_path):
+    path = str(tmp_path / 'corpus.db')
+    conn = sqlite3.connect(path)
+    conn.execute(
+        'CREATE TABLE examples ('
+        'id INTEGER PRIMARY KEY AUTOINCREMENT, '
+        'task TEXT NOT NULL, '
+        'text TEXT NOT NULL, '
+        'normalized TEXT NOT NULL, '
+        'label TEXT NOT NULL, '
+        'source TEXT NOT NULL, '
+        'created_at TEXT NOT NULL, '
+        'UNIQUE (task, normalized, label))'
+    )
+    conn.executemany(
+        'INSERT INTO examples (task, text, normalized, label, source, created_at) VALUES (?, ?, ?, ?, ?, ?)',
+        [
+            ('mood', 'hola', 'hola', 'feliz', 'seed', '2024-01-01'),
+            ('mood', 'hola', 'hola', 'neutral', 'feedback', '2024-01-02'),
+            ('intent', 'hola', 'hola', 'saludo', 'seed', '2024-01-01'),
+        ]
+    )
+    conn.commit()
+    conn.close()
+
+    corpus = TrainingCorpus(path)
+    assert corpus.load_task('mood') == (['hola'], ['neutral'])
+    assert corpus.load_task('intent') == (['hola'], ['saludo'])
+    assert corpus.add_examples('mood', [('hola', 'triste')]) == 1
+    assert corpus.load_task('mood') == (['hola'], ['triste'])
+    corpus.close()
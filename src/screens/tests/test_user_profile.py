@@ -0,0 +1,67 @@
+"""Conversión de perfiles desde el formato JSON y carga tolerante a errores"""
+import uuid
+
+from model import BarranquillaNLPModel
+from profile_store import SQLiteProfileStore
+from user_profile import INTENTS, MOODS, UserProfile
+
+MALFORMED = {
+    'preferences': ['comida', {'no': 'texto'}],
+    'mood_history': [
+        {'mood': 'feliz', 'confidence': 0.8, 'timestamp': '2024-01-01T10:00:00'},
+        {'confidence': 0.5},
+        'triste',
+        {'mood': 'triste', 'confidence': 'alta'}
+    ],
+    'location_ratings': {'Malecón': 5, 'Museo': 'cinco'},
+    'last_interactions': [
+        None,
+        {'message': 'hola', 'mood': 'feliz', 'intent': 'comida'},
+        {'message': 'sin ánimo', 'mood': None, 'intent': 'comida'},
+        {'message': 'sin intención', 'mood': 'feliz'},
+        {'message': 'no hashable', 'mood': {'no': 'texto'}, 'intent': ['comida']},
+        {'message': 7, 'mood': 'triste', 'intent': 3}
+    ],
+    'conversation_count': 3
+}
+
+
+def test_from_dict_drops_malformed_entries():
+    profile = UserProfile.from_dict(MALFORMED)
+
+    assert profile.recent_moods(10) == ['feliz', 'triste']
+    assert [confidence for _, confidence, _ in profile.mood_history] == [0.8, 0.0]
+    assert profile.location_ratings == {'Malecón': 5}
+    assert profile.avg_rating == 5
+    assert profile.top_preferences(5) == ['comida']
+    assert [interaction['message'] for interaction in profile.to_dict()['last_interactions']] == ['hola']
+    assert None not in MOODS._codes and None not in INTENTS._codes
+    assert profile.conversation_count == 3
+
+
+def test_update_profile_accepts_mood_entry_without_mood(client):
+    response = client.post('/update_profile', json={
+        'user_id': f"perfil_{uuid.uuid4().hex}",
+        'message': 'quiero comer arepas',
+        'current_profile': {'mood_history': [{'confidence': 0.5}], 'conversation_count': 1}
+    })
+
+    assert response.status_code == 200
+    assert response.get_json()['user_profile']['conversation_count'] == 2
+
+
+def test_load_user_data_skips_unreadable_profiles(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    store = SQLiteProfileStore(str(tmp_path / 'profiles.db'))
+    store.save_many({
+        'dañado': ['no', 'es', 'un', 'perfil'],
+        'parcial': MALFORMED,
+        'normal': {'location_ratings': {'Malecón': 4}, 'conversation_count': 1}
+    })
+
+    nlp_model = BarranquillaNLPModel(profile_store=store, corpus_path=str(tmp_path / 'corpus.db'))
+    try:
+        assert sorted(nlp_model.user_profiles) == ['normal', 'parcial']
+        assert nlp_model.place_index.place_stats('Malecón')['ratings'] == 2
+    finally:
+        nlp_model.close()
@@ -0,0 +1,76 @@
+"""Normalización de texto para el modelo NLP
+
+Minúsculas, forma Unicode compuesta (NFC), signos de puntuación (incluidos
+los del español: ¿ ¡ « » …) como separadores de palabras y espacios
+colapsados; opcionalmente, sin tildes ni diéresis. La ñ se conserva
+siempre: "año" y "ano" son palabras distintas.
+"""
+import re
+import unicodedata
+from functools import lru_cache
+from typing import List, Sequence
+
+_PUNCTUATION = re.compile(r'[^\w\s]+')
+
+# Vocales acentuadas -> vocal base (ñ y ç no se tocan)
+_ACCENTS = str.maketrans(
+    'áàâäãéèêëíìîïóòôöõúùûü',
+    'aaaaaeeeeiiiiooooouuuu'
+)
+
+
+class TextNormalizer:
+    """Normalizador con patrones precompilados y memoización por texto
+
+    `cache_size` es el número de textos distintos que se recuerdan (0 sin
+    memoización). normalize_batch() procesa una lista entera con una sola
+    pasada de cada expresión regular.
+    """
+
+    def __init__(self, fold_accents: bool = False, cache_size: int = 8192):
+        self.fold_accents = fold_accents
+        self.cache_size = cache_size
+        self._normalize_cached = lru_cache(maxsize=cache_size)(self._normalize) if cache_size else self._normalize
+
+    def _prepare(self, text: str) -> str:
+        """Minúsculas, NFC y (opcional) sin tildes; sin tocar puntuación ni espacios"""
+        text = text.lower()
+        if not text.isascii():
+            text = unicodedata.normalize('NFC', text)
+            if self.fold_accents:
+                text = text.translate(_ACCENTS)
+        return text
+
+    def _normalize(self, text: str) -> str:
+        # split() + join colapsa los espacios y recorta los extremos sin otra regex
+        return ' '.join(_PUNCTUATION.sub(' ', self._prepare(text)).split())
+
+    def normalize(self, text: str) -> str:
+        """Normalizar un texto (memoizado)"""
+        return self._normalize_cached(text)
+
+    def normalize_batch(self, texts: Sequence[str]) -> List[str]:
+        """Normalizar una lista de textos de una sola vez
+
+        Los textos se unen con saltos de línea y las minúsculas, las tildes
+        y la puntuación se procesan una vez sobre el bloque completo; el
+        resultado coincide con normalize().
+        """
+        if not texts:
+            return []
+        block = '\n'.join(texts)
+        if block.count('\n') != len(texts) - 1:
+            # Algún texto trae saltos de línea propios: equivalen a un espacio
+            block = '\n'.join(text.replace('\n', ' ') for text in texts)
+        block = _PUNCTUATION.sub(' ', self._prepare(block))
+        return [' '.join(line.split()) for line in block.split('\n')]
+
+    def is_normalized(self, text: str) -> bool:
+        """Indica si el texto ya está en forma normalizada"""
+        return self._normalize(text) == text
+
+    def cache_stats(self) -> dict:
+        if not self.cache_size:
+            return {'size': 0, 'maxsize': 0, 'hits': 0, 'misses': 0}
+        info = self._normalize_cached.cache_info()
+        return {'size': info.currsize, 'maxsize': info.maxsize, 'hits': info.hits, 'misses': info.misses}
@@ -0,0 +1,156 @@
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Callable, Dict, Iterable, Iterator, List, Tuple
+
+TASKS = ('mood', 'intent')
+
+_CREATE_EXAMPLES = (
+    'CREATE TABLE IF NOT EXISTS {table} ('
+    'id INTEGER PRIMARY KEY AUTOINCREMENT, '
+    'task TEXT NOT NULL, '
+    'text TEXT NOT NULL, '
+    'normalized TEXT NOT NULL, '
+    'label TEXT NOT NULL, '
+    'source TEXT NOT NULL, '
+    'created_at TEXT NOT NULL, '
+    'UNIQUE (task, normalized))'
+)
+
+
+class TrainingCorpus:
+    """Corpus de entrenamiento persistente (SQLite)
+
+    Guarda los ejemplos semilla y el feedback de los usuarios. Hay un solo
+    ejemplo por (tarea, texto normalizado): el mismo feedback repetido no
+    se acumula y una corrección con otra etiqueta reemplaza la anterior, así
+    que el entrenamiento nunca ve etiquetas contradictorias para un texto.
+    """
+
+    def __init__(self, path: str = 'training_corpus.db', normalize: Callable[[str], str] = None):
+        self.path = path
+        self.normalize = normalize or (lambda text: text)
+        self._lock = threading.Lock()
+        self._connect()
+
+    def _connect(self):
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        with self._conn:
+            self._conn.execute(_CREATE_EXAMPLES.format(table='examples'))
+            self._migrate()
+
+    def _migrate(self):
+        """Pasar corpus antiguos (únicos por tarea, texto y etiqueta) al esquema actual
+
+        De cada texto con varias etiquetas se conserva la más reciente.
+        """
+        schema = self._conn.execute(
+            "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'examples'"
+        ).fetchone()[0]
+        if 'UNIQUE (task, normalized, label)' not in schema:
+            return
+        self._conn.execute(_CREATE_EXAMPLES.format(table='examples_new'))
+        self._conn.execute(
+            'INSERT INTO examples_new (id, task, text, normalized, label, source, created_at) '
+            'SELECT id, task, text, normalized, label, source, created_at FROM examples '
+            'WHERE id IN (SELECT MAX(id) FROM examples GROUP BY task, normalized)'
+        )
+        self._conn.execute('DROP TABLE examples')
+        self._conn.execute('ALTER TABLE examples_new RENAME TO examples')
+
+    def reopen(self):
+        """Abrir una conexión nueva (en un proceso hijo tras fork)"""
+        self._lock = threading.Lock()
+        self._connect()
+
+    def add_examples(self, task: str, examples: Iterable[Tuple[str, str]], source: str = 'feedback') -> int:
+        """Agregar ejemplos (texto, etiqueta) o corregir su etiqueta
+
+        Devuelve cuántos eran nuevos o cambiaron de etiqueta.
+        """
+        if task not in TASKS:
+            raise ValueError(f"Tarea desconocida: {task}")
+        now = datetime.now().isoformat()
+        rows = [
+            (task, text, self.normalize(text), label, source, now)
+            for text, label in examples
+        ]
+        with self._lock, self._conn:
+            before = self._conn.total_changes
+            self._conn.executemany(
+                'INSERT INTO examples (task, text, normalized, label, source, created_at) '
+                'VALUES (?, ?, ?, ?, ?, ?) '
+                'ON CONFLICT (task, normalized) DO UPDATE SET '
+                'text = excluded.text, label = excluded.label, source = excluded.source, '
+                'created_at = excluded.created_at '
+                'WHERE examples.label != excluded.label',
+                rows
+            )
+            return self._conn.total_changes - before
+
+    def iter_examples(self, task: str, batch_size: int = 1000) -> Iterator[Tuple[str, str]]:
+        """Recorrer los ejemplos (texto, etiqueta) de una tarea por bloques"""
+        with self._lock:
+            cursor = self._conn.execute(
+                'SELECT text, label FROM examples WHERE task = ? ORDER BY id', (task,)
+            )
+            rows = cursor.fetchmany(batch_size)
+        while rows:
+            yield from rows
+            with self._lock:
+                rows = cursor.fetchmany(batch_size)
+
+    def load_task(self, task: str, preprocess: Callable[[str], str] = None) -> Tuple[List[str], List[str]]:
+        """Textos y etiquetas de una tarea como dos listas paralelas
+
+        Los ejemplos se leen en bloques desde el cursor y se preprocesan al
+        vuelo, sin materializar la tabla completa como lista de tuplas.
+        """
+        preprocess = preprocess or (lambda text: text)
+        texts, labels = [], []
+        for text, label in self.iter_examples(task):
+            texts.append(preprocess(text))
+            labels.append(label)
+        return texts, labels
+
+    def data_version(self) -> int:
+        """Valor que cambia cuando otra conexión (otro proceso) confirma cambios"""
+        with self._lock:
+            return self._conn.execute('PRAGMA data_version').fetchone()[0]
+
+    def count(self, task: str = None) -> int:
+        """Número de ejemplos (de una tarea o en total)"""
+        with self._lock:
+            if task is None:
+                return self._conn.execute('SELECT COUNT(*) FROM examples').fetchone()[0]
+            return self._conn.execute(
+                'SELECT COUNT(*) FROM examples WHERE task = ?', (task,)
+            ).fetchone()[0]
+
+    def label_counts(self, task: str) -> Dict[str, int]:
+        """Número de ejemplos por etiqueta"""
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT label, COUNT(*) FROM examples WHERE task = ? GROUP BY label ORDER BY label',
+                (task,)
+            ).fetchall()
+        return dict(rows)
+
+    def stats(self) -> Dict:
+        """Resumen del corpus por tarea y origen"""
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT task, source, COUNT(*) FROM examples GROUP BY task, source'
+            ).fetchall()
+        summary = {task: {'total': 0} for task in TASKS}
+        for task, source, count in rows:
+            summary[task][source] = count
+            summary[task]['total'] += count
+        for task in TASKS:
+            summary[task]['labels'] = self.label_counts(task)
+        return summary
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,334 @@
+"""Representación compacta en memoria de los perfiles de usuario
+
+Los perfiles se guardan como objetos con __slots__: historiales en buffers
+circulares de tamaño fijo, estados de ánimo e intenciones como códigos
+enteros y marcas de tiempo como segundos desde epoch. to_dict() y
+from_dict() convierten desde y hacia el formato JSON original (el que
+devuelve la API y escriben los almacenamientos de perfiles).
+"""
+import itertools
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+
+MOOD_HISTORY_SIZE = 10
+LAST_INTERACTIONS_SIZE = 5
+# Estados de ánimo recientes usados para el estado dominante
+DOMINANT_MOOD_WINDOW = 5
+
+# Claves del formato JSON que UserProfile interpreta (el resto va a `extra`)
+PROFILE_FIELDS = (
+    'preferences', 'mood_history', 'location_ratings', 'conversation_count',
+    'avg_rating', 'favorite_categories', 'category_counts', 'last_interactions',
+    'location_intents'
+)
+
+
+class LabelCodes:
+    """Tabla de etiquetas <-> códigos enteros pequeños (solo crece)
+
+    Los códigos son locales al proceso: nunca se serializan, por eso las
+    etiquetas nuevas del reentrenamiento se pueden agregar en cualquier momento.
+    """
+
+    __slots__ = ('_labels', '_codes', '_lock')
+
+    def __init__(self):
+        self._labels: List[str] = []
+        self._codes: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def code(self, label: str) -> int:
+        code = self._codes.get(label)
+        if code is None:
+            with self._lock:
+                code = self._codes.get(label)
+                if code is None:
+                    code = len(self._labels)
+                    self._labels.append(label)
+                    self._codes[label] = code
+        return code
+
+    def label(self, code: int) -> str:
+        return self._labels[code]
+
+
+MOODS = LabelCodes()
+INTENTS = LabelCodes()
+
+# Sellos de versión únicos en el proceso: dos estados distintos de un
+# perfil (aunque sean objetos distintos) nunca comparten versión
+_VERSIONS = itertools.count(1)
+
+
+class RingBuffer:
+    """Últimos `capacity` elementos; agregar no reasigna ni recorta la lista"""
+
+    __slots__ = ('_items', '_start', '_capacity')
+
+    def __init__(self, capacity: int):
+        self._items = []
+        self._start = 0
+        self._capacity = capacity
+
+    def append(self, item):
+        if len(self._items) < self._capacity:
+            self._items.append(item)
+        else:
+            self._items[self._start] = item
+            self._start = (self._start + 1) % self._capacity
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def from_end(self, k: int):
+        """Elemento `k` posiciones antes del más reciente (0 = el más reciente)"""
+        items = self._items
+        return items[(self._start + len(items) - 1 - k) % len(items)]
+
+    def __iter__(self) -> Iterator:
+        """Del más antiguo al más reciente"""
+        items, start = self._items, self._start
+        for i in range(len(items)):
+            yield items[(start + i) % len(items)]
+
+    def last(self, n: int) -> List:
+        """Los `n` elementos más recientes, del más antiguo al más reciente"""
+        return list(self)[-n:] if n else []
+
+
+def _to_epoch(timestamp) -> int:
+    """Segundos desde epoch de una marca ISO (0 si no es válida)"""
+    try:
+        return int(datetime.fromisoformat(timestamp).timestamp())
+    except (TypeError, ValueError):
+        return 0
+
+
+def _to_number(value, default=0.0) -> float:
+    """Número de un campo JSON (`default` si no es numérico)"""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return value
+    return default
+
+
+def _to_iso(epoch: int) -> str:
+    return datetime.fromtimestamp(epoch).isoformat()
+
+
+class UserProfile:
+    """Perfil de usuario compacto
+
+    mood_history guarda tuplas (código de ánimo, confianza, epoch) y
+    last_interactions tuplas (mensaje, código de ánimo, código de intención,
+    feedback, rating, epoch). Las claves desconocidas del formato JSON se
+    conservan en `extra` para no perderlas al reescribir el perfil.
+
+    Los agregados de los insights (conteo de estados de ánimo en la ventana,
+    suma y número de calificaciones, conteo por categoría favorita) se
+    actualizan en cada cambio, así que leerlos no recorre ningún historial.
+    location_ratings solo debe modificarse con rate_location(), que también
+    guarda en location_intents (None si está vacío) la intención de la
+    conversación en que se calificó cada lugar, si se conoce.
+
+    `version` cambia con cada modificación (y con touch()), así que sirve
+    como clave de cachés de datos derivados del perfil.
+    """
+
+    __slots__ = (
+        'preferences', 'mood_history', 'location_ratings', 'location_intents', 'conversation_count',
+        'favorite_categories', 'category_counts', 'last_interactions', 'extra',
+        'mood_counts', 'dominant_mood_code', 'rating_sum', 'rating_count', 'version'
+    )
+
+    def __init__(self):
+        self.preferences: List[int] = []
+        self.mood_history = RingBuffer(MOOD_HISTORY_SIZE)
+        self.location_ratings: Dict[str, int] = {}
+        self.location_intents: Optional[Dict[str, int]] = None
+        self.conversation_count = 0
+        # Ordenadas por category_counts (de más a menos calificaciones positivas)
+        self.favorite_categories: List[int] = []
+        self.category_counts: Dict[int, int] = {}
+        self.last_interactions = RingBuffer(LAST_INTERACTIONS_SIZE)
+        self.extra = None
+        self.mood_counts: Dict[int, int] = {}
+        self.dominant_mood_code = None
+        self.rating_sum = 0
+        self.rating_count = 0
+        self.version = next(_VERSIONS)
+
+    def touch(self):
+        """Marcar el perfil como modificado (nueva versión)"""
+        self.version = next(_VERSIONS)
+
+    @property
+    def avg_rating(self) -> float:
+        """Promedio de las calificaciones de lugares"""
+        return self.rating_sum / self.rating_count if self.rating_count else 0.0
+
+    @property
+    def dominant_mood(self) -> str:
+        """Estado de ánimo más frecuente entre los DOMINANT_MOOD_WINDOW más recientes"""
+        return MOODS.label(self.dominant_mood_code) if self.dominant_mood_code is not None else None
+
+    def record_mood(self, mood: str, confidence: float, timestamp: int = None):
+        """Agregar un estado de ánimo (se conservan los últimos MOOD_HISTORY_SIZE)"""
+        code = MOODS.code(mood)
+        # El estado que sale de la ventana del dominante deja de contar
+        if len(self.mood_history) >= DOMINANT_MOOD_WINDOW:
+            leaving = self.mood_history.from_end(DOMINANT_MOOD_WINDOW - 1)[0]
+            self.mood_counts[leaving] -= 1
+            if not self.mood_counts[leaving]:
+                del self.mood_counts[leaving]
+        self.mood_counts[code] = self.mood_counts.get(code, 0) + 1
+        self.dominant_mood_code = max(self.mood_counts, key=self.mood_counts.get)
+        self.mood_history.append((
+            code, float(confidence), int(time.time()) if timestamp is None else timestamp
+        ))
+        self.touch()
+
+    def rate_location(self, place: str, rating: int, intent: str = None):
+        """Calificar un lugar (reemplaza la calificación anterior de ese lugar y su intención)"""
+        previous = self.location_ratings.get(place)
+        if previous is None:
+            self.rating_count += 1
+        else:
+            self.rating_sum -= previous
+        self.location_ratings[place] = rating
+        self.rating_sum += rating
+        if intent is not None:
+            if self.location_intents is None:
+                self.location_intents = {}
+            self.location_intents[place] = INTENTS.code(intent)
+        elif self.location_intents:
+            self.location_intents.pop(place, None)
+        self.touch()
+
+    def location_intent(self, place: str) -> Optional[str]:
+        """Intención con la que se calificó un lugar (None si no se conoce)"""
+        code = self.location_intents.get(place) if self.location_intents else None
+        return INTENTS.label(code) if code is not None else None
+
+    def rated_places(self) -> List[Tuple[str, int, Optional[str]]]:
+        """Calificaciones (lugar, calificación, intención) del perfil"""
+        return [(place, rating, self.location_intent(place)) for place, rating in self.location_ratings.items()]
+
+    def record_interaction(self, message: str, mood: str, intent: str, feedback: str = None,
+                           rating: int = None, timestamp: int = None):
+        """Agregar una interacción (se conservan las últimas LAST_INTERACTIONS_SIZE)"""
+        self.last_interactions.append((
+            message, MOODS.code(mood), INTENTS.code(intent), feedback, rating,
+            int(time.time()) if timestamp is None else timestamp
+        ))
+        self.touch()
+
+    def add_preference(self, intent: str):
+        code = INTENTS.code(intent)
+        if code not in self.preferences:
+            self.preferences.append(code)
+            self.touch()
+
+    def add_favorite_category(self, intent: str, count: int = 1):
+        """Sumar calificaciones positivas a una categoría, manteniendo el orden por conteo"""
+        code = INTENTS.code(intent)
+        counts = self.category_counts
+        favorites = self.favorite_categories
+        if code not in counts:
+            counts[code] = 0
+            favorites.append(code)
+        counts[code] += count
+        # Subir la categoría mientras supere a la anterior (pocas categorías)
+        i = favorites.index(code)
+        while i > 0 and counts[favorites[i - 1]] < counts[code]:
+            favorites[i - 1], favorites[i] = favorites[i], favorites[i - 1]
+            i -= 1
+        self.touch()
+
+    def recent_moods(self, n: int) -> List[str]:
+        """Etiquetas de los `n` estados de ánimo más recientes"""
+        return [MOODS.label(code) for code, _, _ in self.mood_history.last(n)]
+
+    def top_preferences(self, n: int) -> List[str]:
+        """Categorías favoritas (o, si no hay, preferencias) principales"""
+        codes = self.favorite_categories or self.preferences
+        return [INTENTS.label(code) for code in codes[:n]]
+
+    def extra_field(self, key: str, default=None):
+        return self.extra.get(key, default) if self.extra else default
+
+    def to_dict(self) -> Dict:
+        """Perfil en el formato JSON original"""
+        data = {
+            'preferences': [INTENTS.label(code) for code in self.preferences],
+            'mood_history': [
+                {'mood': MOODS.label(mood), 'confidence': confidence, 'timestamp': _to_iso(epoch)}
+                for mood, confidence, epoch in self.mood_history
+            ],
+            'location_ratings': dict(self.location_ratings),
+            'conversation_count': self.conversation_count,
+            'avg_rating': self.avg_rating,
+            'favorite_categories': [INTENTS.label(code) for code in self.favorite_categories],
+            'category_counts': {INTENTS.label(code): count for code, count in self.category_counts.items()},
+            'last_interactions': [
+                {
+                    'message': message,
+                    'mood': MOODS.label(mood),
+                    'intent': INTENTS.label(intent),
+                    'feedback': feedback,
+                    'rating': rating,
+                    'timestamp': _to_iso(epoch)
+                }
+                for message, mood, intent, feedback, rating, epoch in self.last_interactions
+            ]
+        }
+        if self.location_intents:
+            data['location_intents'] = {
+                place: INTENTS.label(code) for place, code in self.location_intents.items()
+            }
+        if self.extra:
+            data.update(self.extra)
+        return data
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'UserProfile':
+        """Construir un perfil desde el formato JSON original
+
+        Admite perfiles parciales (las claves que faltan toman su valor por
+        defecto) y descarta las entradas mal formadas, como un estado de
+        ánimo sin 'mood', una interacción cuyo 'mood' o 'intent' no es texto
+        o una calificación que no es numérica.
+        """
+        profile = cls()
+        for intent in data.get('preferences') or []:
+            if isinstance(intent, str):
+                profile.add_preference(intent)
+        for entry in data.get('mood_history') or []:
+            if isinstance(entry, dict) and isinstance(entry.get('mood'), str):
+                profile.record_mood(
+                    entry['mood'], _to_number(entry.get('confidence')), _to_epoch(entry.get('timestamp'))
+                )
+        location_intents = data.get('location_intents') or {}
+        for place, rating in (data.get('location_ratings') or {}).items():
+            if _to_number(rating, None) is not None:
+                intent = location_intents.get(place)
+                profile.rate_location(place, rating, intent if isinstance(intent, str) else None)
+        profile.conversation_count = int(_to_number(data.get('conversation_count'), 0))
+        # avg_rating se deriva de location_ratings; category_counts falta en perfiles antiguos
+        category_counts = data.get('category_counts') or {}
+        for intent in data.get('favorite_categories') or []:
+            if isinstance(intent, str):
+                profile.add_favorite_category(intent, int(_to_number(category_counts.get(intent), 1)))
+        for entry in data.get('last_interactions') or []:
+            if not (isinstance(entry, dict) and isinstance(entry.get('mood'), str)
+                    and isinstance(entry.get('intent'), str)):
+                continue
+            message = entry.get('message')
+            profile.record_interaction(
+                message if isinstance(message, str) else '', entry['mood'], entry['intent'],
+                entry.get('feedback'), entry.get('rating'), _to_epoch(entry.get('timestamp'))
+            )
+        extra = {key: value for key, value in data.items() if key not in PROFILE_FIELDS}
+        profile.extra = extra or None
+        return profile